@@ -0,0 +1,300 @@
+"""
+Endpoint benchmark suite
+
+Builds a synthetic catalog with library_api.generate_data in a fresh
+database, grows it through the given sizes and at every size drives each
+endpoint of the books, authors, genres, stats and jobs routers, in-process
+(ASGI transport, no network) and/or over HTTP against a uvicorn subprocess.
+Reports p50/p95/p99 latency and throughput per endpoint and saves the
+results as JSON (benchmarks/results/, ignored by git) so two commits can be
+compared.
+
+Usage:
+    python benchmarks/bench_api.py --sizes 10000,100000,1000000
+    python benchmarks/bench_api.py --mode http --requests 500
+    python benchmarks/bench_api.py --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+sys.path.insert(0, ROOT)
+
+# Рост задержки (p50/p95), начиная с которого сравнение отмечает регрессию
+REGRESSION_THRESHOLD = 0.10
+
+
+def scenarios(rng: random.Random, books: int, authors: int, genres: int) -> list:
+    """(имя, функция(client) -> response); случайные id берутся из того же rng."""
+    book_id = lambda: rng.randint(1, books)
+    author_id = lambda: rng.randint(1, authors)
+    genre_id = lambda: rng.randint(1, genres)
+    created = {"books": [], "authors": [], "genres": []}
+    # Имена уникальны между размерами каталога: созданные ранее записи остаются в базе
+    counter = (f"{books}-{number}" for number in range(10 ** 9))
+
+    def create(kind, payload):
+        def call(client):
+            response = client.post(f"/api/v1/{kind}/", json=payload())
+            if response.status_code == 200:
+                created[kind].append(response.json()["id"])
+            return response
+        return call
+
+    def delete(kind):
+        # Удаляются только записи, созданные сценарием create, каталог не меняется
+        def call(client):
+            target = created[kind].pop() if created[kind] else 0
+            return client.delete(f"/api/v1/{kind}/{target}")
+        return call
+
+    def bulk(kind, payload):
+        return lambda client: client.post(f"/api/v1/{kind}/bulk", json=[payload() for _ in range(100)])
+
+    def batch_get(kind, random_id):
+        return lambda client: client.post(f"/api/v1/{kind}/batch-get", json={"ids": [random_id() for _ in range(100)]})
+
+    jobs = []
+
+    def create_import(client):
+        # Небольшой файл: измеряется приём загрузки, сам импорт идёт в фоне
+        rows = "".join(f"bench import {next(counter)},bench author {rng.randint(1, 50)},bench genre\n" for _ in range(50))
+        response = client.post("/api/v1/jobs/imports", content="title,author,genre\n" + rows,
+                               headers={"Content-Type": "text/csv"})
+        if response.status_code == 202:
+            jobs.append(response.json()["id"])
+        return response
+
+    def get_job(client):
+        return client.get(f"/api/v1/jobs/{jobs[-1] if jobs else 0}")
+
+    new_book = lambda: {"title": f"bench {next(counter)}", "author_id": author_id(), "genre_id": genre_id()}
+    new_author = lambda: {"name": f"bench author {next(counter)}"}
+    new_genre = lambda: {"name": f"bench genre {next(counter)}"}
+
+    return [
+        ("GET /", lambda client: client.get("/")),
+        ("GET /books", lambda client: client.get("/api/v1/books/")),
+        ("GET /books?limit=100", lambda client: client.get("/api/v1/books/", params={"limit": 100})),
+        ("GET /books?skip=deep", lambda client: client.get("/api/v1/books/", params={"skip": rng.randint(0, books - 10)})),
+        ("GET /books?author_id", lambda client: client.get("/api/v1/books/", params={"author_id": author_id()})),
+        ("GET /books?genre_id", lambda client: client.get("/api/v1/books/", params={"genre_id": genre_id(), "sort_by": "title", "sort_order": "asc"})),
+        ("GET /books?author_name", lambda client: client.get("/api/v1/books/", params={"author_name": "Иван"})),
+        ("GET /books?title", lambda client: client.get("/api/v1/books/", params={"title": "тайна"})),
+        ("GET /books?q", lambda client: client.get("/api/v1/books/", params={"q": rng.choice(["тайна", "море", "зима дом"]), "sort_by": "relevance"})),
+        ("GET /books?with_total=estimate", lambda client: client.get("/api/v1/books/", params={"with_total": "estimate"})),
+        ("GET /books?with_total=false", lambda client: client.get("/api/v1/books/", params={"with_total": "false"})),
+        ("GET /books?fields", lambda client: client.get("/api/v1/books/", params={"fields": "id,title,author.name", "limit": 100})),
+        ("GET /books/{id}", lambda client: client.get(f"/api/v1/books/{book_id()}")),
+        ("POST /books/batch-get", batch_get("books", book_id)),
+        ("GET /books/export?author_id", lambda client: client.get("/api/v1/books/export", params={"author_id": author_id()})),
+        ("GET /books/export?format=csv", lambda client: client.get("/api/v1/books/export", params={"format": "csv", "genre_id": genre_id()})),
+        ("POST /books", create("books", new_book)),
+        ("PUT /books/{id}", lambda client: client.put(f"/api/v1/books/{book_id()}", json={"page_count": rng.randint(50, 900)})),
+        ("DELETE /books/{id}", delete("books")),
+        ("POST /books/bulk", bulk("books", new_book)),
+        ("GET /authors", lambda client: client.get("/api/v1/authors/", params={"skip": rng.randint(0, authors - 10)})),
+        ("GET /authors/{id}", lambda client: client.get(f"/api/v1/authors/{author_id()}")),
+        ("POST /authors/batch-get", batch_get("authors", author_id)),
+        ("POST /authors", create("authors", new_author)),
+        ("PUT /authors/{id}", lambda client: client.put(f"/api/v1/authors/{author_id()}", json={"bio": f"bio {next(counter)}"})),
+        ("DELETE /authors/{id}", delete("authors")),
+        ("POST /authors/bulk", bulk("authors", new_author)),
+        ("GET /genres", lambda client: client.get("/api/v1/genres/")),
+        ("GET /genres/{id}", lambda client: client.get(f"/api/v1/genres/{genre_id()}")),
+        ("POST /genres/batch-get", batch_get("genres", genre_id)),
+        ("POST /genres", create("genres", new_genre)),
+        ("PUT /genres/{id}", lambda client: client.put(f"/api/v1/genres/{genre_id()}", json={"name": f"bench genre {next(counter)}"})),
+        ("DELETE /genres/{id}", delete("genres")),
+        ("POST /genres/bulk", bulk("genres", new_genre)),
+        ("GET /stats", lambda client: client.get("/api/v1/stats/")),
+        ("POST /jobs/imports", create_import),
+        ("GET /jobs/{id}", get_job),
+    ]
+
+
+def summarize(latencies: list, elapsed: float, errors: int) -> dict:
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+    }
+
+
+def run_scenarios(client, seed: int, counts: dict, requests: int, warmup: int) -> dict:
+    rng = random.Random(seed)
+    results = {}
+    for name, call in scenarios(rng, counts["books"], counts["authors"], counts["genres"]):
+        for _ in range(warmup):
+            call(client)
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            request_started = time.perf_counter()
+            response = call(client)
+            latencies.append(time.perf_counter() - request_started)
+            if response.status_code >= 400:
+                errors += 1
+        results[name] = summarize(latencies, time.perf_counter() - started, errors)
+        print(f"  {name:<34} p50 {results[name]['p50_ms']:8.2f} ms  p95 {results[name]['p95_ms']:8.2f} ms  "
+              f"p99 {results[name]['p99_ms']:8.2f} ms  {results[name]['rps']:8.1f} req/s"
+              + (f"  errors {errors}" if errors else ""))
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(env: dict):
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "library_api.main:app", "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env=env
+    )
+    import httpx
+
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(200):
+        try:
+            httpx.get(base_url + "/", timeout=1.0)
+            return process, base_url
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("uvicorn не запустился")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def benchmark(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="library-bench-")
+    env = dict(os.environ)
+    env["LIBRARY_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    env["LIBRARY_IMPORT_DIR"] = os.path.join(workdir, "imports")
+    if not args.cache:
+        # По умолчанию измеряется путь до базы, а не кэш ответов
+        env["LIBRARY_RESPONSE_CACHE_ENABLED"] = "false"
+    # Настройки читаются при импорте library_api, поэтому окружение задаётся до него
+    os.environ.update(env)
+
+    import httpx
+    from library_api.db import engine, init_db
+    from library_api.generate_data import generate
+    from library_api.main import app
+
+    report = {
+        "revision": git_revision(),
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"seed": args.seed, "requests": args.requests, "warmup": args.warmup,
+                     "cache": args.cache, "async_mode": os.environ.get("LIBRARY_ASYNC_MODE", "false")},
+        "sizes": {},
+    }
+    init_db(engine)
+    for size in args.sizes:
+        counts = {"books": size, "authors": max(size // 20, 10), "genres": max(min(size // 1000, 500), 10)}
+        started = time.perf_counter()
+        generate(engine, counts["books"], counts["authors"], counts["genres"], seed=args.seed)
+        print(f"catalog {counts} generated in {time.perf_counter() - started:.1f}s")
+        report["sizes"][str(size)] = {}
+
+        if args.mode in ("inprocess", "both"):
+            print("in-process:")
+            from fastapi.testclient import TestClient
+
+            with TestClient(app) as client:
+                report["sizes"][str(size)]["inprocess"] = run_scenarios(client, args.seed, counts, args.requests, args.warmup)
+
+        if args.mode in ("http", "both"):
+            print("http:")
+            process, base_url = start_server(env)
+            try:
+                with httpx.Client(base_url=base_url, timeout=60.0) as client:
+                    report["sizes"][str(size)]["http"] = run_scenarios(client, args.seed, counts, args.requests, args.warmup)
+            finally:
+                process.terminate()
+                process.wait()
+    return report
+
+
+def compare(old_path: str, new_path: str) -> int:
+    with open(old_path, encoding="utf-8") as file:
+        old = json.load(file)
+    with open(new_path, encoding="utf-8") as file:
+        new = json.load(file)
+
+    print(f"{old['revision']} -> {new['revision']}")
+    regressions = 0
+    for size, modes in new["sizes"].items():
+        for mode, endpoints in modes.items():
+            baseline = old["sizes"].get(size, {}).get(mode, {})
+            print(f"size {size}, {mode}:")
+            for name, stats in endpoints.items():
+                before = baseline.get(name)
+                if before is None:
+                    continue
+                deltas = {
+                    metric: stats[metric] / before[metric] - 1 if before[metric] else 0.0
+                    for metric in ("p50_ms", "p95_ms")
+                }
+                regressed = any(delta > REGRESSION_THRESHOLD for delta in deltas.values())
+                regressions += regressed
+                print(f"  {name:<34} p50 {before['p50_ms']:8.2f} -> {stats['p50_ms']:8.2f} ({deltas['p50_ms']:+.0%})"
+                      f"  p95 {before['p95_ms']:8.2f} -> {stats['p95_ms']:8.2f} ({deltas['p95_ms']:+.0%})"
+                      + ("  REGRESSION" if regressed else ""))
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк эндпоинтов API")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        type=lambda value: [int(size) for size in value.split(",")],
+                        help="Размеры каталога (число книг) через запятую, по возрастанию")
+    parser.add_argument("--mode", choices=["inprocess", "http", "both"], default="both")
+    parser.add_argument("--requests", type=int, default=200, help="Запросов на эндпоинт")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--cache", action="store_true", help="Не отключать кэш ответов")
+    parser.add_argument("--output", help="Файл результатов (по умолчанию benchmarks/results/<ревизия>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Сравнить два файла результатов")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(compare(*args.compare))
+
+    report = benchmark(args)
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['revision']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
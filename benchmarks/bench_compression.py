@@ -0,0 +1,119 @@
+"""
+Response compression and keep-alive over HTTP
+
+Starts the API in production mode (library_api/run.py --mode prod) on a
+synthetic catalog and requests a few large and small endpoints with
+Accept-Encoding identity, gzip and br, reusing connections (keep-alive) and,
+for comparison, opening a new connection for every request. Reports bytes
+on the wire per response and requests/sec.
+
+Usage:
+    python benchmarks/bench_compression.py [--books 20000] [--requests 300] [--concurrency 8]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import httpx
+
+from bench_api import _free_port
+
+ENDPOINTS = [
+    ("GET /books?limit=100", "/api/v1/books/?limit=100"),
+    ("GET /books?fields=id,title", "/api/v1/books/?limit=100&fields=id,title,author.name"),
+    ("GET /books/{id}", "/api/v1/books/1"),
+    ("GET /authors?limit=100", "/api/v1/authors/?limit=100"),
+    ("GET /books/export?genre_id", "/api/v1/books/export?genre_id=2"),
+]
+ENCODINGS = ["identity", "gzip", "br"]
+
+
+def start_server(env: dict, workers: int):
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "library_api/run.py", "--mode", "prod", "--port", str(port), "--workers", str(workers)],
+        cwd=ROOT, env=env
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(200):
+        try:
+            httpx.get(base_url + "/", timeout=1.0)
+            return process, base_url
+        except httpx.TransportError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("uvicorn не запустился")
+
+
+def measure(base_url: str, path: str, encoding: str, requests: int, concurrency: int, keep_alive: bool) -> tuple:
+    """(байт на ответ, запросов в секунду)"""
+    headers = {"Accept-Encoding": encoding}
+    downloaded = []
+
+    # Без keep-alive клиент тот же, но каждое соединение закрывается после ответа
+    limits = httpx.Limits() if keep_alive else httpx.Limits(max_keepalive_connections=0)
+
+    def worker(count: int):
+        total = 0
+        with httpx.Client(base_url=base_url, headers=headers, limits=limits, timeout=60.0) as client:
+            for _ in range(count):
+                total += client.get(path).num_bytes_downloaded
+        downloaded.append(total)
+
+    per_worker = max(requests // concurrency, 1)
+    threads = [threading.Thread(target=worker, args=(per_worker,)) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    count = per_worker * concurrency
+    return sum(downloaded) / count, count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сжатие ответов и keep-alive")
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=300, help="Запросов на эндпоинт и кодировку")
+    parser.add_argument("--concurrency", type=int, default=8, help="Параллельных клиентов")
+    parser.add_argument("--workers", type=int, default=1, help="Рабочих процессов uvicorn")
+    parser.add_argument("--cache", action="store_true", help="Не отключать кэш ответов")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="library-bench-")
+    env = dict(os.environ)
+    env["LIBRARY_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    if not args.cache:
+        env["LIBRARY_RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ.update(env)
+
+    from library_api.db import engine, init_db
+    from library_api.generate_data import generate
+
+    init_db(engine)
+    generate(engine, args.books, max(args.books // 20, 10), max(min(args.books // 1000, 500), 10))
+    engine.dispose()
+
+    process, base_url = start_server(env, args.workers)
+    try:
+        print(f"{'endpoint':<30} {'encoding':<9} {'bytes':>10} {'req/s':>9} {'req/s new conn':>15}")
+        for name, path in ENDPOINTS:
+            for encoding in ENCODINGS:
+                size, rps = measure(base_url, path, encoding, args.requests, args.concurrency, keep_alive=True)
+                _, rps_new = measure(base_url, path, encoding, args.requests, args.concurrency, keep_alive=False)
+                print(f"{name:<30} {encoding:<9} {size:>10.0f} {rps:>9.1f} {rps_new:>15.1f}")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    main()
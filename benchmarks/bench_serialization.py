@@ -0,0 +1,109 @@
+"""
+Per-item cost of serializing a page of books
+
+Compares the ORM + Pydantic path (with and without the second validation
+FastAPI performs through response_model) against the column-only select
+encoded by library_api.fastjson.
+
+Usage:
+    python benchmarks/bench_serialization.py [--books 2000] [--repeat 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import contains_eager, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from library_api import models, schemas
+from library_api.fastjson import BOOK_COLUMNS, book_dict, dumps, orjson
+
+
+def seed(session, count: int):
+    authors = [models.Author(name=f"Автор {i}", bio="Биография " * 5) for i in range(100)]
+    genres = [models.Genre(name=f"Жанр {i}") for i in range(20)]
+    session.add_all(authors + genres)
+    session.flush()
+    session.add_all([
+        models.Book(
+            title=f"Книга {i}", isbn=f"isbn-{i}", publication_year=1900 + i % 120,
+            description="Описание книги " * 10, page_count=100 + i % 500,
+            author_id=authors[i % 100].id, genre_id=genres[i % 20].id
+        )
+        for i in range(count)
+    ])
+    session.commit()
+
+
+def page_meta(limit: int) -> dict:
+    return {"total": 1000, "page": 1, "limit": limit, "pages": 1000 // limit,
+            "total_approximate": False, "next_cursor": None}
+
+
+def orm_page(session, limit: int):
+    return (
+        session.query(models.Book).join(models.Book.author).join(models.Book.genre)
+        .options(contains_eager(models.Book.author), contains_eager(models.Book.genre))
+        .order_by(models.Book.id).limit(limit).all()
+    )
+
+
+def pydantic_once(session, limit: int) -> bytes:
+    response = schemas.PaginatedResponse(items=orm_page(session, limit), **page_meta(limit))
+    return response.model_dump_json().encode()
+
+
+_response_adapter = TypeAdapter(schemas.PaginatedResponse)
+
+
+def pydantic_twice(session, limit: int) -> bytes:
+    # Как при возврате модели из обработчика: FastAPI выгружает её в dict
+    # и заново проверяет по response_model перед сериализацией
+    response = schemas.PaginatedResponse(items=orm_page(session, limit), **page_meta(limit))
+    return _response_adapter.dump_json(_response_adapter.validate_python(response.model_dump()))
+
+
+def fast_path(session, limit: int) -> bytes:
+    rows = (
+        session.query(*BOOK_COLUMNS).select_from(models.Book)
+        .join(models.Book.author).join(models.Book.genre)
+        .order_by(models.Book.id).limit(limit).all()
+    )
+    return dumps({"items": [book_dict(row) for row in rows], **page_meta(limit)})
+
+
+def measure(func, session, limit: int, repeat: int) -> float:
+    func(session, limit)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(session, limit)
+        session.expunge_all()
+    return (time.perf_counter() - started) / repeat / limit * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Стоимость сериализации страницы книг")
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    seed(session, args.books)
+
+    paths = [("orm + pydantic", pydantic_once), ("orm + pydantic x2", pydantic_twice), ("columns + fastjson", fast_path)]
+    print(f"encoder: {'orjson' if orjson else 'json'}; microseconds per item")
+    print(f"{'limit':>6} " + " ".join(f"{name:>20}" for name, _ in paths))
+    for limit in (10, 50, 100):
+        costs = [measure(func, session, limit, args.repeat) for _, func in paths]
+        print(f"{limit:>6} " + " ".join(f"{cost:>20.2f}" for cost in costs))
+
+
+if __name__ == "__main__":
+    main()
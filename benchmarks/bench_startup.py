@@ -0,0 +1,94 @@
+"""
+Cold start: time from process start to the first response
+
+Starts a fresh interpreter several times and measures
+  * import   - ``import library_api.main``;
+  * ready    - uvicorn (library_api/run.py --mode prod) answering GET /,
+               with schema initialization on startup and without it
+               (LIBRARY_INIT_DB_ON_STARTUP=false, schema created beforehand);
+  * openapi  - the first and a repeated GET /openapi.json (the schema is built
+               on first use).
+Reports the median and the minimum over --runs.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import httpx
+
+from bench_api import _free_port
+
+
+def time_import(env: dict) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import library_api.main"], cwd=ROOT, env=env, check=True)
+    return time.perf_counter() - started
+
+
+def time_server(env: dict) -> tuple:
+    """(до первого ответа, первый /openapi.json, повторный /openapi.json) в секундах."""
+    port = _free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "library_api/run.py", "--mode", "prod", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=10.0) as client:
+            while True:
+                try:
+                    client.get("/")
+                    break
+                except httpx.TransportError:
+                    if process.poll() is not None or time.perf_counter() - started > 60:
+                        raise RuntimeError("uvicorn не запустился")
+                    time.sleep(0.005)
+            ready = time.perf_counter() - started
+
+            timings = []
+            for _ in range(2):
+                request_started = time.perf_counter()
+                client.get("/openapi.json").raise_for_status()
+                timings.append(time.perf_counter() - request_started)
+    finally:
+        process.terminate()
+        process.wait()
+    return ready, *timings
+
+
+def report(name: str, values: list):
+    print(f"{name:<34} {statistics.median(values) * 1000:>9.1f} {min(values) * 1000:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время холодного старта")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env["LIBRARY_DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='library-bench-'), 'bench.db')}"
+    subprocess.run([sys.executable, "-m", "library_api.migrations"], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    print(f"{'':<34} {'median ms':>9} {'min ms':>9}")
+    report("import library_api.main", [time_import(env) for _ in range(args.runs)])
+    for init in ("true", "false"):
+        results = [time_server({**env, "LIBRARY_INIT_DB_ON_STARTUP": init}) for _ in range(args.runs)]
+        report(f"ready (init_db_on_startup={init})", [ready for ready, _, _ in results])
+        if init == "true":
+            report("first GET /openapi.json", [first for _, first, _ in results])
+            report("repeated GET /openapi.json", [repeated for _, _, repeated in results])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Throughput scaling with the number of worker processes
+
+Generates a synthetic catalog once, then for every worker count starts the
+API in production mode (library_api/run.py --mode prod --workers N) and
+drives a mixed read workload from several client processes (a threaded
+client in one process is limited by the GIL and would cap the curve).
+Reports requests/sec and the speedup over one worker; the speedup is
+bounded by the number of CPU cores.
+
+Usage:
+    python benchmarks/bench_workers.py --workers 1,2,4,8 [--books 20000] [--clients 8]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import httpx
+
+from bench_compression import start_server
+
+
+def paths(books: int, authors: int) -> list:
+    rng = random.Random(0)
+    return [
+        "/api/v1/books/?limit=20",
+        f"/api/v1/books/{rng.randint(1, books)}",
+        f"/api/v1/books/?author_id={rng.randint(1, authors)}&limit=20",
+        f"/api/v1/authors/{rng.randint(1, authors)}",
+    ]
+
+
+def client_process(base_url: str, targets: list, requests: int, results):
+    errors = 0
+    with httpx.Client(base_url=base_url, timeout=60.0) as client:
+        for number in range(requests):
+            if client.get(targets[number % len(targets)]).status_code != 200:
+                errors += 1
+    results.put(errors)
+
+
+def measure(base_url: str, targets: list, requests: int, clients: int) -> tuple:
+    """(запросов в секунду, ошибок)"""
+    results = multiprocessing.Queue()
+    per_client = max(requests // clients, 1)
+    processes = [
+        multiprocessing.Process(target=client_process, args=(base_url, targets, per_client, results))
+        for _ in range(clients)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    errors = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    return per_client * clients / elapsed, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Пропускная способность в зависимости от числа процессов")
+    parser.add_argument("--workers", default="1,2,4", help="Числа рабочих процессов через запятую")
+    parser.add_argument("--books", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=4000, help="Запросов на замер")
+    parser.add_argument("--clients", type=int, default=8, help="Клиентских процессов")
+    parser.add_argument("--cache", action="store_true", help="Не отключать кэш ответов")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="library-bench-")
+    env = dict(os.environ)
+    env["LIBRARY_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    if not args.cache:
+        env["LIBRARY_RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ.update(env)
+
+    from library_api.db import engine, init_db
+    from library_api.generate_data import generate
+
+    authors = max(args.books // 20, 10)
+    init_db(engine)
+    generate(engine, args.books, authors, max(min(args.books // 1000, 500), 10))
+    engine.dispose()
+
+    targets = paths(args.books, authors)
+    print(f"CPU: {os.cpu_count()}")
+    print(f"{'workers':>7} {'req/s':>9} {'speedup':>8} {'errors':>7}")
+    baseline = None
+    for workers in [int(value) for value in args.workers.split(",")]:
+        process, base_url = start_server(env, workers)
+        try:
+            # Прогрев: соединения с базой и кэш страниц SQLite в каждом процессе
+            measure(base_url, targets, args.clients * 20, args.clients)
+            rps, errors = measure(base_url, targets, args.requests, args.clients)
+        finally:
+            process.terminate()
+            process.wait()
+        baseline = baseline or rps
+        print(f"{workers:>7} {rps:>9.1f} {rps / baseline:>7.2f}x {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
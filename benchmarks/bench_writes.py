@@ -0,0 +1,91 @@
+"""
+Concurrent single-item writes with and without group commit
+
+Starts the API in production mode once per group-commit window
+(LIBRARY_WRITE_BATCH_WINDOW_MS, 0 - every request commits on its own) and
+creates books with many concurrent POST /api/v1/books/ requests. Reports
+writes/sec and p50/p95 latency per window.
+
+Usage:
+    python benchmarks/bench_writes.py --windows 0,1,2,5 [--requests 2000] [--concurrency 32] [--synchronous FULL]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+import httpx
+
+from bench_compression import start_server
+
+
+def measure(base_url: str, window: float, requests: int, concurrency: int) -> tuple:
+    """(записей в секунду, задержки в секундах, ошибок)"""
+    latencies = []
+    errors = []
+    per_worker = max(requests // concurrency, 1)
+
+    def worker(number: int):
+        with httpx.Client(base_url=base_url, timeout=60.0) as client:
+            for item in range(per_worker):
+                payload = {"title": "Book", "isbn": f"w{window}-{number}-{item}", "author_id": 1, "genre_id": 1}
+                started = time.perf_counter()
+                response = client.post("/api/v1/books/", json=payload)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors.append(response.status_code)
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return per_worker * concurrency / elapsed, latencies, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Групповая фиксация одиночных записей")
+    parser.add_argument("--windows", default="0,1,2,5", help="Окна группировки, мс, через запятую")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32, help="Параллельных клиентов")
+    parser.add_argument("--synchronous", default=None, help="PRAGMA synchronous (FULL - fsync на каждый commit)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="library-bench-")
+    env = dict(os.environ)
+    env["LIBRARY_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    if args.synchronous:
+        env["LIBRARY_SQLITE_SYNCHRONOUS"] = args.synchronous
+    os.environ.update(env)
+
+    from library_api.db import SessionLocal, engine, init_db
+    from library_api.models.database import Author, Genre
+
+    init_db(engine)
+    with SessionLocal() as db:
+        db.add_all([Author(name="Author"), Genre(name="Genre")])
+        db.commit()
+    engine.dispose()
+
+    print(f"{'window ms':>9} {'writes/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for window in [float(value) for value in args.windows.split(",")]:
+        process, base_url = start_server({**env, "LIBRARY_WRITE_BATCH_WINDOW_MS": str(window)}, 1)
+        try:
+            rps, latencies, errors = measure(base_url, window, args.requests, args.concurrency)
+        finally:
+            process.terminate()
+            process.wait()
+        percentiles = statistics.quantiles(latencies, n=100)
+        print(f"{window:>9g} {rps:>9.1f} {percentiles[49] * 1000:>8.1f} {percentiles[94] * 1000:>8.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
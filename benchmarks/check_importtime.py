@@ -0,0 +1,96 @@
+"""
+Import-time budget for library_api.main
+
+Imports the app with ``python -X importtime`` in a fresh interpreter (several
+times, the median run is used) against a database file that does not exist,
+and fails (exit code 1) when
+  * the whole import takes longer than --budget-ms,
+  * the project's own modules (library_api.*) take longer than --own-budget-ms,
+  * a module that is only needed on demand (async mode, data generation) is
+    imported eagerly,
+  * the import creates the database file.
+
+Usage:
+    python benchmarks/check_importtime.py [--budget-ms 1500] [--own-budget-ms 200] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Не должны загружаться при импорте приложения в синхронном режиме
+LAZY_MODULES = [
+    "library_api.routers.aio",
+    "library_api.generate_data",
+    "library_api.seed_data",
+    "aiosqlite",
+    "asyncpg",
+]
+
+
+def import_profile(env: dict) -> dict:
+    """{модуль: (собственное время, накопленное время)} в микросекундах."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import library_api.main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # import time: <self> | <cumulative> | <имя с отступом по вложенности>
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бюджет времени импорта приложения")
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--own-budget-ms", type=float, default=200)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Сколько самых медленных модулей проекта показать")
+    args = parser.parse_args()
+
+    database = os.path.join(tempfile.mkdtemp(prefix="library-import-"), "library.db")
+    env = dict(os.environ)
+    env["LIBRARY_DATABASE_URL"] = f"sqlite:///{database}"
+    env["LIBRARY_ASYNC_MODE"] = "false"
+
+    profiles = [import_profile(env) for _ in range(args.runs)]
+    profiles.sort(key=lambda profile: profile["library_api.main"][1])
+    profile = profiles[len(profiles) // 2]
+
+    total_ms = profile["library_api.main"][1] / 1000
+    own = {name: times[0] / 1000 for name, times in profile.items() if name.startswith("library_api")}
+    own_ms = sum(own.values())
+    runs_ms = [p["library_api.main"][1] / 1000 for p in profiles]
+
+    print(f"import library_api.main: {total_ms:.0f} ms (median of {args.runs}, "
+          f"min {min(runs_ms):.0f}, stdev {statistics.pstdev(runs_ms):.0f}), budget {args.budget_ms:.0f} ms")
+    print(f"library_api.* own time: {own_ms:.0f} ms, budget {args.own_budget_ms:.0f} ms")
+    for name, elapsed in sorted(own.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {elapsed:8.1f} ms  {name}")
+
+    failures = []
+    if total_ms > args.budget_ms:
+        failures.append(f"импорт занимает {total_ms:.0f} мс, бюджет {args.budget_ms:.0f} мс")
+    if own_ms > args.own_budget_ms:
+        failures.append(f"модули library_api занимают {own_ms:.0f} мс, бюджет {args.own_budget_ms:.0f} мс")
+    eager = [name for name in LAZY_MODULES if name in profile]
+    if eager:
+        failures.append("загружаются при импорте: " + ", ".join(eager))
+    if os.path.exists(database):
+        failures.append("импорт создал файл базы данных")
+
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
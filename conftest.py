@@ -0,0 +1,74 @@
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath('.'))
+
+# Тесты не трогают library.db из репозитория: основная база приложения -
+# временный файл. Задаётся до импорта library_api, который читает настройки
+_tmp_dir = tempfile.mkdtemp(prefix="library-tests-")
+os.environ["LIBRARY_DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'library.db')}"
+os.environ["LIBRARY_IMPORT_DIR"] = os.path.join(_tmp_dir, "imports")
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from library_api.cache import response_cache
+from library_api.db import get_db, get_read_db
+from library_api.main import app
+from library_api.models.database import Base
+from library_api.reference import reference_cache
+from library_api.search import create_search_index
+from library_api.totals import totals_cache
+
+# Скрипт ручной проверки базы, а не тест: работает с library.db
+collect_ignore = ["test_db.py"]
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_tmp_dir, ignore_errors=True)
+
+
+def _clear_caches():
+    totals_cache.invalidate()
+    response_cache.clear()
+    reference_cache.clear()
+
+
+@pytest.fixture(scope="module")
+def db_engine():
+    """База в памяти на модуль тестов, одно соединение на все потоки."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    create_search_index(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def db_session(db_engine):
+    """Фабрика сессий тестовой базы (для наполнения данными)."""
+    return sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+
+
+@pytest.fixture(scope="module")
+def api_client(db_session):
+    """TestClient приложения, читающего и пишущего в тестовую базу."""
+    def _override_get_db():
+        db = db_session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = _override_get_db
+    app.dependency_overrides[get_read_db] = _override_get_db
+    _clear_caches()
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(get_read_db, None)
+    _clear_caches()
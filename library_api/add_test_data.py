@@ -6,10 +6,11 @@ import os
 # Add the parent directory to sys.path to import library_api
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from library_api.db import SessionLocal
+from library_api.db import SessionLocal, init_db
 from library_api.models import Author, Genre, Book
 
 def add_test_data():
+    init_db()
     db = SessionLocal()
     
     try:
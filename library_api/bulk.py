@@ -0,0 +1,148 @@
+"""
+Helpers for bulk create/upsert and batch get endpoints
+"""
+import json
+from collections import defaultdict
+
+from fastapi import HTTPException, Request
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm import Session
+
+from library_api import schemas
+
+# Ограничение на число параметров в одном IN (...) для SQLite
+IN_CHUNK_SIZE = 500
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines")
+
+
+async def read_bulk_payload(request: Request) -> list:
+    """Тело запроса: JSON-массив или NDJSON (один объект на строку)."""
+    body = await request.body()
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    try:
+        if content_type in NDJSON_TYPES:
+            return [json.loads(line) for line in body.splitlines() if line.strip()]
+        items = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный JSON в теле запроса")
+
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Ожидается JSON-массив или NDJSON")
+    return items
+
+
+def chunked(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def error_result(index: int, detail: str) -> schemas.BulkItemResult:
+    return schemas.BulkItemResult(index=index, status="error", detail=detail)
+
+
+def validation_detail(exc: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc']) or 'item'}: {error['msg']}"
+        for error in exc.errors()
+    )
+
+
+def validate_items(raw_items: list, schema: type[BaseModel], results: list) -> list:
+    """Возвращает [(index, item)] для валидных элементов, ошибки пишет в results."""
+    valid = []
+    for index, raw in enumerate(raw_items):
+        try:
+            valid.append((index, schema.model_validate(raw)))
+        except ValidationError as exc:
+            results[index] = error_result(index, validation_detail(exc))
+    return valid
+
+
+def fetch_existing(db: Session, key_column, values, *columns) -> dict:
+    """Один запрос на каждые IN_CHUNK_SIZE значений: {key: row}."""
+    found = {}
+    values = list(values)
+    for chunk in chunked(values, IN_CHUNK_SIZE):
+        for row in db.execute(select(key_column, *columns).where(key_column.in_(chunk))):
+            found[row[0]] = row
+    return found
+
+
+def batch_ids(ids: list, max_ids: int) -> list:
+    """Идентификаторы batch-get без повторов, в порядке запроса."""
+    if len(ids) > max_ids:
+        raise HTTPException(status_code=400, detail=f"Не больше {max_ids} идентификаторов в запросе")
+    return list(dict.fromkeys(ids))
+
+
+def fetch_by_ids(query, id_column, ids: list) -> dict:
+    """{id: строка}; один запрос IN (...) на каждые IN_CHUNK_SIZE идентификаторов."""
+    found = {}
+    for chunk in chunked(ids, IN_CHUNK_SIZE):
+        for item in query.filter(id_column.in_(chunk)):
+            found[item.id] = item
+    return found
+
+
+def batch_result(ids: list, found: dict, convert=None) -> dict:
+    # Порядок запроса; отсутствующие id перечисляются отдельно, а не дают 404
+    return {
+        "items": [convert(found[item_id]) if convert else found[item_id] for item_id in ids if item_id in found],
+        "missing": [item_id for item_id in ids if item_id not in found],
+    }
+
+
+def insert_batches(db: Session, model, rows: list, results: list, batch_size: int):
+    """rows: [(index, values)]; каждый пакет - один INSERT ... RETURNING и один commit."""
+    for batch in chunked(rows, batch_size):
+        keys = list(batch[0][1])
+        # SQLite не гарантирует порядок строк в RETURNING, поэтому id сопоставляются
+        # со входными строками по вставленным значениям; одинаковые строки взаимозаменяемы
+        statement = insert(model).returning(model.id, *[getattr(model, key) for key in keys])
+        try:
+            returned = db.execute(statement, [values for _, values in batch]).all()
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            for index, _ in batch:
+                results[index] = error_result(index, "Нарушение целостности данных, пакет отклонён")
+            continue
+
+        ids_by_values = defaultdict(list)
+        for row in returned:
+            ids_by_values[tuple(row[1:])].append(row[0])
+        for index, values in batch:
+            new_id = ids_by_values[tuple(values[key] for key in keys)].pop()
+            results[index] = schemas.BulkItemResult(index=index, status="created", id=new_id)
+
+
+def update_batches(db: Session, model, rows: list, results: list, batch_size: int):
+    """rows: [(index, values)], values содержат id и текущую version; UPDATE по первичному ключу пакетами."""
+    for batch in chunked(rows, batch_size):
+        try:
+            db.execute(update(model), [values for _, values in batch])
+            db.commit()
+        except (IntegrityError, StaleDataError):
+            db.rollback()
+            for index, _ in batch:
+                results[index] = error_result(index, "Нарушение целостности данных, пакет отклонён")
+            continue
+
+        for index, values in batch:
+            results[index] = schemas.BulkItemResult(index=index, status="updated", id=values["id"])
+
+
+def build_response(results: list) -> schemas.BulkResponse:
+    counts = {"created": 0, "updated": 0, "exists": 0, "error": 0}
+    for result in results:
+        counts[result.status] += 1
+    return schemas.BulkResponse(
+        created=counts["created"],
+        updated=counts["updated"],
+        existing=counts["exists"],
+        errors=counts["error"],
+        items=results
+    )
@@ -0,0 +1,432 @@
+"""
+Response cache for read endpoints
+
+Handlers cache the serialized JSON body under a key built from the route and
+normalized query parameters, and tag each entry with the entities it
+contains (``book:1``, ``author:3``, ``books`` for lists...). Write handlers
+invalidate exactly the tags they affect. A read that missed the cache
+before a write stores its body only if none of its tags was invalidated
+since the miss, so a response computed before a write cannot outlive it.
+
+The default backend lives in the process memory. With several worker
+processes SQLiteBackend keeps the entries in a local file (in /dev/shm when
+available) shared by all workers, so an invalidation in one worker is seen
+by the others.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+from urllib.parse import urlencode
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from library_api.config import settings
+from library_api.replicas import replica_may_lag
+
+
+# Сколько последних инвалидаций тегов помнит хранилище; запись, начатая раньше, не сохраняется
+TAG_VERSIONS_LIMIT = 10000
+
+
+class CacheBackend:
+    """Хранилище для ResponseCache; значения - (body: bytes, headers: dict)"""
+
+    def get(self, key: str) -> Optional[tuple]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: tuple, ttl: float, tags: list, since: Optional[int] = None):
+        """since - invalidation_seq() на момент промаха; запись пропускается,
+        если какой-либо из tags был сброшен позже."""
+        raise NotImplementedError
+
+    def invalidation_seq(self) -> int:
+        raise NotImplementedError
+
+    def invalidate_tags(self, tags: list) -> int:
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def get_counter(self, name: str) -> int:
+        raise NotImplementedError
+
+    def incr_counter(self, name: str) -> int:
+        raise NotImplementedError
+
+    def raise_counter(self, name: str, value: int):
+        """Поднимает счётчик до value, если он меньше."""
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """LRU-словарь с TTL и индексом тег -> ключи"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tags = defaultdict(set)
+        self._counters = defaultdict(int)
+        # Номер последней инвалидации каждого тега; более ранние забыты до _forgotten_seq
+        self._seq = 0
+        self._tag_seqs = {}
+        self._forgotten_seq = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, tags = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl, tags, since=None):
+        with self._lock:
+            if since is not None and self._invalidated_since(tags, since):
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, tags)
+            for tag in tags:
+                self._tags[tag].add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidation_seq(self):
+        with self._lock:
+            return self._seq
+
+    def _invalidated_since(self, tags, since) -> bool:
+        if since < self._forgotten_seq:
+            return True
+        return any(self._tag_seqs.get(tag, 0) > since for tag in tags)
+
+    def _record_invalidation(self, tags):
+        self._seq += 1
+        if len(self._tag_seqs) + len(tags) > TAG_VERSIONS_LIMIT:
+            self._tag_seqs.clear()
+            self._forgotten_seq = self._seq
+        for tag in tags:
+            self._tag_seqs[tag] = self._seq
+
+    def invalidate_tags(self, tags):
+        removed = 0
+        with self._lock:
+            self._record_invalidation(tags)
+            for tag in tags:
+                for key in list(self._tags.pop(tag, ())):
+                    if key in self._entries:
+                        self._remove(key)
+                        removed += 1
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+            # Чтения, начатые до очистки, ничего не сохраняют
+            self._seq += 1
+            self._tag_seqs.clear()
+            self._forgotten_seq = self._seq
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_counter(self, name):
+        return self._counters[name]
+
+    def incr_counter(self, name):
+        with self._lock:
+            self._counters[name] += 1
+            return self._counters[name]
+
+    def raise_counter(self, name, value):
+        with self._lock:
+            self._counters[name] = max(self._counters[name], value)
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+class SQLiteBackend(CacheBackend):
+    """Кэш в файле SQLite, общий для всех процессов на одной машине"""
+
+    # Как часто (раз в N записей) удалять просроченные и лишние записи
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY, body BLOB NOT NULL, headers TEXT NOT NULL, expires_at REAL NOT NULL
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at);
+            CREATE TABLE IF NOT EXISTS tags (tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS tags_key ON tags (key);
+            CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS tag_versions (tag TEXT PRIMARY KEY, seq INTEGER NOT NULL) WITHOUT ROWID;
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        # Соединение на поток; транзакции управляются явно (isolation_level=None)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            # WAL: читатели не блокируют друг друга и писателя; кэш не требует
+            # сохранности при сбое, поэтому fsync не нужен
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute(
+            "SELECT body, headers, expires_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        # Время стены, а не monotonic: срок сравнивается между процессами
+        if row is None or row[2] < time.time():
+            return None
+        return row[0], json.loads(row[1])
+
+    def set(self, key, value, ttl, tags, since=None):
+        body, headers = value
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Проверка в той же транзакции, что и запись: инвалидация не может вклиниться между ними
+            if since is not None and self._invalidated_since(conn, tags, since):
+                return
+            conn.execute("DELETE FROM tags WHERE key = ?", (key,))
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, body, headers, expires_at) VALUES (?, ?, ?, ?)",
+                (key, body, json.dumps(headers), time.time() + ttl)
+            )
+            conn.executemany("INSERT OR IGNORE INTO tags (tag, key) VALUES (?, ?)", [(tag, key) for tag in tags])
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self._prune()
+
+    def invalidation_seq(self):
+        return self.get_counter("invalidations")
+
+    @staticmethod
+    def _counter(conn, name: str) -> int:
+        row = conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def _invalidated_since(self, conn, tags: list, since: int) -> bool:
+        if since < self._counter(conn, "forgotten"):
+            return True
+        placeholders = ",".join("?" * len(tags))
+        return conn.execute(
+            f"SELECT 1 FROM tag_versions WHERE tag IN ({placeholders}) AND seq > ? LIMIT 1", [*tags, since]
+        ).fetchone() is not None
+
+    def _record_invalidation(self, conn, tags: list, forget: bool = False):
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES ('invalidations', 1) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + 1"
+        )
+        seq = self._counter(conn, "invalidations")
+        count = conn.execute("SELECT COUNT(*) FROM tag_versions").fetchone()[0]
+        if forget or count + len(tags) > TAG_VERSIONS_LIMIT:
+            conn.execute("DELETE FROM tag_versions")
+            conn.execute(
+                "INSERT INTO counters (name, value) VALUES ('forgotten', ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = excluded.value", (seq,)
+            )
+        conn.executemany(
+            "INSERT INTO tag_versions (tag, seq) VALUES (?, ?) ON CONFLICT (tag) DO UPDATE SET seq = excluded.seq",
+            [(tag, seq) for tag in tags]
+        )
+
+    def _prune(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            expired = [row[0] for row in conn.execute("SELECT key FROM entries WHERE expires_at < ?", (time.time(),))]
+            excess = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - len(expired) - self.max_entries
+            if excess > 0:
+                # Вытесняются записи, которые истекли бы раньше других
+                oldest = conn.execute(
+                    "SELECT key FROM entries WHERE expires_at >= ? ORDER BY expires_at LIMIT ?", (time.time(), excess)
+                )
+                evicted = [row[0] for row in oldest]
+                self.evictions += len(evicted)
+                expired += evicted
+            self._delete(conn, expired)
+
+    @staticmethod
+    def _delete(conn, keys: list):
+        rows = [(key,) for key in keys]
+        conn.executemany("DELETE FROM entries WHERE key = ?", rows)
+        conn.executemany("DELETE FROM tags WHERE key = ?", rows)
+
+    def invalidate_tags(self, tags):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._record_invalidation(conn, tags)
+            placeholders = ",".join("?" * len(tags))
+            keys = [row[0] for row in conn.execute(f"SELECT DISTINCT key FROM tags WHERE tag IN ({placeholders})", tags)]
+            self._delete(conn, keys)
+        return len(keys)
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM tags")
+            # Чтения, начатые до очистки, ничего не сохраняют
+            self._record_invalidation(conn, [], forget=True)
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get_counter(self, name):
+        row = self._conn().execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def incr_counter(self, name):
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + 1", (name,)
+            )
+            return conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+    def raise_counter(self, name, value):
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET value = max(value, excluded.value)", (name, value)
+            )
+
+
+def default_cache_path() -> str:
+    # Свой файл для каждой базы (относительный путь SQLite зависит от рабочего
+    # каталога); /dev/shm - файл в разделяемой памяти
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    digest = hashlib.sha1(f"{os.getcwd()}|{settings.database_url}".encode("utf-8")).hexdigest()[:12]
+    return os.path.join(directory, f"library_api_cache_{digest}.db")
+
+
+def make_backend() -> CacheBackend:
+    if settings.response_cache_backend == "sqlite":
+        return SQLiteBackend(settings.response_cache_path or default_cache_path(), settings.response_cache_max_entries)
+    return MemoryBackend(settings.response_cache_max_entries)
+
+
+class ResponseCache:
+    def __init__(self, backend: CacheBackend, ttl: float, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # (ключ, invalidation_seq) последнего промаха в текущем запросе: get и store
+        # одного обработчика выполняются в одном контексте
+        self._miss: ContextVar[Optional[tuple]] = ContextVar(f"response_cache_miss_{id(self)}", default=None)
+
+    def set_backend(self, backend: CacheBackend):
+        self.backend = backend
+
+    def get(self, key: str) -> Optional[Response]:
+        if not self.enabled:
+            return None
+        # Номер читается до обращения к кэшу: инвалидация после него отменит store
+        seq = self.backend.invalidation_seq()
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            self._miss.set((key, seq))
+            return None
+        self.hits += 1
+        body, headers = value
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def store(self, key: str, body: bytes, tags: list, headers: Optional[dict] = None) -> Response:
+        headers = headers or {}
+        if self.enabled and not replica_may_lag(self.backend):
+            miss = self._miss.get()
+            since = miss[1] if miss is not None and miss[0] == key else None
+            self.backend.set(key, (body, headers), self.ttl, tags, since=since)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def invalidate(self, *tags: str):
+        if self.enabled:
+            self.invalidations += self.backend.invalidate_tags(list(tags))
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / requests if requests else 0.0,
+            "invalidated": self.invalidations,
+            "evictions": getattr(self.backend, "evictions", 0),
+        }
+
+
+def cache_key(route: str, **params) -> str:
+    items = sorted((name, value) for name, value in params.items() if value is not None)
+    return f"{route}?{urlencode(items)}"
+
+
+@lru_cache(maxsize=None)
+def _adapter(schema) -> TypeAdapter:
+    return TypeAdapter(schema)
+
+
+def serialize(schema, obj) -> bytes:
+    """ORM-объект(ы) -> JSON по схеме; одна валидация и одна сериализация."""
+    adapter = _adapter(schema)
+    return adapter.dump_json(adapter.validate_python(obj, from_attributes=True))
+
+
+response_cache = ResponseCache(
+    make_backend(),
+    ttl=settings.response_cache_ttl,
+    enabled=settings.response_cache_enabled
+)
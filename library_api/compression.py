@@ -0,0 +1,150 @@
+"""
+Negotiated response compression (brotli / gzip)
+
+CompressionMiddleware picks an encoding from Accept-Encoding (brotli when the
+``brotli`` package is installed, otherwise gzip) and compresses text and JSON
+responses of at least ``minimum_size`` bytes. Streaming responses (exports)
+are compressed chunk by chunk and flushed after every chunk. Every response
+eligible for compression carries ``Vary: Accept-Encoding``, compressed or not.
+"""
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/x-ndjson", "application/javascript")
+
+
+def supported_encodings() -> tuple:
+    # В порядке предпочтения при равном q
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in supported_encodings():
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class _GzipCompressor:
+    def __init__(self, level: int):
+        # wbits=31: формат gzip (заголовок и контрольная сумма)
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        flush_mode = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        return self._compressor.compress(data) + self._compressor.flush(flush_mode)
+
+
+class _BrotliCompressor:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        output = self._compressor.process(data)
+        return output + (self._compressor.finish() if final else self._compressor.flush())
+
+
+class CompressionMiddleware:
+    """ASGI-middleware: сжатие ответов по Accept-Encoding с порогом по размеру."""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _compressor(self, encoding: str):
+        if encoding == "br":
+            return _BrotliCompressor(self.brotli_quality)
+        return _GzipCompressor(self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # Без подходящей кодировки ответ не сжимается, но всё равно получает Vary
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                # Решение откладывается до первого фрагмента тела: нужен его размер
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if passthrough:
+                await send(message)
+                return
+            if compressor is not None:
+                await send({**message, "body": compressor.compress(body, final=not more_body)})
+                return
+
+            headers = MutableHeaders(raw=list(start["headers"]))
+            if not self._should_compress(start["status"], headers, body, more_body):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            # Представление зависит от Accept-Encoding, даже если этот клиент
+            # получит его несжатым: иначе общий кэш отдаст сжатое не тому клиенту
+            headers.add_vary_header("Accept-Encoding")
+            if encoding is None:
+                passthrough = True
+                await send({**start, "headers": headers.raw})
+                await send(message)
+                return
+
+            compressor = self._compressor(encoding)
+            compressed = compressor.compress(body, final=not more_body)
+            headers["content-encoding"] = encoding
+            # Сжатое тело отличается по байтам: сильный ETag становится слабым
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["etag"] = "W/" + etag
+            if more_body:
+                del headers["content-length"]
+            else:
+                headers["content-length"] = str(len(compressed))
+            await send({**start, "headers": headers.raw})
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _should_compress(self, status: int, headers: MutableHeaders, body: bytes, more_body: bool) -> bool:
+        if status < 200 or status in (204, 304) or "content-encoding" in headers:
+            return False
+        if not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+            return False
+        # Потоковый ответ сжимается всегда, полный - начиная с minimum_size байт
+        return more_body or len(body) >= self.minimum_size
@@ -0,0 +1,102 @@
+"""
+HTTP conditional requests: ETag / Last-Modified, 304 Not Modified and If-Match
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.exc import StaleDataError
+
+PRECONDITION_FAILED = "Ресурс был изменён, получите актуальную версию"
+
+
+def make_etag(*parts) -> str:
+    # Сильный ETag: меняется при любом изменении данных, попадающих в ответ
+    return '"' + hashlib.sha1(repr(parts).encode("utf-8")).hexdigest() + '"'
+
+
+def book_etag(book) -> str:
+    return make_etag("book", book.id, book.version, book.author.version, book.genre.version)
+
+
+def author_etag(author) -> str:
+    # Счётчик книг меняется триггерами без увеличения version
+    return make_etag("author", author.id, author.version, author.book_count)
+
+
+def genre_etag(genre) -> str:
+    return make_etag("genre", genre.id, genre.version, genre.book_count)
+
+
+def book_last_modified(book) -> Optional[datetime]:
+    return latest(book.updated_at, book.author.updated_at, book.genre.updated_at)
+
+
+def latest(*values) -> Optional[datetime]:
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def validators(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"etag": etag}
+    if last_modified is not None:
+        headers["last-modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+
+def _etag_list(value: str, weak: bool = True) -> list:
+    # Слабое сравнение (If-None-Match) не учитывает W/, сильное (If-Match) - учитывает
+    tags = [tag.strip() for tag in value.split(",")]
+    return [tag.removeprefix("W/") for tag in tags] if weak else tags
+
+
+def is_not_modified(request: Request, headers) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = _etag_list(if_none_match)
+        return "*" in tags or headers.get("etag") in tags
+
+    # If-Modified-Since учитывается, только если нет If-None-Match
+    if_modified_since = request.headers.get("if-modified-since")
+    last_modified = headers.get("last-modified")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def not_modified(headers) -> Response:
+    return Response(status_code=304, headers={
+        name: value for name, value in headers.items() if name in ("etag", "last-modified")
+    })
+
+
+def conditional(request: Request, response: Response) -> Response:
+    """Готовый (например, закэшированный) ответ или 304 по его валидаторам."""
+    if is_not_modified(request, response.headers):
+        return not_modified(response.headers)
+    return response
+
+
+def check_if_match(request: Request, etag: str):
+    if_match = request.headers.get("if-match")
+    if if_match is None:
+        return
+    # Слабый ETag (сжатый ответ) не подтверждает побайтно ту же версию: 412
+    tags = _etag_list(if_match, weak=False)
+    if "*" not in tags and etag not in tags:
+        raise HTTPException(status_code=412, detail=PRECONDITION_FAILED)
+
+
+def commit_versioned(db: Session):
+    # version_id_col: UPDATE не находит строку, если версия изменилась после чтения
+    try:
+        db.commit()
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=412, detail=PRECONDITION_FAILED)
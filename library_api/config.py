@@ -0,0 +1,114 @@
+from typing import Literal, Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """Настройки приложения; переопределяются переменными окружения LIBRARY_*"""
+
+    model_config = SettingsConfigDict(env_prefix="LIBRARY_", env_file=".env", extra="ignore")
+
+    database_url: str = "sqlite:///./library.db"
+    # Если не задан, выводится из database_url (sqlite -> aiosqlite, postgresql -> asyncpg)
+    async_database_url: Optional[str] = None
+    # Асинхронные обработчики на AsyncSession вместо синхронных
+    async_mode: bool = False
+    # Создание таблиц и миграции при старте приложения; run.py --mode prod
+    # выполняет их сам до запуска рабочих процессов и выключает здесь
+    init_db_on_startup: bool = True
+    # Реплики только для чтения: GET-обработчики читают с них по кругу, запись -
+    # в database_url. JSON-список, например ["sqlite:///file:replica.db?mode=ro&uri=true"]
+    read_replica_urls: list[str] = []
+    # Сколько секунд после записи клиент читает с основной базы (read-your-writes)
+    read_your_writes_seconds: float = 5.0
+
+    # Пул соединений (для SQLite в памяти не применяется)
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    # Пересоздавать соединения старше N секунд (-1 - никогда)
+    db_pool_recycle: int = 3600
+    db_pool_pre_ping: bool = True
+
+    # Размер пакета (строк на транзакцию) для bulk-эндпоинтов
+    bulk_batch_size: int = 2000
+    # Максимум идентификаторов в одном batch-get запросе
+    batch_get_max_ids: int = 500
+    # Групповая фиксация одиночных записей: окно сбора пакета, мс (0 - выключена)
+    write_batch_window_ms: float = 0
+    write_batch_max_size: int = 64
+    # Строк, читаемых из курсора за раз при выгрузке каталога
+    export_batch_size: int = 1000
+
+    # Фоновый импорт книг: каталог загруженных файлов, параллельные задачи,
+    # строк на транзакцию, сколько ошибок по строкам хранить в задаче
+    import_dir: str = "./imports"
+    import_workers: int = 2
+    import_batch_size: int = 2000
+    import_max_errors: int = 100
+
+    # FastJSONResponse (orjson) как класс ответа по умолчанию для всех эндпоинтов
+    fast_json_responses: bool = False
+
+    # Кэш ответов GET-эндпоинтов
+    response_cache_enabled: bool = True
+    response_cache_ttl: float = 30.0
+    response_cache_max_entries: int = 10000
+    # memory - в памяти процесса, sqlite - файл, общий для рабочих процессов
+    response_cache_backend: Literal["memory", "sqlite"] = "memory"
+    # Файл для sqlite; по умолчанию в /dev/shm (или во временном каталоге)
+    response_cache_path: Optional[str] = None
+
+    # Кэш точных total списка книг: время жизни и число наборов фильтров
+    totals_cache_ttl: float = 60.0
+    totals_cache_max_entries: int = 1024
+    # Сколько секунд после подсчёта устаревшее значение ещё отдаётся в
+    # with_total=estimate как приблизительное
+    totals_stale_max_age: float = 300.0
+
+    # Одно выполнение одинаковых одновременных GET-запросов
+    single_flight_enabled: bool = True
+    # Сколько секунд ожидающий запрос ждёт первый, прежде чем выполниться сам
+    single_flight_timeout: float = 10.0
+
+    # Справочник авторов и жанров в памяти процесса для проверок при записи
+    reference_cache_enabled: bool = True
+    # Сколько авторов держать в памяти (жанры хранятся все)
+    reference_cache_max_authors: int = 100000
+
+    # Сжатие ответов (brotli при установленном пакете brotli, иначе gzip)
+    compression_enabled: bool = True
+    # Ответы меньше порога отдаются без сжатия
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+
+    # Запуск через run.py; workers, backlog и keep-alive применяются в режиме prod
+    server_host: str = "127.0.0.1"
+    server_port: int = 8000
+    # При нескольких процессах кэш ответов по умолчанию переключается на sqlite
+    server_workers: int = 1
+    server_backlog: int = 2048
+    # Дольше простоя соединения у балансировщика, чтобы он не получал закрытый сокет
+    server_keepalive_timeout: int = 75
+
+    # Метрики запросов на /metrics
+    metrics_enabled: bool = True
+    # Заголовок Server-Timing с временем SQL и обработчика в каждом ответе
+    server_timing: bool = False
+    # Логировать SQL-запросы дольше N миллисекунд (0 - не логировать)
+    slow_query_ms: float = 0
+    # Считать строки, возвращённые ORM-выборками: результат буферизуется
+    # повторно, поэтому только для отладки. Изменённые строки считаются всегда
+    metrics_count_rows: bool = False
+
+    # PRAGMA, выполняемые на каждом новом соединении SQLite
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    # Отрицательное значение - размер в КиБ (64 МиБ)
+    sqlite_cache_size: int = -64 * 1024
+
+
+settings = Settings()
@@ -0,0 +1,153 @@
+"""
+Denormalized book counts for authors and genres
+
+authors.book_count and genres.book_count are kept up to date by SQLite
+triggers on books, so per-genre statistics are read from the genres table
+instead of aggregating the whole catalog. The number of authors is kept the
+same way in the catalog_counts table. Other databases have no triggers:
+readers check is_supported() and count rows instead. Counts that drifted
+(writes made while the triggers were missing) are fixed by:
+
+    python -m library_api.counters reconcile
+"""
+import argparse
+from contextlib import contextmanager
+
+from sqlalchemy import func, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from library_api import models
+
+# Изменение счётчика меняет ответ автора (жанра), поэтому сдвигается и updated_at
+# (Last-Modified); version не трогается - её проверяет If-Match при правке автора
+_INCREMENT = """
+    UPDATE {table} SET book_count = book_count + 1, updated_at = CURRENT_TIMESTAMP WHERE id = new.{column};
+"""
+_DECREMENT = """
+    UPDATE {table} SET book_count = book_count - 1, updated_at = CURRENT_TIMESTAMP WHERE id = old.{column};
+"""
+_COUNTED = [("authors", "author_id"), ("genres", "genre_id")]
+
+_TRIGGERS = {
+    "books_counts_ai": f"""
+    CREATE TRIGGER IF NOT EXISTS books_counts_ai AFTER INSERT ON books BEGIN
+    {"".join(_INCREMENT.format(table=table, column=column) for table, column in _COUNTED)}
+    END
+    """,
+    "books_counts_ad": f"""
+    CREATE TRIGGER IF NOT EXISTS books_counts_ad AFTER DELETE ON books BEGIN
+    {"".join(_DECREMENT.format(table=table, column=column) for table, column in _COUNTED)}
+    END
+    """,
+    # Отдельные триггеры на автора и жанр: WHEN пропускает UPDATE без смены ключа
+    **{
+        f"books_counts_au_{column}": f"""
+        CREATE TRIGGER IF NOT EXISTS books_counts_au_{column} AFTER UPDATE OF {column} ON books
+        WHEN old.{column} IS NOT new.{column} BEGIN
+        {_DECREMENT.format(table=table, column=column)}
+        {_INCREMENT.format(table=table, column=column)}
+        END
+        """
+        for table, column in _COUNTED
+    },
+    # Число авторов для сводки каталога: строка catalog_counts, а не COUNT(*) по authors
+    "authors_total_ai": """
+    CREATE TRIGGER IF NOT EXISTS authors_total_ai AFTER INSERT ON authors BEGIN
+    UPDATE catalog_counts SET value = value + 1 WHERE name = 'authors';
+    END
+    """,
+    "authors_total_ad": """
+    CREATE TRIGGER IF NOT EXISTS authors_total_ad AFTER DELETE ON authors BEGIN
+    UPDATE catalog_counts SET value = value - 1 WHERE name = 'authors';
+    END
+    """,
+}
+# Триггеры вставки, снимаемые на время массовой загрузки
+_INSERT_TRIGGERS = ("books_counts_ai", "authors_total_ai")
+
+
+def is_supported(engine: Engine) -> bool:
+    return engine.dialect.name == "sqlite"
+
+
+def _existing_triggers(conn) -> set:
+    return set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'trigger'")).scalars())
+
+
+def create_book_counters(engine: Engine):
+    if not is_supported(engine):
+        return
+
+    with engine.begin() as conn:
+        missing = set(_TRIGGERS) - _existing_triggers(conn)
+        for name in missing:
+            conn.execute(text(_TRIGGERS[name]))
+
+    # Пока триггеров не было, книги могли добавляться без учёта в счётчиках
+    if missing:
+        reconcile_book_counts(engine)
+
+
+def reconcile_book_counts(engine: Engine) -> dict:
+    """Пересчитывает счётчики по таблице books; возвращает число исправленных строк."""
+    fixed = {}
+    with engine.begin() as conn:
+        for table, column in _COUNTED:
+            actual = f"(SELECT COUNT(*) FROM books WHERE books.{column} = {table}.id)"
+            result = conn.execute(text(
+                f"UPDATE {table} SET book_count = {actual}, updated_at = CURRENT_TIMESTAMP "
+                f"WHERE book_count != {actual}"
+            ))
+            fixed[table] = result.rowcount
+        result = conn.execute(text(
+            "INSERT INTO catalog_counts (name, value) VALUES ('authors', (SELECT COUNT(*) FROM authors)) "
+            "ON CONFLICT (name) DO UPDATE SET value = excluded.value WHERE value != excluded.value"
+        ))
+        fixed["catalog_counts"] = result.rowcount
+    return fixed
+
+
+def author_total(db: Session) -> int:
+    """Число авторов: из catalog_counts, без триггеров - COUNT(*) по authors."""
+    if is_supported(db.get_bind()):
+        total = db.scalar(select(models.CatalogCount.value).where(models.CatalogCount.name == "authors"))
+        if total is not None:
+            return total
+    return db.scalar(select(func.count(models.Author.id)))
+
+
+@contextmanager
+def deferred_book_counts(engine: Engine):
+    """Массовая загрузка книг без построчного обновления счётчиков.
+
+    Триггеры вставки снимаются на время загрузки, после неё счётчики
+    пересчитываются одним UPDATE на таблицу.
+    """
+    if not is_supported(engine):
+        yield
+        return
+
+    with engine.begin() as conn:
+        for name in _INSERT_TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    try:
+        yield
+    finally:
+        create_book_counters(engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Счётчики книг авторов и жанров")
+    parser.add_argument("command", choices=["reconcile"])
+    parser.parse_args()
+
+    from library_api.db import engine, init_db
+
+    init_db(engine)
+    fixed = reconcile_book_counts(engine)
+    print(", ".join(f"{table}: {count} fixed" for table, count in fixed.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,112 @@
-from sqlalchemy import create_engine
+import itertools
+from functools import lru_cache
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import sessionmaker
 
+from library_api.config import settings
+from library_api.counters import create_book_counters
+from library_api.metrics import instrument_engine, instrument_sessions
+from library_api.migrations import upgrade
 from library_api.models.database import Base
+from library_api.replicas import reads_from_replica
+from library_api.search import create_search_index
+
+SQLALCHEMY_DATABASE_URL = settings.database_url
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def is_sqlite(url) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def engine_options(url) -> dict:
+    url = make_url(url)
+    options = {}
+    if is_sqlite(url):
+        options["connect_args"] = {"check_same_thread": False}
+        # Для базы в памяти SQLAlchemy использует пул без очереди
+        if url.database in (None, "", ":memory:"):
+            return options
+
+    options.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+    return options
+
+
+def apply_sqlite_pragmas(engine: Engine, read_only: bool = False):
+    # WAL позволяет читателям не ждать писателя, busy_timeout - ждать блокировку
+    # вместо мгновенной ошибки "database is locked"
+    pragmas = [
+        f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}",
+        f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}",
+        f"PRAGMA cache_size={int(settings.sqlite_cache_size)}",
+    ]
+    if read_only:
+        # Режим журнала меняется только записью в файл; query_only запрещает запись
+        pragmas.append("PRAGMA query_only=ON")
+    else:
+        pragmas[:0] = [
+            f"PRAGMA journal_mode={settings.sqlite_journal_mode}",
+            f"PRAGMA synchronous={settings.sqlite_synchronous}",
+        ]
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./library.db"
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
+if is_sqlite(SQLALCHEMY_DATABASE_URL):
+    apply_sqlite_pragmas(engine)
+if settings.metrics_enabled:
+    instrument_engine(engine)
+    if settings.metrics_count_rows:
+        instrument_sessions()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-# Создание всех таблиц
-Base.metadata.create_all(bind=engine)
+
+def replica_engine(url: str) -> Engine:
+    replica = create_engine(url, **engine_options(url))
+    if is_sqlite(url):
+        apply_sqlite_pragmas(replica, read_only=True)
+    if settings.metrics_enabled:
+        instrument_engine(replica)
+    return replica
+
+
+replica_engines = [replica_engine(url) for url in settings.read_replica_urls]
+_next_replica = itertools.cycle(replica_engines)
+
+
+def init_db(bind: Engine = engine) -> list:
+    """Таблицы, миграции, поисковый индекс и счётчики книг.
+
+    Выполняется один раз при запуске (lifespan приложения, run.py до
+    создания рабочих процессов или python -m library_api.migrations), а не
+    при импорте модуля в каждом процессе. Возвращает применённые миграции.
+    """
+    Base.metadata.create_all(bind=bind)
+    changes = upgrade(bind)
+    create_search_index(bind)
+    create_book_counters(bind)
+    return changes
 
 
 def get_db():
@@ -19,4 +114,72 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def read_engine() -> Engine:
+    """Реплика по кругу или основная база (реплик нет, клиент недавно писал)."""
+    if not reads_from_replica():
+        return engine
+    return next(_next_replica)
+
+
+def get_read_db():
+    # Зависимость GET-обработчиков; записи идут через get_db
+    db = SessionLocal(bind=read_engine())
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def async_url(url: str) -> str:
+    """URL с асинхронным драйвером (sqlite -> aiosqlite, postgresql -> asyncpg)."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Нет асинхронного драйвера для {backend}, задайте LIBRARY_ASYNC_DATABASE_URL")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def get_async_database_url() -> str:
+    if settings.async_database_url:
+        return settings.async_database_url
+    return async_url(SQLALCHEMY_DATABASE_URL)
+
+
+def _async_engine(url: str, read_only: bool = False):
+    # Импорт здесь, чтобы синхронный режим не требовал aiosqlite/asyncpg
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async_engine = create_async_engine(url, **engine_options(url))
+    if is_sqlite(url):
+        apply_sqlite_pragmas(async_engine.sync_engine, read_only=read_only)
+    if settings.metrics_enabled:
+        instrument_engine(async_engine.sync_engine)
+    return async_engine
+
+
+@lru_cache
+def get_async_sessionmaker():
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    # Объекты не истекают после commit: ответ сериализуется уже вне сессии
+    return async_sessionmaker(bind=_async_engine(get_async_database_url()), autoflush=False, expire_on_commit=False)
+
+
+@lru_cache
+def _next_async_replica():
+    return itertools.cycle([_async_engine(async_url(url), read_only=True) for url in settings.read_replica_urls])
+
+
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+async def get_async_read_db():
+    # Асинхронный вариант get_read_db: реплика по кругу или основная база
+    options = {"bind": next(_next_async_replica())} if reads_from_replica() else {}
+    async with get_async_sessionmaker()(**options) as db:
+        yield db
@@ -0,0 +1,61 @@
+"""
+Streaming export of the book catalog (NDJSON / CSV)
+"""
+import csv
+import io
+
+from library_api import models
+from library_api.fastjson import book_dict, dumps
+
+EXPORT_COLUMNS = [
+    models.Book.id,
+    models.Book.title,
+    models.Book.isbn,
+    models.Book.publication_year,
+    models.Book.description,
+    models.Book.page_count,
+    models.Book.created_at,
+    models.Book.author_id,
+    models.Book.genre_id,
+    models.Author.name.label("author_name"),
+    models.Author.bio.label("author_bio"),
+    models.Genre.name.label("genre_name"),
+]
+
+CSV_HEADER = [
+    "id", "title", "isbn", "publication_year", "description", "page_count",
+    "created_at", "author_id", "author_name", "genre_id", "genre_name",
+]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def encode_ndjson(partitions):
+    # Структура строк совпадает со схемой schemas.Book
+    for rows in partitions:
+        yield b"".join(dumps(book_dict(row)) + b"\n" for row in rows)
+
+
+def encode_csv(partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for rows in partitions:
+        for row in rows:
+            writer.writerow([
+                row.id, row.title, row.isbn, row.publication_year, row.description,
+                row.page_count, row.created_at.isoformat() if row.created_at else None,
+                row.author_id, row.author_name, row.genre_id, row.genre_name,
+            ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+ENCODERS = {
+    "ndjson": encode_ndjson,
+    "csv": encode_csv,
+}
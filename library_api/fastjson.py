@@ -0,0 +1,79 @@
+"""
+Fast JSON path for book rows
+
+Book lists are read with a column-only select (``BOOK_COLUMNS``), turned into
+plain dicts shaped exactly like ``schemas.Book`` and encoded once with orjson
+(the stdlib ``json`` module is used when orjson is not installed). No ORM
+objects are built and no Pydantic validation runs on the way out.
+"""
+import json
+from datetime import datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from library_api import models
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Колонки, из которых собирается schemas.Book, плюс версии и время изменения для ETag
+BOOK_COLUMNS = [
+    models.Book.id,
+    models.Book.title,
+    models.Book.isbn,
+    models.Book.publication_year,
+    models.Book.description,
+    models.Book.page_count,
+    models.Book.created_at,
+    models.Book.author_id,
+    models.Book.genre_id,
+    models.Author.name.label("author_name"),
+    models.Author.bio.label("author_bio"),
+    models.Genre.name.label("genre_name"),
+    models.Book.version,
+    models.Author.version.label("author_version"),
+    models.Genre.version.label("genre_version"),
+]
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def book_dict(row) -> dict:
+    # Порядок ключей совпадает с model_dump_json() для schemas.Book
+    return {
+        "title": row.title,
+        "isbn": row.isbn,
+        "publication_year": row.publication_year,
+        "description": row.description,
+        "page_count": row.page_count,
+        "author_id": row.author_id,
+        "genre_id": row.genre_id,
+        "id": row.id,
+        "created_at": row.created_at,
+        "author": {"name": row.author_name, "bio": row.author_bio, "id": row.author_id},
+        "genre": {"name": row.genre_name, "id": row.genre_id},
+    }
+
+
+def row_versions(row) -> tuple:
+    return row.id, row.version, row.author_version, row.genre_version
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse на orjson; включается настройкой fast_json_responses."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,175 @@
+"""
+Synthetic catalog generator for load testing
+
+Fills the database up to the requested number of authors, genres and books
+with multi-row INSERTs. Books are spread over authors and genres with a Zipf
+distribution, so a few authors and genres own most of the catalog, like in a
+real library. The same --seed always produces the same data.
+
+Usage:
+    python -m library_api.generate_data --books 1000000 --authors 50000 --genres 200
+"""
+import argparse
+import bisect
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Engine
+
+from library_api import models
+from library_api.bulk import chunked
+from library_api.counters import deferred_book_counts
+from library_api.migrations import analyze
+from library_api.search import deferred_search_index
+
+FIRST_NAMES = [
+    "Александр", "Анна", "Борис", "Вера", "Григорий", "Дарья", "Евгений", "Елена", "Иван", "Ирина",
+    "Константин", "Людмила", "Михаил", "Наталья", "Олег", "Ольга", "Павел", "Светлана", "Фёдор", "Юлия",
+]
+LAST_NAMES = [
+    "Иванов", "Петров", "Смирнов", "Кузнецов", "Попов", "Соколов", "Лебедев", "Козлов", "Новиков",
+    "Морозов", "Волков", "Зайцев", "Павлов", "Семёнов", "Голубев", "Виноградов", "Богданов", "Орлов",
+]
+GENRE_NAMES = [
+    "Роман", "Поэзия", "Драма", "Фантастика", "Фэнтези", "Детектив", "Приключения", "Биография",
+    "Исторический роман", "Научная литература", "Триллер", "Мемуары", "Сказки", "Публицистика",
+]
+TITLE_WORDS = [
+    "тайна", "последний", "дом", "война", "мир", "ночь", "город", "море", "сад", "дорога", "зима",
+    "письма", "тень", "свет", "время", "остров", "путь", "память", "история", "звезда", "лес", "река",
+]
+DESCRIPTION_WORDS = TITLE_WORDS + [
+    "герой", "семья", "любовь", "поиск", "открытие", "судьба", "выбор", "прошлое", "будущее", "друг",
+]
+
+
+def zipf_cum_weights(count: int, exponent: float) -> list:
+    # Вес k-го по популярности элемента пропорционален 1 / k^exponent
+    return list(accumulate(1.0 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def _existing_count(engine: Engine, model) -> int:
+    with engine.connect() as conn:
+        return conn.scalar(select(func.count()).select_from(model))
+
+
+def _ids(engine: Engine, model) -> list:
+    with engine.connect() as conn:
+        return list(conn.scalars(select(model.id).order_by(model.id)))
+
+
+def _insert(engine: Engine, model, rows, batch_size: int) -> int:
+    inserted = 0
+    for batch in chunked(rows, batch_size):
+        with engine.begin() as conn:
+            conn.execute(insert(model), batch)
+        inserted += len(batch)
+    return inserted
+
+
+def _timestamps(rng: random.Random, count: int, years: int = 20) -> list:
+    now = datetime.utcnow()
+    span = int(timedelta(days=365 * years).total_seconds())
+    return [now - timedelta(seconds=rng.randrange(span)) for _ in range(count)]
+
+
+def generate_authors(engine: Engine, target: int, rng: random.Random, batch_size: int) -> int:
+    start = _existing_count(engine, models.Author)
+    rows = []
+    for number, created in zip(range(start, target), _timestamps(rng, max(target - start, 0))):
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {number}"
+        bio = None if rng.random() < 0.2 else " ".join(rng.choices(DESCRIPTION_WORDS, k=rng.randint(5, 20)))
+        rows.append({"name": name, "bio": bio, "updated_at": created})
+    return _insert(engine, models.Author, rows, batch_size)
+
+
+def generate_genres(engine: Engine, target: int, rng: random.Random, batch_size: int) -> int:
+    start = _existing_count(engine, models.Genre)
+    # Названия жанров уникальны, поэтому к базовому названию добавляется номер
+    rows = [
+        {"name": f"{GENRE_NAMES[number % len(GENRE_NAMES)]} {number}", "updated_at": datetime.utcnow()}
+        for number in range(start, target)
+    ]
+    return _insert(engine, models.Genre, rows, batch_size)
+
+
+def _book_rows(rng: random.Random, start: int, count: int, author_ids: list, genre_ids: list, skew: float):
+    # Популярность не совпадает с порядком id: ранги раздаются в случайном порядке
+    author_ranked = rng.sample(author_ids, len(author_ids))
+    genre_ranked = rng.sample(genre_ids, len(genre_ids))
+    author_weights = zipf_cum_weights(len(author_ranked), skew)
+    genre_weights = zipf_cum_weights(len(genre_ranked), skew)
+    author_total, genre_total = author_weights[-1], genre_weights[-1]
+
+    for number, created in zip(range(start, start + count), _timestamps(rng, count)):
+        author_id = author_ranked[bisect.bisect(author_weights, rng.random() * author_total)]
+        genre_id = genre_ranked[bisect.bisect(genre_weights, rng.random() * genre_total)]
+        yield {
+            "title": " ".join(rng.choices(TITLE_WORDS, k=rng.randint(1, 4))).capitalize() + f" {number}",
+            "isbn": f"978{number:010d}",
+            "publication_year": rng.randint(1800, 2024),
+            "description": None if rng.random() < 0.3 else " ".join(rng.choices(DESCRIPTION_WORDS, k=rng.randint(10, 40))),
+            "page_count": None if rng.random() < 0.1 else rng.randint(50, 1200),
+            "created_at": created,
+            "updated_at": created,
+            "author_id": author_id,
+            "genre_id": genre_id,
+        }
+
+
+def generate_books(engine: Engine, target: int, rng: random.Random, batch_size: int, skew: float) -> int:
+    start = _existing_count(engine, models.Book)
+    count = max(target - start, 0)
+    author_ids, genre_ids = _ids(engine, models.Author), _ids(engine, models.Genre)
+    if count and (not author_ids or not genre_ids):
+        raise ValueError("Для книг нужны хотя бы один автор и один жанр")
+
+    inserted = 0
+    rows = _book_rows(rng, start, count, author_ids, genre_ids, skew)
+    with deferred_search_index(engine), deferred_book_counts(engine):
+        while True:
+            batch = [row for _, row in zip(range(batch_size), rows)]
+            if not batch:
+                break
+            inserted += _insert(engine, models.Book, batch, batch_size)
+    return inserted
+
+
+def generate(engine: Engine, books: int, authors: int, genres: int,
+             skew: float = 1.1, seed: int = 42, batch_size: int = 10000) -> dict:
+    """Дополняет каталог до заданного числа записей; возвращает число вставленных строк."""
+    rng = random.Random(seed)
+    inserted = {
+        "authors": generate_authors(engine, authors, rng, batch_size),
+        "genres": generate_genres(engine, genres, rng, batch_size),
+        "books": generate_books(engine, books, rng, batch_size, skew),
+    }
+    # После массовой загрузки статистика планировщика устаревает
+    analyze(engine)
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Генерация синтетического каталога")
+    parser.add_argument("--books", type=int, default=100000, help="Итоговое число книг")
+    parser.add_argument("--authors", type=int, default=5000, help="Итоговое число авторов")
+    parser.add_argument("--genres", type=int, default=100, help="Итоговое число жанров")
+    parser.add_argument("--skew", type=float, default=1.1, help="Показатель распределения Ципфа")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=10000, help="Строк в одном INSERT")
+    args = parser.parse_args()
+
+    from library_api.db import engine, init_db
+
+    init_db(engine)
+    started = time.perf_counter()
+    inserted = generate(engine, args.books, args.authors, args.genres, args.skew, args.seed, args.batch_size)
+    elapsed = time.perf_counter() - started
+    print(", ".join(f"{name}: +{count}" for name, count in inserted.items()) + f" in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
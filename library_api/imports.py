@@ -0,0 +1,300 @@
+"""
+Background import of books from CSV / NDJSON files
+
+POST /api/v1/jobs/imports stores the uploaded file in ``import_dir`` and
+creates an import_jobs row; a thread pool (import_queue) runs the job.
+Authors and genres are referenced by name and resolved, or created, through
+per-job name -> id maps. Workers in different processes may create the same
+name at once; unique genre names and authors.import_name turn that into an
+IntegrityError, and the batch is retried with the names re-read. Books are
+inserted in batches of ``import_batch_size`` rows, and each batch is
+committed together with the job progress. A job
+interrupted by a restart continues from the last committed row
+(requeue_interrupted, ImportQueue.resume).
+"""
+import csv
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from typing import Optional
+
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from library_api import models, schemas
+from library_api.bulk import IN_CHUNK_SIZE, chunked, fetch_existing, validation_detail
+from library_api.cache import response_cache
+from library_api.config import settings
+from library_api.db import SessionLocal
+from library_api.totals import totals_cache
+
+logger = logging.getLogger("library_api.imports")
+
+# Сколько раз пакет выполняется, если другой импорт успел создать те же имена
+WRITE_ATTEMPTS = 3
+
+
+def read_rows(path: str, format: str):
+    """(номер строки файла, dict или None для нечитаемой строки) по каждой записи."""
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        if format == "csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                # Пустые ячейки - отсутствующие значения, лишние ячейки (ключ None) отбрасываются
+                yield reader.line_num, {key: value for key, value in row.items() if key and value not in ("", None)}
+            return
+
+        for number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                item = None
+            yield number, item if isinstance(item, dict) else None
+
+
+def _resolve_names(db: Session, model, known: dict, names: set, import_column=None) -> dict:
+    """{имя: id} для имён, которых ещё нет в known; недостающие записи создаются.
+
+    import_column - уникальная колонка, в которую записывается имя созданной
+    записи, если само имя не уникально (authors.import_name).
+    """
+    resolved = {}
+    missing = sorted(names - known.keys())
+    for chunk in chunked(missing, IN_CHUNK_SIZE):
+        # Имя автора не уникально: используется самый ранний
+        query = select(model.name, func.min(model.id)).where(model.name.in_(chunk)).group_by(model.name)
+        resolved.update(db.execute(query).all())
+        rest = [name for name in chunk if name not in resolved]
+        if import_column is not None and rest:
+            # Созданный импортом автор мог быть с тех пор переименован
+            resolved.update(db.execute(select(import_column, model.id).where(import_column.in_(rest))).all())
+
+    new = [
+        {"name": name, **({import_column.key: name} if import_column is not None else {})}
+        for name in missing if name not in resolved
+    ]
+    if new:
+        for new_id, name in db.execute(insert(model).returning(model.id, model.name), new):
+            resolved[name] = new_id
+    return resolved
+
+
+def _write_batch(job_id: int, rows: list, errors: list, authors: dict, genres: dict, batch_size: int) -> dict:
+    """Вставляет пакет и фиксирует прогресс задачи одной транзакцией; возвращает теги кэша."""
+    with SessionLocal() as db:
+        new_authors = _resolve_names(
+            db, models.Author, authors, {row.author for _, row in rows}, models.Author.import_name
+        )
+        new_genres = _resolve_names(db, models.Genre, genres, {row.genre for _, row in rows})
+        author_ids, genre_ids = {**authors, **new_authors}, {**genres, **new_genres}
+
+        existing_isbns = fetch_existing(db, models.Book.isbn, {row.isbn for _, row in rows if row.isbn})
+        values, seen_isbns = [], set()
+        for line, row in rows:
+            if row.isbn:
+                if row.isbn in existing_isbns or row.isbn in seen_isbns:
+                    errors.append({"line": line, "detail": "Книга с таким ISBN уже существует"})
+                    continue
+                seen_isbns.add(row.isbn)
+            values.append({
+                **row.model_dump(exclude={"author", "genre"}),
+                "author_id": author_ids[row.author],
+                "genre_id": genre_ids[row.genre],
+            })
+        if values:
+            db.execute(insert(models.Book), values)
+
+        job = db.get(models.ImportJob, job_id)
+        job.processed_rows += batch_size
+        job.created_rows += len(values)
+        job.error_count += len(errors)
+        stored = json.loads(job.errors)
+        if len(stored) < settings.import_max_errors:
+            job.errors = json.dumps(stored + errors[:settings.import_max_errors - len(stored)], ensure_ascii=False)
+        db.commit()
+
+    # Созданные в транзакции id попадают в словари только после commit
+    authors.update(new_authors)
+    genres.update(new_genres)
+    return {
+        "author_books": {item["author_id"] for item in values},
+        "genre_books": {item["genre_id"] for item in values},
+    }
+
+
+def _process_batch(job_id: int, batch: list, authors: dict, genres: dict):
+    rows, errors = [], []
+    for line, raw in batch:
+        if raw is None:
+            errors.append({"line": line, "detail": "Некорректная строка"})
+            continue
+        try:
+            rows.append((line, schemas.BookImportRow.model_validate(raw)))
+        except ValidationError as exc:
+            errors.append({"line": line, "detail": validation_detail(exc)})
+
+    for attempt in range(WRITE_ATTEMPTS):
+        try:
+            tags = _write_batch(job_id, rows, list(errors), authors, genres, len(batch))
+            break
+        except IntegrityError:
+            # Другой импорт успел создать тот же жанр, автора или книгу с тем же
+            # ISBN: пакет откатан и повторяется с перечитанными именами и ISBN
+            if attempt == WRITE_ATTEMPTS - 1:
+                raise
+
+    totals_cache.invalidate()
+    response_cache.invalidate(
+        "books", "authors", "genres",
+        *[f"author_books:{author_id}" for author_id in tags["author_books"]],
+        *[f"genre_books:{genre_id}" for genre_id in tags["genre_books"]],
+    )
+
+
+def run_job(job_id: int, stop: threading.Event) -> bool:
+    """Выполняет задачу с места остановки; False, если она прервана остановкой."""
+    with SessionLocal() as db:
+        job = db.get(models.ImportJob, job_id)
+        path, format, skip = job.path, job.format, job.processed_rows
+
+    authors, genres = {}, {}
+    batch = []
+    for item in islice(read_rows(path, format), skip, None):
+        batch.append(item)
+        if len(batch) >= settings.import_batch_size:
+            _process_batch(job_id, batch, authors, genres)
+            batch = []
+            if stop.is_set():
+                return False
+    if batch:
+        _process_batch(job_id, batch, authors, genres)
+    return True
+
+
+def _set_status(job_id: int, status: str, **values):
+    with SessionLocal() as db:
+        db.execute(update(models.ImportJob).where(models.ImportJob.id == job_id).values(status=status, **values))
+        db.commit()
+
+
+class ImportQueue:
+    """Пул потоков, выполняющих задачи импорта."""
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._executor = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def submit(self, job_id: int):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="import")
+            self._executor.submit(self._run, job_id)
+
+    def resume(self):
+        """Ставит в очередь задачи в статусе queued (в том числе прерванные перезапуском)."""
+        with SessionLocal() as db:
+            job_ids = db.execute(
+                select(models.ImportJob.id).where(models.ImportJob.status == "queued").order_by(models.ImportJob.id)
+            ).scalars().all()
+        for job_id in job_ids:
+            self.submit(job_id)
+
+    def shutdown(self):
+        # Выполняемые задачи останавливаются после текущего пакета и возвращаются в queued
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            self._stop.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            self._stop.clear()
+
+    def _claim(self, job_id: int) -> bool:
+        # Задачу берёт один поток одного процесса
+        with SessionLocal() as db:
+            claimed = db.execute(
+                update(models.ImportJob)
+                .where(models.ImportJob.id == job_id, models.ImportJob.status == "queued")
+                .values(status="running", started_at=datetime.utcnow(), started_rows=models.ImportJob.processed_rows)
+            ).rowcount
+            db.commit()
+        return claimed == 1
+
+    def _run(self, job_id: int):
+        if not self._claim(job_id):
+            return
+        try:
+            finished = run_job(job_id, self._stop)
+        except Exception as error:
+            logger.exception("Import job %s failed", job_id)
+            _set_status(job_id, "failed", detail=str(error), finished_at=datetime.utcnow())
+            return
+
+        if not finished:
+            _set_status(job_id, "queued")
+            return
+        _set_status(
+            job_id, "done", finished_at=datetime.utcnow(), total_rows=models.ImportJob.processed_rows
+        )
+        with SessionLocal() as db:
+            path = db.get(models.ImportJob, job_id).path
+        if os.path.exists(path):
+            os.remove(path)
+
+
+import_queue = ImportQueue(settings.import_workers)
+
+
+def requeue_interrupted(engine: Engine):
+    """running при запуске - задачи, прерванные остановкой процесса; выполняется один раз до рабочих процессов."""
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE import_jobs SET status = 'queued' WHERE status = 'running'"))
+
+
+def create_job(path: str, format: str, total_rows: Optional[int]) -> models.ImportJob:
+    with SessionLocal() as db:
+        job = models.ImportJob(path=path, format=format, total_rows=total_rows)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+
+def job_status(job: models.ImportJob) -> schemas.ImportJob:
+    if job.status == "done":
+        progress = 1.0
+    else:
+        progress = min(job.processed_rows / job.total_rows, 1.0) if job.total_rows else 0.0
+
+    rows_per_second = None
+    if job.started_at is not None and job.processed_rows > job.started_rows:
+        elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+        if elapsed > 0:
+            rows_per_second = round((job.processed_rows - job.started_rows) / elapsed, 1)
+
+    return schemas.ImportJob(
+        id=job.id,
+        status=job.status,
+        format=job.format,
+        total_rows=job.total_rows,
+        processed_rows=job.processed_rows,
+        created_rows=job.created_rows,
+        error_count=job.error_count,
+        progress=round(progress, 4),
+        rows_per_second=rows_per_second,
+        errors=json.loads(job.errors),
+        detail=job.detail,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
@@ -1,7 +1,37 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from library_api.routers import books, authors, genres
+from fastapi.responses import JSONResponse, PlainTextResponse
+from library_api.routers import books, authors, genres, jobs, stats
 from library_api import models
-from library_api.db import engine
+from library_api.cache import response_cache
+from library_api.compression import CompressionMiddleware
+from library_api.config import settings
+from library_api.db import SessionLocal, engine, init_db
+from library_api.fastjson import FastJSONResponse
+from library_api.imports import import_queue, requeue_interrupted
+from library_api.metrics import MetricsMiddleware, registry
+from library_api.openapi import cache_openapi
+from library_api.reference import reference_cache
+from library_api.replicas import ReadYourWritesMiddleware, replicas_enabled
+from library_api.singleflight import SingleFlightMiddleware
+from library_api.writer import group_writer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.init_db_on_startup:
+        init_db()
+        requeue_interrupted(engine)
+        # Общий (sqlite) кэш мог пережить перезапуск, а данные - измениться
+        response_cache.clear()
+    with SessionLocal() as db:
+        reference_cache.load(db)
+    import_queue.resume()
+    yield
+    import_queue.shutdown()
+    if group_writer is not None:
+        group_writer.close()
 
 
 app = FastAPI(
@@ -9,13 +39,47 @@ app = FastAPI(
     description="Комплексный API для управления книгами в библиотеке с CRUD-операциями, фильтрацией, сортировкой и пагинацией",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse if settings.fast_json_responses else JSONResponse
 )
 
 
-app.include_router(books.router)
-app.include_router(authors.router)
-app.include_router(genres.router)
+# Внутренний middleware: ожидающие запросы получают несжатое тело и сжимают его
+# по своему Accept-Encoding, а выбор реплики уже известен (ReadYourWritesMiddleware)
+if settings.single_flight_enabled:
+    app.add_middleware(SingleFlightMiddleware, timeout=settings.single_flight_timeout)
+
+
+if settings.compression_enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality
+    )
+
+
+if replicas_enabled():
+    app.add_middleware(ReadYourWritesMiddleware, cache=response_cache)
+
+
+# Добавленный последним middleware - внешний: время сжатия входит в метрики
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware, server_timing=settings.server_timing)
+
+
+if settings.async_mode:
+    from library_api.routers.aio import make_async_router
+
+    for router in (books.router, authors.router, genres.router, stats.router, jobs.router):
+        app.include_router(make_async_router(router))
+else:
+    app.include_router(books.router)
+    app.include_router(authors.router)
+    app.include_router(genres.router)
+    app.include_router(stats.router)
+    app.include_router(jobs.router)
 
 
 @app.get("/")
@@ -24,4 +88,19 @@ def read_root():
         "message": "Библиотека",
         "docs": "/docs",
         "redoc": "/redoc"
-    }
\ No newline at end of file
+    }
+
+
+@app.get("/api/v1/cache/stats", tags=["cache"])
+def get_cache_stats():
+    return {**response_cache.stats(), "reference": reference_cache.stats()}
+
+
+@app.get("/metrics", tags=["metrics"], response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    # Формат Prometheus text exposition 0.0.4
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# Схема OpenAPI строится при первом запросе /openapi.json (или /docs), а не при запуске
+cache_openapi(app)
@@ -0,0 +1,241 @@
+"""
+Per-request metrics: latency histograms, SQL statement counts and timings
+
+MetricsMiddleware times every request and keeps per-request SQL statistics
+in a context variable; engine and session event hooks (instrument_engine,
+instrument_sessions) add the statements, their duration and the rows they
+changed (and, with metrics_count_rows, the rows ORM selects returned). Aggregates are rendered in Prometheus text format on /metrics.
+Optionally every response gets a Server-Timing header, and statements slower
+than a threshold are logged.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from library_api.config import settings
+
+logger = logging.getLogger("library_api.sql")
+
+# Границы корзин гистограмм, секунды
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+WRITE_BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class RequestStats:
+    __slots__ = ("path", "sql_count", "sql_time", "rows")
+
+    def __init__(self, path: str = ""):
+        self.path = path
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.rows = 0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.sql_per_request = defaultdict(lambda: Histogram(SQL_COUNT_BUCKETS))
+        self.requests = defaultdict(int)
+        self.sql_statements = defaultdict(int)
+        self.sql_seconds = defaultdict(float)
+        self.sql_rows = defaultdict(int)
+        self.slow_queries = 0
+        self.write_batches = Histogram(WRITE_BATCH_BUCKETS)
+        self.coalesced = defaultdict(int)
+
+    def observe_request(self, method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+        with self._lock:
+            self.requests[(method, route, str(status))] += 1
+            self.latency[(method, route)].observe(elapsed)
+            self.sql_per_request[(method, route)].observe(stats.sql_count)
+            self.sql_statements[(method, route)] += stats.sql_count
+            self.sql_seconds[(method, route)] += stats.sql_time
+            self.sql_rows[(method, route)] += stats.rows
+
+    def observe_slow_query(self):
+        with self._lock:
+            self.slow_queries += 1
+
+    def observe_write_batch(self, size: int):
+        with self._lock:
+            self.write_batches.observe(size)
+
+    def observe_coalesced(self, outcome: str):
+        with self._lock:
+            self.coalesced[(outcome,)] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            _counter(lines, "http_requests_total", "Обработанные запросы",
+                     ("method", "route", "status"), self.requests)
+            _histogram(lines, "http_request_duration_seconds", "Время обработки запроса",
+                       ("method", "route"), self.latency)
+            _histogram(lines, "db_statements_per_request", "SQL-запросов на HTTP-запрос",
+                       ("method", "route"), self.sql_per_request)
+            _counter(lines, "db_statements_total", "Выполненные SQL-запросы", ("method", "route"), self.sql_statements)
+            _counter(lines, "db_statement_duration_seconds_total", "Суммарное время SQL-запросов",
+                     ("method", "route"), self.sql_seconds)
+            _counter(lines, "db_rows_total", "Строки, возвращённые или изменённые SQL-запросами",
+                     ("method", "route"), self.sql_rows)
+            _counter(lines, "db_slow_statements_total", "SQL-запросы дольше порога slow_query_ms",
+                     (), {(): self.slow_queries})
+            _histogram(lines, "db_write_batch_size", "Записей в одной групповой транзакции",
+                       (), {(): self.write_batches})
+            _counter(lines, "http_coalesced_requests_total",
+                     "GET-запросы, ожидавшие такой же выполняющийся запрос (shared - получили его ответ)",
+                     ("outcome",), self.coalesced)
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.__init__()
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _counter(lines: list, name: str, help_text: str, label_names: tuple, values: dict):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for labels, value in sorted(values.items()):
+        lines.append(f"{name}{_labels(label_names, labels)} {value}")
+
+
+def _histogram(lines: list, name: str, help_text: str, label_names: tuple, histograms: dict):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+            cumulative += count
+            bucket_labels = _labels(label_names, labels, 'le="%s"' % bound)
+            lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+        lines.append(f"{name}_sum{_labels(label_names, labels)} {histogram.total}")
+        lines.append(f"{name}_count{_labels(label_names, labels)} {histogram.count}")
+
+
+registry = MetricsRegistry()
+
+
+def instrument_engine(engine: Engine):
+    """Время и число строк каждого SQL-запроса; медленные запросы пишутся в лог."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.sql_count += 1
+            stats.sql_time += elapsed
+            # Для SELECT rowcount не определён (-1): строки выборок считает
+            # instrument_sessions, если включён metrics_count_rows
+            if cursor.rowcount > 0:
+                stats.rows += cursor.rowcount
+
+        if settings.slow_query_ms and elapsed * 1000 >= settings.slow_query_ms:
+            registry.observe_slow_query()
+            logger.warning(
+                "Slow query %.1f ms [%s]: %s", elapsed * 1000, stats.path if stats else "-",
+                " ".join(statement.split())
+            )
+
+
+def _count_rows(orm_execute_state):
+    if not orm_execute_state.is_select or _current.get() is None:
+        return None
+    # Потоковые выборки (yield_per) не буферизуются, их строки не считаются
+    if orm_execute_state.execution_options.get("yield_per") or orm_execute_state.execution_options.get("stream_results"):
+        return None
+
+    frozen = orm_execute_state.invoke_statement().freeze()
+    _current.get().rows += len(frozen.data)
+    return frozen()
+
+
+def instrument_sessions():
+    """Число строк ORM-выборок. Результат буферизуется ещё раз - только для отладки."""
+    if not event.contains(Session, "do_orm_execute", _count_rows):
+        event.listen(Session, "do_orm_execute", _count_rows)
+
+
+def server_timing(stats: RequestStats, elapsed: float) -> str:
+    return (
+        f'db;dur={stats.sql_time * 1000:.2f};desc="{stats.sql_count} queries, {stats.rows} rows", '
+        f"app;dur={(elapsed - stats.sql_time) * 1000:.2f}, "
+        f"total;dur={elapsed * 1000:.2f}"
+    )
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: задержка, статистика SQL по маршруту и Server-Timing."""
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(f"{scope['method']} {scope['path']}")
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(stats, time.perf_counter() - started).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            # Шаблон пути (/api/v1/books/{book_id}), а не сам путь - иначе метки не ограничены
+            route = getattr(scope.get("route"), "path", "unmatched")
+            registry.observe_request(scope["method"], route, status, time.perf_counter() - started, stats)
@@ -0,0 +1,92 @@
+"""
+Schema upgrades for existing databases
+
+create_all() only creates missing tables, so columns and indexes added to
+the models later are added here. Runs on startup (see library_api.db.init_db)
+and can be run manually, e.g. before starting workers with
+LIBRARY_INIT_DB_ON_STARTUP=false; the command creates the whole schema and
+also refreshes the SQLite planner statistics:
+
+    python -m library_api.migrations
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from library_api.models.database import Base
+
+# Чем заполнить новые колонки в уже существующих строках
+BACKFILL = {
+    ("books", "updated_at"): "created_at",
+    ("authors", "updated_at"): "CURRENT_TIMESTAMP",
+    ("genres", "updated_at"): "CURRENT_TIMESTAMP",
+    ("authors", "book_count"): "(SELECT COUNT(*) FROM books WHERE books.author_id = authors.id)",
+    ("genres", "book_count"): "(SELECT COUNT(*) FROM books WHERE books.genre_id = genres.id)",
+}
+
+
+def add_missing_columns(engine: Engine) -> list:
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" NOT NULL DEFAULT {column.server_default.arg}"
+                conn.execute(text(ddl))
+
+                backfill = BACKFILL.get((table.name, column.name))
+                if backfill:
+                    conn.execute(text(f"UPDATE {table.name} SET {column.name} = {backfill}"))
+                added.append(f"{table.name}.{column.name}")
+    return added
+
+
+def add_missing_indexes(engine: Engine) -> list:
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in sorted(table.indexes, key=lambda index: index.name):
+                if index.name not in existing:
+                    index.create(conn)
+                    added.append(index.name)
+    return added
+
+
+def analyze(engine: Engine):
+    # Статистика индексов (sqlite_stat1) нужна планировщику, чтобы выбирать
+    # индексы, согласованные с ORDER BY, а не сортировку во временном B-дереве
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+
+def upgrade(engine: Engine) -> list:
+    changes = add_missing_columns(engine)
+    indexes = add_missing_indexes(engine)
+    if indexes:
+        analyze(engine)
+    return changes + indexes
+
+
+def main():
+    # Полная инициализация: с LIBRARY_INIT_DB_ON_STARTUP=false приложение её не выполняет
+    from library_api.db import engine, init_db
+
+    changes = init_db(engine)
+    analyze(engine)
+    print("Schema is up to date" if not changes else "Applied: " + ", ".join(changes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+from library_api.models.database import Base, Author, Genre, Book, CatalogCount, ImportJob
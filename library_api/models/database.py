@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey, DateTime, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 from datetime import datetime
@@ -11,20 +11,35 @@ class Author(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(200), nullable=False, index=True)
     bio = Column(Text)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Версия строки: увеличивается при каждом UPDATE через ORM (ETag, If-Match)
+    version = Column(Integer, nullable=False, server_default="1")
+    # Число книг автора: поддерживается триггерами (library_api.counters)
+    book_count = Column(Integer, nullable=False, server_default="0", index=True)
+    # Имя, с которым автор создан фоновым импортом. Уникально: параллельные
+    # импорты не создают одного и того же автора дважды (library_api.imports)
+    import_name = Column(String(200), unique=True, index=True)
     
     # Relationship
     books = relationship("Book", back_populates="author")
 
+    __mapper_args__ = {"version_id_col": version}
+
 
 class Genre(Base):
     __tablename__ = "genres"
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False, unique=True, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, server_default="1")
+    book_count = Column(Integer, nullable=False, server_default="0")
     
     # Relationship
     books = relationship("Book", back_populates="genre")
 
+    __mapper_args__ = {"version_id_col": version}
+
 
 class Book(Base):
     __tablename__ = "books"
@@ -32,15 +47,64 @@ class Book(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(300), nullable=False, index=True)
     isbn = Column(String(20), unique=True, index=True)
-    publication_year = Column(Integer)
+    publication_year = Column(Integer, index=True)
     description = Column(Text)
     page_count = Column(Integer)
     created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = Column(Integer, nullable=False, server_default="1")
     
     # Внешние ключи
-    author_id = Column(Integer, ForeignKey("authors.id"), nullable=False)
-    genre_id = Column(Integer, ForeignKey("genres.id"), nullable=False)
+    author_id = Column(Integer, ForeignKey("authors.id"), nullable=False, index=True)
+    genre_id = Column(Integer, ForeignKey("genres.id"), nullable=False, index=True)
     
     # Отношения
     author = relationship("Author", back_populates="books")
-    genre = relationship("Genre", back_populates="books")
\ No newline at end of file
+    genre = relationship("Genre", back_populates="books")
+
+    # Фильтр по автору или жанру + сортировка get_books читаются из индекса без сортировки;
+    # id (rowid) неявно замыкает каждый индекс SQLite и служит тай-брейкером
+    __table_args__ = (
+        Index("ix_books_author_created_at", "author_id", "created_at"),
+        Index("ix_books_author_publication_year", "author_id", "publication_year"),
+        Index("ix_books_author_title", "author_id", "title"),
+        Index("ix_books_genre_created_at", "genre_id", "created_at"),
+        Index("ix_books_genre_publication_year", "genre_id", "publication_year"),
+        Index("ix_books_genre_title", "genre_id", "title"),
+        # Фильтр по одному из них + сортировка по имени другого
+        Index("ix_books_author_genre", "author_id", "genre_id"),
+    )
+
+    __mapper_args__ = {"version_id_col": version}
+
+
+class CatalogCount(Base):
+    """Счётчики каталога (name = "authors"), поддерживаются триггерами (library_api.counters)."""
+    __tablename__ = "catalog_counts"
+
+    name = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+class ImportJob(Base):
+    """Фоновый импорт книг из файла (library_api.imports)."""
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # queued -> running -> done | failed; running после перезапуска снова становится queued
+    status = Column(String(20), nullable=False, default="queued", index=True)
+    format = Column(String(10), nullable=False)
+    path = Column(String(500), nullable=False)
+    total_rows = Column(Integer)
+    # Обработанные строки фиксируются вместе с пакетом книг: с них продолжается прерванный импорт
+    processed_rows = Column(Integer, nullable=False, default=0)
+    created_rows = Column(Integer, nullable=False, default=0)
+    error_count = Column(Integer, nullable=False, default=0)
+    # JSON-список первых ошибок [{"line": ..., "detail": ...}]
+    errors = Column(Text, nullable=False, default="[]")
+    detail = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    # processed_rows на момент запуска: скорость считается по текущему запуску
+    started_rows = Column(Integer, nullable=False, default=0)
+    finished_at = Column(DateTime)
@@ -0,0 +1,45 @@
+"""
+Lazily built, cached OpenAPI document
+
+FastAPI builds the schema on the first request to /openapi.json, but
+serializes the whole dict again on every request. cache_openapi replaces
+that route with one that serializes the schema once, on first use (never at
+import or startup), and serves the cached bytes with an ETag, so clients
+and proxies can revalidate it with If-None-Match and get 304.
+"""
+from fastapi import FastAPI, Request, Response
+from fastapi.routing import APIRoute
+from starlette.routing import Route
+
+from library_api.conditional import conditional, make_etag
+from library_api.fastjson import dumps
+
+
+class _CachedOpenAPI:
+    def __init__(self, app: FastAPI):
+        self.app = app
+        self.body = None
+        self.headers = None
+
+    def response(self) -> Response:
+        if self.body is None:
+            self.body = dumps(self.app.openapi())
+            # Схема меняется только с кодом: no-cache - хранить, но сверять ETag
+            self.headers = {"etag": make_etag("openapi", self.body), "cache-control": "no-cache"}
+        return Response(self.body, media_type="application/json", headers=self.headers)
+
+
+def cache_openapi(app: FastAPI):
+    """Заменяет маршрут app.openapi_url кэширующим; вызывать после подключения роутеров."""
+    if not app.openapi_url:
+        return
+    cached = _CachedOpenAPI(app)
+
+    def openapi(request: Request) -> Response:
+        return conditional(request, cached.response())
+
+    app.router.routes = [
+        route for route in app.router.routes
+        if not (isinstance(route, Route) and not isinstance(route, APIRoute) and route.path == app.openapi_url)
+    ]
+    app.add_route(app.openapi_url, openapi, include_in_schema=False)
@@ -0,0 +1,87 @@
+"""
+Keyset (cursor) pagination helpers for list endpoints
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, false, or_
+
+
+def _dump_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _load_value(value):
+    if isinstance(value, dict):
+        if list(value) != ["dt"] or not isinstance(value["dt"], str):
+            raise ValueError("Некорректная дата в курсоре")
+        return datetime.fromisoformat(value["dt"])
+    # Списки, объекты и bool из подделанного курсора нельзя подставить в SQL
+    if value is not None and (isinstance(value, bool) or not isinstance(value, (str, int, float))):
+        raise ValueError("Некорректное значение в курсоре")
+    return value
+
+
+def encode_cursor(sort_by: str, sort_order: str, values) -> str:
+    payload = {"s": sort_by, "o": sort_order, "v": [_dump_value(v) for v in values]}
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str, size: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, dict) or not isinstance(payload["v"], list):
+            raise ValueError("Некорректный курсор")
+        values = [_load_value(v) for v in payload["v"]]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+    # Курсор действителен только для той сортировки, с которой он был выдан
+    if payload.get("s") != sort_by or payload.get("o") != sort_order or len(values) != size:
+        raise HTTPException(status_code=400, detail="Курсор не соответствует параметрам сортировки")
+    return values
+
+
+def keyset_filters(columns, values, descending: bool) -> list:
+    """Условия "строго после курсора" для ORDER BY columns в одном направлении.
+
+    Возвращает список условий в порядке выдачи строк: страница заполняется
+    из первого, затем (если строк не хватило) из следующего. Каждое условие -
+    один диапазон индекса по первой колонке, поэтому строки читаются из индекса
+    уже упорядоченными, без сортировки.
+
+    Первая колонка может содержать NULL (в SQLite NULL идёт первым при ASC
+    и последним при DESC), остальные колонки считаются NOT NULL.
+    """
+    def after(column, value):
+        return column < value if descending else column > value
+
+    def tail(index):
+        column, value = columns[index], values[index]
+        if index == len(columns) - 1:
+            return after(column, value)
+        return or_(after(column, value), and_(column == value, tail(index + 1)))
+
+    first, first_value = columns[0], values[0]
+    rest = tail(1) if len(columns) > 1 else false()
+
+    if first_value is None:
+        if descending:
+            return [and_(first.is_(None), rest)]
+        return [and_(first.is_(None), rest), first.is_not(None)]
+
+    # first <= v AND (first < v OR ...) вместо (first < v) OR (first = v AND ...):
+    # OR на верхнем уровне планировщик превращает в несколько поисков по индексу
+    # (MULTI-INDEX OR), после которых строки приходится сортировать
+    bound = first <= first_value if descending else first >= first_value
+    segments = [and_(bound, or_(after(first, first_value), rest))]
+    if descending:
+        segments.append(first.is_(None))
+    return segments
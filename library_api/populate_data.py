@@ -8,11 +8,12 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from sqlalchemy.orm import Session
-from library_api.db import SessionLocal
+from library_api.db import SessionLocal, init_db
 from library_api.models import Author, Genre, Book
 
 
 def create_test_data():
+    init_db()
     db: Session = SessionLocal()
     
     try:
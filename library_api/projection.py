@@ -0,0 +1,141 @@
+"""
+Sparse fieldsets for book lists (fields= / expand=)
+
+A projection is a tuple (book_fields, author_fields, genre_fields); relation
+fields are None when the relation is not expanded. Only the columns of the
+projection (plus the ones needed for ETag/Last-Modified) are selected, and
+rows are encoded as dicts shaped like projection_model(projection), a subset
+of schemas.Book. SparseBookPage documents such pages in OpenAPI.
+"""
+from functools import lru_cache
+from typing import Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel, create_model
+
+from library_api import schemas
+from library_api.fastjson import BOOK_COLUMNS
+
+_COLUMNS = {column.key: column for column in BOOK_COLUMNS}
+
+# Поля в порядке schemas.Book, как в полном ответе
+BOOK_FIELDS = tuple(name for name in schemas.Book.model_fields if name not in ("author", "genre"))
+# Поле вложенного объекта -> колонка выборки
+RELATION_FIELDS = {
+    "author": {"name": "author_name", "bio": "author_bio", "id": "author_id"},
+    "genre": {"name": "genre_name", "id": "genre_id"},
+}
+RELATION_SCHEMAS = {"author": schemas.AuthorSummary, "genre": schemas.GenreSummary}
+# Нужны для ETag списка (fastjson.row_versions)
+VALIDATOR_KEYS = ("id", "version", "author_version", "genre_version")
+
+
+def _split(value: str) -> list:
+    return [part.strip() for part in value.split(",") if part.strip()]
+
+
+def parse_projection(fields: Optional[str], expand: Optional[str]) -> Optional[tuple]:
+    """Нормализованная проекция или None, если запрошен полный ответ."""
+    if fields is None and expand is None:
+        return None
+
+    relations = {"author": None, "genre": None}
+    for name in _split(expand or ""):
+        if name not in relations:
+            raise HTTPException(status_code=400, detail=f"Неизвестная связь в expand: {name}")
+        relations[name] = []
+
+    book_fields = list(BOOK_FIELDS) if fields is None else []
+    for field in _split(fields or ""):
+        relation, _, subfield = field.partition(".")
+        if subfield:
+            # author.name раскрывает автора только с указанными полями
+            if relation not in relations or subfield not in RELATION_FIELDS[relation]:
+                raise HTTPException(status_code=400, detail=f"Неизвестное поле: {field}")
+            relations[relation] = (relations[relation] or []) + [subfield]
+        elif field in BOOK_FIELDS:
+            book_fields.append(field)
+        else:
+            raise HTTPException(status_code=400, detail=f"Неизвестное поле: {field}")
+
+    def relation_fields(relation):
+        requested = relations[relation]
+        if requested is None:
+            return None
+        # expand без уточнения полей - связь целиком
+        return tuple(name for name in RELATION_FIELDS[relation] if not requested or name in requested)
+
+    return (
+        tuple(name for name in BOOK_FIELDS if name in book_fields),
+        relation_fields("author"),
+        relation_fields("genre"),
+    )
+
+
+def _relations(projection: tuple) -> list:
+    _, author_fields, genre_fields = projection
+    return [(name, fields) for name, fields in (("author", author_fields), ("genre", genre_fields))
+            if fields is not None]
+
+
+@lru_cache(maxsize=None)
+def projection_columns(projection: tuple) -> list:
+    keys = list(projection[0])
+    for relation, fields in _relations(projection):
+        keys += [RELATION_FIELDS[relation][field] for field in fields]
+    keys += VALIDATOR_KEYS
+    return [_COLUMNS[key] for key in dict.fromkeys(keys)]
+
+
+@lru_cache(maxsize=None)
+def projection_encoder(projection: tuple):
+    """Функция строка -> dict, совместимая с projection_model(projection)."""
+    book_fields = projection[0]
+    relations = [
+        (relation, [(field, RELATION_FIELDS[relation][field]) for field in fields])
+        for relation, fields in _relations(projection)
+    ]
+
+    def encode(row) -> dict:
+        item = {field: getattr(row, field) for field in book_fields}
+        for relation, pairs in relations:
+            item[relation] = {field: getattr(row, key) for field, key in pairs}
+        return item
+
+    return encode
+
+
+@lru_cache(maxsize=None)
+def projection_model(projection: tuple, partial: bool = False) -> type[BaseModel]:
+    """Подмножество schemas.Book с полями проекции (partial - все поля необязательны)."""
+    prefix = "Sparse" if partial else ""
+    suffix = "" if partial else "Projection"
+
+    def fields_of(schema, names):
+        if partial:
+            return {name: (Optional[schema.model_fields[name].annotation], None) for name in names}
+        return {name: (schema.model_fields[name].annotation, schema.model_fields[name]) for name in names}
+
+    definitions = fields_of(schemas.Book, projection[0])
+    for relation, fields in _relations(projection):
+        nested = create_model(
+            f"{prefix}{relation.capitalize()}{suffix}", **fields_of(RELATION_SCHEMAS[relation], fields)
+        )
+        definitions[relation] = (Optional[nested], None)
+    return create_model(f"{prefix}Book{suffix}", **definitions)
+
+
+@lru_cache(maxsize=None)
+def projection_page_model(projection: tuple, partial: bool = False) -> type[BaseModel]:
+    """schemas.PaginatedResponse с элементами projection_model(projection, partial)."""
+    return create_model(
+        "SparseBookPage" if partial else "BookProjectionPage",
+        __base__=schemas.PaginatedResponse,
+        items=(list[projection_model(projection, partial)], ...),
+    )
+
+
+# Полная проекция: любые поля книги, автора и жанра
+FULL_PROJECTION = (BOOK_FIELDS, tuple(RELATION_FIELDS["author"]), tuple(RELATION_FIELDS["genre"]))
+# Страница списка книг при fields/expand: в каждом элементе только запрошенные поля
+SparseBookPage = projection_page_model(FULL_PROJECTION, partial=True)
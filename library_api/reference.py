@@ -0,0 +1,266 @@
+"""
+In-process reference data: authors and genres
+
+Writes check that a book's author and genre exist and that a genre name is
+free. ReferenceCache keeps author id -> name and genre id -> name / name -> id
+in the process memory, loaded at startup (load), so these checks usually cost
+no query. Genres are few and are always held completely: when the genre map
+is not complete, the next check rereads all genres with one query. Authors
+missing from memory are read by id and added.
+
+SQLAlchemy session events keep the cache coherent with the database:
+  * a flushed rename or deletion of an author or genre evicts it at once and
+    again after commit, and a value read during the eviction is not stored
+    (generation check);
+  * authors and genres created through ORM objects are added after commit;
+  * ORM INSERT/UPDATE/DELETE statements on these tables (bulk endpoints,
+    imports) drop the genre map or the authors;
+  * a transaction that has written authors or genres checks them in the
+    database, where its uncommitted rows are visible.
+
+With several worker processes (sqlite response cache backend) a shared
+counter tells the other processes to drop their copy after a commit that
+renamed, deleted or created genres, or renamed or deleted authors.
+"""
+import threading
+from typing import Optional
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from library_api import models
+from library_api.cache import CacheBackend, response_cache
+from library_api.config import settings
+
+# Счётчик изменений справочника в общем кэше (CacheBackend.incr_counter)
+GENERATION_COUNTER = "reference"
+# Ключ session.info: изменения авторов и жанров в текущей транзакции
+INFO_KEY = "reference_changes"
+MODELS = (models.Author, models.Genre)
+
+
+class ReferenceCache:
+    def __init__(self, max_authors: int, enabled: bool = True, shared: Optional[CacheBackend] = None):
+        self.max_authors = max_authors
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._authors = {}
+        self._genre_names = {}
+        self._genre_ids = {}
+        # Полная карта жанров: отсутствие id или названия в ней означает, что такого жанра нет
+        self._genres_complete = False
+        # Растёт при каждом вытеснении: значение, прочитанное до него, не сохраняется
+        self._generation = 0
+        self._shared = shared
+        self._shared_generation = shared.get_counter(GENERATION_COUNTER) if shared else 0
+
+    def load(self, db: Session):
+        """Загрузка при запуске: все жанры и первые max_authors авторов."""
+        if not self.enabled:
+            return
+        with self._lock:
+            generation = self._generation
+        genres = db.execute(select(models.Genre.id, models.Genre.name)).all()
+        authors = db.execute(
+            select(models.Author.id, models.Author.name).order_by(models.Author.id).limit(self.max_authors)
+        ).all()
+        with self._lock:
+            if generation == self._generation:
+                self._set_genres(genres)
+                self._authors = dict(authors)
+
+    def author_exists(self, db: Session, author_id: int) -> bool:
+        if not self._usable(db):
+            return _author_name(db, author_id) is not None
+
+        with self._lock:
+            self._sync_shared()
+            if author_id in self._authors:
+                self.hits += 1
+                return True
+            self.misses += 1
+            generation = self._generation
+
+        name = _author_name(db, author_id)
+        if name is None:
+            return False
+        with self._lock:
+            if generation == self._generation and len(self._authors) < self.max_authors:
+                self._authors[author_id] = name
+        return True
+
+    def genre_exists(self, db: Session, genre_id: int) -> bool:
+        if not self._usable(db):
+            return db.scalar(select(models.Genre.id).where(models.Genre.id == genre_id)) is not None
+        return genre_id in self._genres(db)[0]
+
+    def genre_id(self, db: Session, name: str) -> Optional[int]:
+        """id жанра с таким названием или None."""
+        if not self._usable(db):
+            return db.scalar(select(models.Genre.id).where(models.Genre.name == name))
+        return self._genres(db)[1].get(name)
+
+    def evict(self, model, object_id: Optional[int] = None):
+        """Вытесняет автора (object_id=None - всех авторов) или карту жанров."""
+        with self._lock:
+            self._evict(model, object_id)
+
+    def clear(self):
+        with self._lock:
+            self._drop_all()
+
+    def stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "authors": len(self._authors),
+            "genres": len(self._genre_names) if self._genres_complete else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / requests if requests else 0.0,
+        }
+
+    def _usable(self, db: Session) -> bool:
+        # Транзакция, уже изменившая авторов или жанры, видит свои строки только в базе
+        return self.enabled and INFO_KEY not in db.info
+
+    def _genres(self, db: Session) -> tuple:
+        """(id -> название, название -> id); неполная карта перечитывается целиком."""
+        with self._lock:
+            self._sync_shared()
+            if self._genres_complete:
+                self.hits += 1
+                return self._genre_names, self._genre_ids
+            self.misses += 1
+            generation = self._generation
+
+        rows = db.execute(select(models.Genre.id, models.Genre.name)).all()
+        with self._lock:
+            if generation == self._generation:
+                self._set_genres(rows)
+        return dict(rows), {name: genre_id for genre_id, name in rows}
+
+    def _set_genres(self, rows):
+        self._genre_names = dict(rows)
+        self._genre_ids = {name: genre_id for genre_id, name in rows}
+        self._genres_complete = True
+
+    def _evict(self, model, object_id: Optional[int]):
+        self._generation += 1
+        if model is models.Genre:
+            self._genre_names, self._genre_ids = {}, {}
+            self._genres_complete = False
+        elif object_id is None:
+            self._authors = {}
+        else:
+            self._authors.pop(object_id, None)
+
+    def _drop_all(self):
+        self._evict(models.Author, None)
+        self._evict(models.Genre, None)
+
+    def _sync_shared(self):
+        if self._shared is None:
+            return
+        generation = self._shared.get_counter(GENERATION_COUNTER)
+        if generation != self._shared_generation:
+            self._shared_generation = generation
+            self._drop_all()
+
+    def _committed(self, changes: dict):
+        with self._lock:
+            # Объекты, созданные в откаченном SAVEPOINT, больше не persistent
+            for obj, model, object_id, name, generation in changes["added"]:
+                if generation != self._generation or not inspect(obj).persistent:
+                    continue
+                if model is models.Author and len(self._authors) < self.max_authors:
+                    self._authors[object_id] = name
+                elif model is models.Genre and self._genres_complete:
+                    self._genre_names[object_id] = name
+                    self._genre_ids[name] = object_id
+
+            for model, object_id in changes["evicted"]:
+                self._evict(model, object_id)
+
+            # Новые авторы другие процессы прочитают при промахе, остальное им нужно сбросить
+            notify = changes["evicted"] or any(model is models.Genre for _, model, *_ in changes["added"])
+            if notify and self._shared is not None:
+                generation = self._shared.incr_counter(GENERATION_COUNTER)
+                if generation != self._shared_generation + 1:
+                    # Счётчик успел изменить и другой процесс
+                    self._drop_all()
+                self._shared_generation = generation
+
+
+def _author_name(db: Session, author_id: int) -> Optional[str]:
+    return db.scalar(select(models.Author.name).where(models.Author.id == author_id))
+
+
+def _changes(session: Session) -> dict:
+    return session.info.setdefault(INFO_KEY, {"added": [], "evicted": []})
+
+
+def _after_flush(session: Session, flush_context):
+    evicted = [
+        obj for obj in session.dirty
+        if isinstance(obj, MODELS) and inspect(obj).attrs.name.history.has_changes()
+    ]
+    evicted += [obj for obj in session.deleted if isinstance(obj, MODELS)]
+    added = [obj for obj in session.new if isinstance(obj, MODELS)]
+    if not evicted and not added:
+        return
+
+    changes = _changes(session)
+    for obj in evicted:
+        changes["evicted"].append((type(obj), obj.id))
+        reference_cache.evict(type(obj), obj.id)
+    # Поколение после вытеснений: добавление отменяется, если кто-то вытеснит записи до commit
+    generation = reference_cache._generation
+    changes["added"] += [(obj, type(obj), obj.id, obj.name, generation) for obj in added]
+
+
+def _on_execute(state):
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    mapper = state.bind_mapper
+    if mapper is None or mapper.class_ not in MODELS:
+        return
+
+    changes = _changes(state.session)
+    # Новые id авторов не нужно вытеснять: их ещё нет в кэше
+    if mapper.class_ is models.Genre or not state.is_insert:
+        changes["evicted"].append((mapper.class_, None))
+        reference_cache.evict(mapper.class_)
+
+
+def _after_commit(session: Session):
+    # after_commit вызывается и при RELEASE SAVEPOINT; изменения применяются после внешнего commit
+    if session.in_nested_transaction():
+        return
+    changes = session.info.get(INFO_KEY)
+    if changes is not None:
+        reference_cache._committed(changes)
+
+
+def _after_transaction_end(session: Session, transaction):
+    if transaction.parent is None:
+        session.info.pop(INFO_KEY, None)
+
+
+def track_sessions():
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+        event.listen(Session, "do_orm_execute", _on_execute)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_transaction_end", _after_transaction_end)
+
+
+reference_cache = ReferenceCache(
+    settings.reference_cache_max_authors,
+    enabled=settings.reference_cache_enabled,
+    shared=response_cache.backend if settings.response_cache_backend == "sqlite" else None
+)
+if settings.reference_cache_enabled:
+    track_sessions()
@@ -0,0 +1,111 @@
+"""
+Read-your-writes for reads routed to replicas
+
+With ``read_replica_urls`` set, GET handlers read from replicas
+(library_api.db.get_read_db) and writes go to the primary. A replica may lag
+behind the primary, so after a successful write ReadYourWritesMiddleware
+gives the client a cookie, and for ``read_your_writes_seconds`` its reads go
+to the primary. During the same window after any write, responses read from
+a replica are not stored in the response and totals caches, so a lagging
+replica cannot put data the write already replaced back into the cache.
+The time of the last write is also kept in the response cache backend
+(LAST_WRITE_COUNTER), so with the shared SQLite backend a worker that did
+not handle the write still skips caching its replica reads.
+"""
+import time
+from contextvars import ContextVar
+from http.cookies import CookieError, SimpleCookie
+from typing import TYPE_CHECKING, Optional
+
+from starlette.datastructures import MutableHeaders
+
+from library_api.config import settings
+
+if TYPE_CHECKING:
+    from library_api.cache import CacheBackend, ResponseCache
+
+COOKIE_NAME = "library_last_write"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# POST-эндпоинты, которые только читают
+READ_ONLY_SUFFIXES = ("/batch-get",)
+# Время последней записи в миллисекундах (CacheBackend.raise_counter)
+LAST_WRITE_COUNTER = "last_write_ms"
+
+_read_primary: ContextVar[bool] = ContextVar("read_primary", default=False)
+_last_write = 0.0
+
+
+def replicas_enabled() -> bool:
+    return bool(settings.read_replica_urls)
+
+
+def reads_from_replica() -> bool:
+    return replicas_enabled() and not _read_primary.get()
+
+
+def replica_may_lag(backend: Optional["CacheBackend"] = None) -> bool:
+    """Чтение с реплики вскоре после записи: реплика могла её ещё не получить.
+
+    backend - хранилище кэша; общее хранилище сообщает о записях других процессов.
+    """
+    if not reads_from_replica():
+        return False
+    last_write = _last_write
+    if backend is not None:
+        last_write = max(last_write, backend.get_counter(LAST_WRITE_COUNTER) / 1000)
+    return time.time() - last_write < settings.read_your_writes_seconds
+
+
+def note_write(backend: Optional["CacheBackend"] = None):
+    global _last_write
+    _last_write = time.time()
+    if backend is not None:
+        backend.raise_counter(LAST_WRITE_COUNTER, int(_last_write * 1000))
+
+
+def _wrote_recently(cookie_header: str) -> bool:
+    cookie = SimpleCookie()
+    try:
+        cookie.load(cookie_header)
+        written_at = float(cookie[COOKIE_NAME].value)
+    except (CookieError, KeyError, ValueError):
+        return False
+    # Max-Age cookie клиент может не соблюдать, поэтому время проверяется и здесь
+    return time.time() - written_at < settings.read_your_writes_seconds
+
+
+class ReadYourWritesMiddleware:
+    """ASGI-middleware: cookie после записи и чтение с основной базы в течение окна.
+
+    cache - кэш ответов, в хранилище которого отмечается время записи.
+    """
+
+    def __init__(self, app, cache: Optional["ResponseCache"] = None):
+        self.app = app
+        self.cache = cache
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] in SAFE_METHODS or scope["path"].endswith(READ_ONLY_SUFFIXES):
+            cookie_header = next((value.decode("latin-1") for name, value in scope["headers"] if name == b"cookie"), "")
+            token = _read_primary.set(_wrote_recently(cookie_header))
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _read_primary.reset(token)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                note_write(self.cache.backend if self.cache is not None else None)
+                headers = MutableHeaders(scope=message)
+                headers.append("set-cookie", (
+                    f"{COOKIE_NAME}={time.time():.3f}; Max-Age={int(settings.read_your_writes_seconds) + 1}; "
+                    "Path=/; HttpOnly; SameSite=Lax"
+                ))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
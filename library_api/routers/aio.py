@@ -0,0 +1,100 @@
+"""
+Async variants of the sync routers
+
+Every handler that takes a ``db`` session is wrapped into an ``async def``
+endpoint that receives an ``AsyncSession`` and runs the original handler
+through ``AsyncSession.run_sync``. The handler code is shared, but database
+I/O goes through the async driver and no threadpool worker is held for the
+duration of the request. The session dependency keeps its role: get_db
+becomes get_async_db (primary) and get_read_db becomes get_async_read_db
+(replicas). The handler itself runs on the event loop between queries, so
+a result that still has to be validated against the response model is
+serialized in the threadpool instead.
+"""
+import inspect
+
+from fastapi import APIRouter, Depends, Response
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+from library_api.cache import serialize
+from library_api.db import get_async_db, get_async_read_db, get_db, get_read_db
+
+ASYNC_DEPENDENCIES = {get_db: get_async_db, get_read_db: get_async_read_db}
+
+
+def _async_dependency(parameter: inspect.Parameter):
+    dependency = getattr(parameter.default, "dependency", None)
+    if dependency not in ASYNC_DEPENDENCIES:
+        raise TypeError(f"Нет асинхронного варианта зависимости {dependency!r}")
+    return Depends(ASYNC_DEPENDENCIES[dependency])
+
+
+async def _serialize(result, response_model, status_code: int, sub_response):
+    if isinstance(result, Response) or response_model is None:
+        return result
+    # Проверка по response_model и JSON - в пуле потоков, а не в цикле событий
+    response = Response(
+        content=await run_in_threadpool(serialize, response_model, result),
+        media_type="application/json",
+        status_code=status_code,
+    )
+    if sub_response is not None:
+        # Заголовки и статус, выставленные обработчиком через параметр Response
+        response.headers.raw.extend(sub_response.headers.raw)
+        if sub_response.status_code:
+            response.status_code = sub_response.status_code
+    return response
+
+
+def _make_async_endpoint(endpoint, response_model=None, status_code: int = 200):
+    signature = inspect.signature(endpoint)
+
+    async def async_endpoint(**kwargs):
+        db = kwargs.pop("db")
+        result = await db.run_sync(lambda session: endpoint(db=session, **kwargs))
+        sub_response = next((value for value in kwargs.values() if isinstance(value, Response)), None)
+        return await _serialize(result, response_model, status_code, sub_response)
+
+    parameters = [
+        parameter.replace(default=_async_dependency(parameter), annotation=inspect.Parameter.empty)
+        if name == "db" else parameter
+        for name, parameter in signature.parameters.items()
+    ]
+    async_endpoint.__signature__ = signature.replace(parameters=parameters)
+    async_endpoint.__name__ = endpoint.__name__
+    async_endpoint.__doc__ = endpoint.__doc__
+    return async_endpoint
+
+
+def make_async_router(router: APIRouter) -> APIRouter:
+    async_router = APIRouter()
+    for route in router.routes:
+        if not isinstance(route, APIRoute):
+            async_router.routes.append(route)
+            continue
+
+        endpoint = route.endpoint
+        if "db" in inspect.signature(endpoint).parameters and not inspect.iscoroutinefunction(endpoint):
+            endpoint = _make_async_endpoint(endpoint, route.response_model, route.status_code or 200)
+
+        async_router.add_api_route(
+            route.path,
+            endpoint,
+            response_model=route.response_model,
+            status_code=route.status_code,
+            tags=route.tags,
+            dependencies=route.dependencies,
+            summary=route.summary,
+            description=route.description,
+            response_description=route.response_description,
+            responses=route.responses,
+            deprecated=route.deprecated,
+            methods=route.methods,
+            operation_id=route.operation_id,
+            include_in_schema=route.include_in_schema,
+            response_class=route.response_class,
+            name=route.name,
+            openapi_extra=route.openapi_extra,
+        )
+    return async_router
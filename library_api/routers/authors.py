@@ -1,61 +1,137 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, desc, asc
 from typing import List, Optional
 from library_api import models, schemas, db
-from library_api.db import get_db
+from library_api.bulk import (
+    batch_ids, batch_result, build_response, fetch_by_ids, insert_batches, read_bulk_payload, validate_items
+)
+from library_api.cache import cache_key, response_cache, serialize
+from library_api.conditional import (
+    author_etag, check_if_match, conditional, is_not_modified, make_etag,
+    not_modified, validators
+)
+from library_api.config import settings
+from library_api.db import get_db, get_read_db
+from library_api.totals import totals_cache
+from library_api.writer import run_write
 
 router = APIRouter(prefix="/api/v1/authors", tags=["authors"])
 
 
-@router.post("/", response_model=schemas.Author)
-def create_author(author: schemas.AuthorCreate, db: Session = Depends(get_db)):
+def _insert_author(db: Session, author: schemas.AuthorCreate) -> int:
     db_author = models.Author(**author.dict())
     db.add(db_author)
-    db.commit()
-    db.refresh(db_author)
-    return db_author
+    db.flush()
+    return db_author.id
+
+
+@router.post("/", response_model=schemas.Author)
+def create_author(author: schemas.AuthorCreate, db: Session = Depends(get_db)):
+    author_id = run_write(db, _insert_author, author)
+    response_cache.invalidate("authors")
+    return db.get(models.Author, author_id)
+
+
+@router.post("/bulk", response_model=schemas.BulkResponse)
+def create_authors_bulk(items: list = Depends(read_bulk_payload), db: Session = Depends(get_db)):
+    # У авторов нет уникального ключа, поэтому поддерживается только создание
+    results = [None] * len(items)
+    authors = validate_items(items, schemas.AuthorCreate, results)
+    inserts = [(index, author.model_dump()) for index, author in authors]
+    insert_batches(db, models.Author, inserts, results, settings.bulk_batch_size)
+    response_cache.invalidate("authors")
+    return build_response(results)
+
+
+@router.post("/batch-get", response_model=schemas.AuthorBatch)
+def batch_get_authors(batch: schemas.BatchGetRequest, db: Session = Depends(get_read_db)):
+    ids = batch_ids(batch.ids, settings.batch_get_max_ids)
+    return batch_result(ids, fetch_by_ids(db.query(models.Author), models.Author.id, ids))
 
 
 @router.get("/{author_id}", response_model=schemas.Author)
-def get_author(author_id: int, db: Session = Depends(get_db)):
+def get_author(author_id: int, request: Request, db: Session = Depends(get_read_db)):
+    key = cache_key("authors:get", author_id=author_id)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return conditional(request, cached)
+
     author = db.query(models.Author).filter(models.Author.id == author_id).first()
     if not author:
         raise HTTPException(status_code=404, detail="Автор не найден")
-    return author
 
+    headers = validators(author_etag(author), author.updated_at)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    return response_cache.store(
+        key, serialize(schemas.Author, author), tags=[f"author:{author_id}", f"author_books:{author_id}"], headers=headers
+    )
 
-@router.put("/{author_id}", response_model=schemas.Author)
-def update_author(author_id: int, author_update: schemas.AuthorUpdate, db: Session = Depends(get_db)):
+
+def _update_author(db: Session, author_id: int, author_update: schemas.AuthorUpdate, request: Request):
     author = db.query(models.Author).filter(models.Author.id == author_id).first()
     if not author:
         raise HTTPException(status_code=404, detail="Автор не найден")
+    check_if_match(request, author_etag(author))
     
     # Update author attributes
     for field, value in author_update.dict(exclude_unset=True).items():
         setattr(author, field, value)
-    
-    db.commit()
-    db.refresh(author)
+
+
+@router.put("/{author_id}", response_model=schemas.Author)
+def update_author(
+    author_id: int,
+    author_update: schemas.AuthorUpdate,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+):
+    run_write(db, _update_author, author_id, author_update, request)
+    # Имя автора участвует в фильтре author_name списка книг
+    totals_cache.invalidate()
+    # Тег author:{id} сбрасывает и закэшированные книги этого автора
+    response_cache.invalidate("authors", "books", f"author:{author_id}")
+    author = db.get(models.Author, author_id)
+    response.headers.update(validators(author_etag(author), author.updated_at))
     return author
 
 
-@router.delete("/{author_id}")
-def delete_author(author_id: int, db: Session = Depends(get_db)):
+def _delete_author(db: Session, author_id: int):
     author = db.query(models.Author).filter(models.Author.id == author_id).first()
     if not author:
         raise HTTPException(status_code=404, detail="Автор не найден")
     
     db.delete(author)
-    db.commit()
+
+
+@router.delete("/{author_id}")
+def delete_author(author_id: int, db: Session = Depends(get_db)):
+    run_write(db, _delete_author, author_id)
+    totals_cache.invalidate()
+    response_cache.invalidate("authors", "books", f"author:{author_id}")
     return {"message": "Автор удален успешно"}
 
 
 @router.get("/", response_model=List[schemas.Author])
 def get_authors(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_read_db),
     skip: int = Query(0, ge=0, description="Количество пропущенных записей"),
     limit: int = Query(10, ge=1, le=100, description="Максимальное количество возвращаемых записей")
 ):
+    key = cache_key("authors:list", skip=skip, limit=limit)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return conditional(request, cached)
+
     authors = db.query(models.Author).offset(skip).limit(limit).all()
-    return authors
\ No newline at end of file
+    headers = validators(
+        make_etag(key, [(author.id, author.version, author.book_count) for author in authors])
+    )
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    return response_cache.store(
+        key, serialize(List[schemas.Author], authors), tags=["authors"], headers=headers
+    )
\ No newline at end of file
@@ -1,24 +1,120 @@
-from typing import Optional
+from typing import Literal, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy import desc, asc
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
 from library_api import models, schemas
-from library_api.db import get_db
+from library_api.bulk import (
+    batch_ids, batch_result, build_response, error_result, fetch_by_ids, fetch_existing, insert_batches,
+    read_bulk_payload, update_batches, validate_items
+)
+from library_api.cache import cache_key, response_cache, serialize
+from library_api.conditional import (
+    book_etag, book_last_modified, check_if_match, conditional, is_not_modified,
+    make_etag, not_modified, validators
+)
+from library_api.config import settings
+from library_api.db import SessionLocal, get_db, get_read_db, read_engine
+from library_api.export import ENCODERS, EXPORT_COLUMNS, MEDIA_TYPES
+from library_api.fastjson import BOOK_COLUMNS, book_dict, dumps, row_versions
+from library_api.pagination import decode_cursor, encode_cursor, keyset_filters
+from library_api.projection import SparseBookPage, parse_projection, projection_columns, projection_encoder
+from library_api.reference import reference_cache
+from library_api.search import apply_search
+from library_api.totals import estimate_total, exact_total, filters_key, totals_cache
+from library_api.writer import run_write
 
 router = APIRouter(prefix="/api/v1/books", tags=["books"])
 
 
-@router.post("/", response_model=schemas.Book)
-def create_book(book: schemas.BookCreate, db: Session = Depends(get_db)):
+def _get_book_with_relations(db: Session, book_id: int):
+    # Автор и жанр загружаются тем же запросом, без отдельных SELECT при сериализации
+    return db.query(models.Book).options(
+        joinedload(models.Book.author), joinedload(models.Book.genre)
+    ).filter(models.Book.id == book_id).first()
+
+
+def _book_count_tags(author_ids, genre_ids) -> list:
+    # Счётчики книг в ответах авторов и жанров меняются вместе с книгами;
+    # author:{id} здесь не подходит - он сбросил бы и все книги автора
+    return [
+        "authors", "genres",
+        *[f"author_books:{author_id}" for author_id in set(author_ids)],
+        *[f"genre_books:{genre_id}" for genre_id in set(genre_ids)],
+    ]
+
+
+def _filter_books(query, author_id, genre_id, author_name, genre_name, title, q):
+    if author_id is not None:
+        query = query.filter(models.Book.author_id == author_id)
+
+    if genre_id is not None:
+        query = query.filter(models.Book.genre_id == genre_id)
+
+    if author_name is not None:
+        query = query.filter(models.Author.name.ilike(f"%{author_name}%"))
+
+    if genre_name is not None:
+        query = query.filter(models.Genre.name.ilike(f"%{genre_name}%"))
+
+    if title is not None:
+        query = query.filter(models.Book.title.ilike(f"%{title}%"))
+
+    rank_column = None
+    if q is not None:
+        query, rank_column = apply_search(query, q)
+    return query, rank_column
+
+
+def _sort_key(sort_by: str, sort_order: str, rank_column=None):
+    sort_fields_map = {
+        "id": models.Book.id,
+        "title": models.Book.title,
+        "publication_year": models.Book.publication_year,
+        "created_at": models.Book.created_at,
+        "author_name": models.Author.name,
+        "genre_name": models.Genre.name
+    }
+    if rank_column is not None:
+        sort_fields_map["relevance"] = rank_column
+
+    if sort_by not in sort_fields_map:
+        sort_by = "created_at"
+    if sort_order != "asc":
+        sort_order = "desc"
+
+    # Book.id добавляется как тай-брейкер, чтобы порядок (и курсор) был однозначным.
+    # Имена авторов и жанров не уникальны: id автора (жанра) перед Book.id позволяет
+    # читать книги по индексу author_id (genre_id) уже в нужном порядке
+    columns = [sort_fields_map[sort_by]]
+    if sort_by == "author_name":
+        columns.append(models.Author.id)
+    elif sort_by == "genre_name":
+        columns.append(models.Genre.id)
+    return sort_by, sort_order, columns + [models.Book.id]
+
+
+def _books_query(db: Session, columns, author_id=None, genre_id=None, author_name=None,
+                 genre_name=None, title=None, q=None, sort_by="created_at", sort_order="desc"):
+    """Отфильтрованная и упорядоченная выборка колонок книг.
+
+    Возвращает (query, sort_by, sort_order, key_columns) с нормализованной сортировкой.
+    """
+    query = db.query(*columns).select_from(models.Book).join(models.Book.author).join(models.Book.genre)
+    query, rank_column = _filter_books(query, author_id, genre_id, author_name, genre_name, title, q)
+    sort_by, sort_order, key_columns = _sort_key(sort_by, sort_order, rank_column)
+    direction = asc if sort_order == "asc" else desc
+    return query.order_by(*[direction(column) for column in key_columns]), sort_by, sort_order, key_columns
+
+
+def _insert_book(db: Session, book: schemas.BookCreate) -> int:
     # Проверяем есть ли такой автор и жанр
-    author = db.query(models.Author).filter(models.Author.id == book.author_id).first()
-    if not author:
+    if not reference_cache.author_exists(db, book.author_id):
         raise HTTPException(status_code=404, detail="Книга не найдена")
 
-    genre = db.query(models.Genre).filter(models.Genre.id == book.genre_id).first()
-    if not genre:
+    if not reference_cache.genre_exists(db, book.genre_id):
         raise HTTPException(status_code=404, detail="Жанр не найден")
 
     # Проверяем индификатор ISBN
@@ -29,25 +125,152 @@ def create_book(book: schemas.BookCreate, db: Session = Depends(get_db)):
 
     db_book = models.Book(**book.dict())
     db.add(db_book)
-    db.commit()
-    db.refresh(db_book)
-    return db_book
+    db.flush()
+    # id запоминается до commit, чтобы не перечитывать истёкший объект
+    return db_book.id
+
+
+@router.post("/", response_model=schemas.Book)
+def create_book(book: schemas.BookCreate, db: Session = Depends(get_db)):
+    book_id = run_write(db, _insert_book, book)
+    totals_cache.invalidate()
+    response_cache.invalidate("books", *_book_count_tags([book.author_id], [book.genre_id]))
+    return _get_book_with_relations(db, book_id)
+
+
+@router.post("/bulk", response_model=schemas.BulkResponse)
+def create_books_bulk(
+    items: list = Depends(read_bulk_payload),
+    upsert: bool = Query(False, description="Обновлять книги с уже существующим ISBN вместо ошибки"),
+    db: Session = Depends(get_db)
+):
+    results = [None] * len(items)
+    books = validate_items(items, schemas.BookCreate, results)
+
+    # Проверки внешних ключей и ISBN - по одному запросу на пакет значений, а не на книгу
+    author_ids = fetch_existing(db, models.Author.id, {book.author_id for _, book in books})
+    genre_ids = fetch_existing(db, models.Genre.id, {book.genre_id for _, book in books})
+    existing_isbns = fetch_existing(
+        db, models.Book.isbn, {book.isbn for _, book in books if book.isbn},
+        models.Book.id, models.Book.version, models.Book.author_id, models.Book.genre_id
+    )
+
+    inserts, updates = [], []
+    seen_isbns = set()
+    for index, book in books:
+        if book.author_id not in author_ids:
+            results[index] = error_result(index, "Автор не найден")
+            continue
+        if book.genre_id not in genre_ids:
+            results[index] = error_result(index, "Жанр не найден")
+            continue
+
+        values = book.model_dump()
+        if book.isbn:
+            if book.isbn in seen_isbns:
+                results[index] = error_result(index, "ISBN повторяется в запросе")
+                continue
+            seen_isbns.add(book.isbn)
+
+            if book.isbn in existing_isbns:
+                if not upsert:
+                    results[index] = error_result(index, "Книга с таким ISBN уже существует")
+                    continue
+                existing = existing_isbns[book.isbn]
+                updates.append((index, {"id": existing.id, "version": existing.version, **values}))
+                continue
+
+        inserts.append((index, values))
+
+    insert_batches(db, models.Book, inserts, results, settings.bulk_batch_size)
+    update_batches(db, models.Book, updates, results, settings.bulk_batch_size)
+    totals_cache.invalidate()
+    # Обновлённые книги могли перейти от прежних автора и жанра
+    replaced = [existing_isbns[values["isbn"]] for _, values in updates]
+    response_cache.invalidate(
+        "books", *[f"book:{values['id']}" for _, values in updates],
+        *_book_count_tags(
+            [values["author_id"] for _, values in inserts + updates] + [row.author_id for row in replaced],
+            [values["genre_id"] for _, values in inserts + updates] + [row.genre_id for row in replaced],
+        )
+    )
+    return build_response(results)
+
+
+@router.post("/batch-get", response_model=schemas.BookBatch)
+def batch_get_books(batch: schemas.BatchGetRequest, db: Session = Depends(get_read_db)):
+    ids = batch_ids(batch.ids, settings.batch_get_max_ids)
+    # Книги вместе с автором и жанром одним IN (...) запросом, без ORM-объектов
+    query = db.query(*BOOK_COLUMNS).select_from(models.Book).join(models.Book.author).join(models.Book.genre)
+    found = fetch_by_ids(query, models.Book.id, ids)
+    return Response(dumps(batch_result(ids, found, book_dict)), media_type="application/json")
+
+
+@router.get("/export")
+def export_books(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="Формат выгрузки"),
+    author_id: Optional[int] = Query(None, description="Фильтровать по идентификатору автора"),
+    genre_id: Optional[int] = Query(None, description="Фильтровать по идентификатору жанра"),
+    author_name: Optional[str] = Query(None, description="Фильтр по имени автора (частичное совпадение)"),
+    genre_name: Optional[str] = Query(None, description="Фильтр по названию жанра (частичное совпадение)"),
+    title: Optional[str] = Query(None, description="Фильтр по названию книги (частичное совпадение)"),
+    q: Optional[str] = Query(None, description="Полнотекстовый поиск по названию, описанию, автору и жанру"),
+    sort_by: str = Query("id", description="Поле для сортировки"),
+    sort_order: str = Query("asc", description="Порядок сортировки: по возрастанию или по убыванию")
+):
+    # Реплика выбирается сейчас, в контексте запроса (read-your-writes)
+    bind = read_engine()
+
+    def partitions():
+        # Сессия живёт столько же, сколько поток ответа, а не зависимость запроса
+        db = SessionLocal(bind=bind)
+        try:
+            query, _, _, _ = _books_query(
+                db, EXPORT_COLUMNS, author_id, genre_id, author_name, genre_name, title, q, sort_by, sort_order
+            )
+
+            # yield_per читает курсор порциями, память не растёт с размером каталога
+            result = db.execute(query.statement.execution_options(yield_per=settings.export_batch_size))
+            yield from result.partitions()
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        ENCODERS[format](partitions()),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="books.{format}"'}
+    )
 
 
 @router.get("/{book_id}", response_model=schemas.Book)
-def get_book(book_id: int, db: Session = Depends(get_db)):
-    book = db.query(models.Book).filter(models.Book.id == book_id).first()
+def get_book(book_id: int, request: Request, db: Session = Depends(get_read_db)):
+    key = cache_key("books:get", book_id=book_id)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return conditional(request, cached)
+
+    book = _get_book_with_relations(db, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Книга не найдена")
-    return book
 
+    headers = validators(book_etag(book), book_last_modified(book))
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    return response_cache.store(
+        key, serialize(schemas.Book, book),
+        tags=[f"book:{book.id}", f"author:{book.author_id}", f"genre:{book.genre_id}"],
+        headers=headers
+    )
 
-@router.put("/{book_id}", response_model=schemas.Book)
-def update_book(book_id: int, book_update: schemas.BookUpdate, db: Session = Depends(get_db)):
-    book = db.query(models.Book).filter(models.Book.id == book_id).first()
+
+def _update_book(db: Session, book_id: int, book_update: schemas.BookUpdate, request: Request) -> list:
+    book = _get_book_with_relations(db, book_id)
     if not book:
         raise HTTPException(status_code=404, detail="Книга не найдена")
 
+    # If-Match: изменение только той версии, которую клиент видел
+    check_if_match(request, book_etag(book))
+
     # При обновлении ISBN проверьте, существует ли он уже для другой книги.
     if book_update.isbn and book_update.isbn != book.isbn:
         existing_book = db.query(models.Book).filter(
@@ -58,38 +281,67 @@ def update_book(book_id: int, book_update: schemas.BookUpdate, db: Session = Dep
 
     # Проверьте автора и жанр, если они обновляются
     if book_update.author_id is not None:
-        author = db.query(models.Author).filter(models.Author.id == book_update.author_id).first()
-        if not author:
+        if not reference_cache.author_exists(db, book_update.author_id):
             raise HTTPException(status_code=404, detail="Автор не найден")
 
     if book_update.genre_id is not None:
-        genre = db.query(models.Genre).filter(models.Genre.id == book_update.genre_id).first()
-        if not genre:
+        if not reference_cache.genre_exists(db, book_update.genre_id):
             raise HTTPException(status_code=404, detail="Жанр не найден")
 
     # Обновить атрибуты книги
+    previous_author_id, previous_genre_id = book.author_id, book.genre_id
     for field, value in book_update.dict(exclude_unset=True).items():
         setattr(book, field, value)
 
-    db.commit()
-    db.refresh(book)
+    if (book.author_id, book.genre_id) != (previous_author_id, previous_genre_id):
+        return _book_count_tags([previous_author_id, book.author_id], [previous_genre_id, book.genre_id])
+    return []
+
+
+@router.put("/{book_id}", response_model=schemas.Book)
+def update_book(
+    book_id: int,
+    book_update: schemas.BookUpdate,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+):
+    count_tags = run_write(db, _update_book, book_id, book_update, request)
+    totals_cache.invalidate()
+    response_cache.invalidate("books", f"book:{book_id}", *count_tags)
+
+    book = _get_book_with_relations(db, book_id)
+    response.headers.update(validators(book_etag(book), book_last_modified(book)))
     return book
 
 
-@router.delete("/{book_id}")
-def delete_book(book_id: int, db: Session = Depends(get_db)):
+def _delete_book(db: Session, book_id: int) -> list:
     book = db.query(models.Book).filter(models.Book.id == book_id).first()
     if not book:
         raise HTTPException(status_code=404, detail="Книга не найдена")
 
     db.delete(book)
-    db.commit()
+    return _book_count_tags([book.author_id], [book.genre_id])
+
+
+@router.delete("/{book_id}")
+def delete_book(book_id: int, db: Session = Depends(get_db)):
+    count_tags = run_write(db, _delete_book, book_id)
+    totals_cache.invalidate()
+    response_cache.invalidate("books", f"book:{book_id}", *count_tags)
     return {"message": "Книга успешно удалена"}
 
 
-@router.get("/", response_model=schemas.PaginatedResponse)
+# Тело собирается вручную (fastjson) и не проверяется моделью ответа; с
+# fields/expand элементы - подмножество книги (projection_model), поэтому в
+# схеме описаны оба варианта страницы
+@router.get("/", response_model=None, responses={200: {
+    "model": Union[schemas.PaginatedResponse, SparseBookPage],
+    "description": "Страница книг; с fields/expand в элементах только запрошенные поля",
+}})
 def get_books(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_read_db),
     skip: int = Query(0, ge=0, description="Количество пропущенных записей"),
     limit: int = Query(10, ge=1, le=100, description="Максимальное количество возвращаемых записей"),
     author_id: Optional[int] = Query(None, description="Фильтровать по идентификатору автора"),
@@ -97,61 +349,87 @@ def get_books(
     author_name: Optional[str] = Query(None, description="Фильтр по имени автора (частичное совпадение)"),
     genre_name: Optional[str] = Query(None, description="Фильтр по названию жанра (частичное совпадение)"),
     title: Optional[str] = Query(None, description="Фильтр по названию книги (частичное совпадение)"),
-    sort_by: str = Query("created_at", description="Поле для сортировки"),
-    sort_order: str = Query("desc", description="Порядок сортировки: по возрастанию или по убыванию")
+    q: Optional[str] = Query(None, description="Полнотекстовый поиск по названию, описанию, автору и жанру"),
+    sort_by: str = Query("created_at", description="Поле для сортировки (relevance - по релевантности, вместе с q)"),
+    sort_order: str = Query("desc", description="Порядок сортировки: по возрастанию или по убыванию"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor); при его передаче skip игнорируется"),
+    with_total: Literal["false", "exact", "estimate"] = Query("exact", description="Подсчёт total: exact - точный (кэшируется), estimate - приблизительный, false - без подсчёта"),
+    fields: Optional[str] = Query(None, description="Поля книги через запятую (id,title,author.name); остальные не читаются из базы"),
+    expand: Optional[str] = Query(None, description="Вложенные объекты: author,genre (по умолчанию оба, если fields не задан)")
 ):
-    query = db.query(models.Book).join(models.Book.author).join(models.Book.genre)
-
-
-    if author_id is not None:
-        query = query.filter(models.Book.author_id == author_id)
-
-    if genre_id is not None:
-        query = query.filter(models.Book.genre_id == genre_id)
-
-    if author_name is not None:
-        query = query.filter(models.Author.name.ilike(f"%{author_name}%"))
-
-    if genre_name is not None:
-        query = query.filter(models.Genre.name.ilike(f"%{genre_name}%"))
-
-    if title is not None:
-        query = query.filter(models.Book.title.ilike(f"%{title}%"))
-
-
-    sort_fields_map = {
-        "id": models.Book.id,
-        "title": models.Book.title,
-        "publication_year": models.Book.publication_year,
-        "created_at": models.Book.created_at,
-        "author_name": models.Author.name,
-        "genre_name": models.Genre.name
-    }
-
-    if sort_by in sort_fields_map:
-        sort_column = sort_fields_map[sort_by]
-    else:
-        sort_column = models.Book.created_at
-
-
-    if sort_order == "asc":
-        query = query.order_by(asc(sort_column))
+    projection = parse_projection(fields, expand)
+    key = cache_key(
+        "books:list", skip=skip, limit=limit, author_id=author_id, genre_id=genre_id,
+        author_name=author_name, genre_name=genre_name, title=title, q=q, sort_by=sort_by,
+        sort_order=sort_order, cursor=cursor, with_total=with_total,
+        projection=repr(projection) if projection else None
+    )
+    cached = response_cache.get(key)
+    if cached is not None:
+        return conditional(request, cached)
+
+    # Только нужные колонки: без ORM-объектов и повторной валидации Pydantic
+    columns, encode = BOOK_COLUMNS, book_dict
+    if projection is not None:
+        columns, encode = projection_columns(projection), projection_encoder(projection)
+    query, sort_by, sort_order, key_columns = _books_query(
+        db, columns, author_id, genre_id, author_name, genre_name, title, q, sort_by, sort_order
+    )
+
+    total = None
+    total_approximate = False
+    total_lower_bound = False
+    if with_total != "false":
+        filters = filters_key(
+            author_id=author_id, genre_id=genre_id, author_name=author_name,
+            genre_name=genre_name, title=title, q=q
+        )
+        if with_total == "exact":
+            total = exact_total(query, filters)
+        else:
+            total, total_approximate, total_lower_bound = estimate_total(db, query, filters)
+
+
+    if cursor is not None:
+        values = decode_cursor(cursor, sort_by, sort_order, len(key_columns))
+        segments = [
+            query.filter(condition)
+            for condition in keyset_filters(key_columns, values, descending=sort_order == "desc")
+        ]
     else:
-        query = query.order_by(desc(sort_column))
-
-
-    total = query.count()
-
-
-    books = query.offset(skip).limit(limit).all()
-
-
-    pages = (total + limit - 1) // limit
-
-    return schemas.PaginatedResponse(
-        items=books,
-        total=total,
-        page=(skip // limit) + 1,
-        limit=limit,
-        pages=pages
-    )
\ No newline at end of file
+        segments = [query.offset(skip)]
+
+    # Одна лишняя строка показывает, есть ли следующая страница
+    rows = []
+    for segment in segments:
+        rows += segment.add_columns(*key_columns).limit(limit + 1 - len(rows)).all()
+        if len(rows) > limit:
+            break
+    books = rows[:limit]
+
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(sort_by, sort_order, rows[limit - 1][len(columns):])
+
+    headers = validators(
+        make_etag(key, total, total_approximate, total_lower_bound, next_cursor, [row_versions(row) for row in books])
+    )
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+
+    pages = (total + limit - 1) // limit if total is not None else None
+
+    # Совместимо со schemas.PaginatedResponse (с fields/expand - с проекцией schemas.Book)
+    body = dumps({
+        "items": [encode(row) for row in books],
+        "total": total,
+        # Номер страницы известен только при skip/limit
+        "page": (skip // limit) + 1 if cursor is None else None,
+        "limit": limit,
+        "pages": pages,
+        "total_approximate": total_approximate,
+        "total_lower_bound": total_lower_bound,
+        "next_cursor": next_cursor
+    })
+    # Списки содержат данные авторов и жанров, поэтому сбрасываются и их изменениями
+    return response_cache.store(key, body, tags=["books"], headers=headers)
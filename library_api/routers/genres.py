@@ -1,78 +1,169 @@
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
 from library_api import models, schemas
-from library_api.db import get_db
+from library_api.bulk import (
+    batch_ids, batch_result, build_response, error_result, fetch_by_ids, fetch_existing, insert_batches,
+    read_bulk_payload, validate_items
+)
+from library_api.cache import cache_key, response_cache, serialize
+from library_api.conditional import (
+    check_if_match, conditional, genre_etag, is_not_modified, make_etag,
+    not_modified, validators
+)
+from library_api.config import settings
+from library_api.db import get_db, get_read_db
+from library_api.reference import reference_cache
+from library_api.totals import totals_cache
+from library_api.writer import run_write
 
 router = APIRouter(prefix="/api/v1/genres", tags=["genres"])
 
 
-@router.post("/", response_model=schemas.Genre)
-def create_genre(genre: schemas.GenreCreate, db: Session = Depends(get_db)):
+def _insert_genre(db: Session, genre: schemas.GenreCreate) -> int:
     # Проверка на наличие жанра
-    existing_genre = db.query(models.Genre).filter(
-        models.Genre.name == genre.name
-    ).first()
-    if existing_genre:
+    if reference_cache.genre_id(db, genre.name) is not None:
         raise HTTPException(status_code=400, detail="Жанр с таким названием уже существует")
     
     db_genre = models.Genre(**genre.dict())
     db.add(db_genre)
-    db.commit()
-    db.refresh(db_genre)
-    return db_genre
+    db.flush()
+    return db_genre.id
+
+
+@router.post("/", response_model=schemas.Genre)
+def create_genre(genre: schemas.GenreCreate, db: Session = Depends(get_db)):
+    genre_id = run_write(db, _insert_genre, genre)
+    response_cache.invalidate("genres")
+    return db.get(models.Genre, genre_id)
+
+
+@router.post("/bulk", response_model=schemas.BulkResponse)
+def create_genres_bulk(
+    items: list = Depends(read_bulk_payload),
+    upsert: bool = Query(False, description="Возвращать id существующего жанра вместо ошибки"),
+    db: Session = Depends(get_db)
+):
+    results = [None] * len(items)
+    genres = validate_items(items, schemas.GenreCreate, results)
+    existing = fetch_existing(db, models.Genre.name, {genre.name for _, genre in genres}, models.Genre.id)
+
+    inserts = []
+    seen_names = set()
+    for index, genre in genres:
+        if genre.name in existing:
+            if upsert:
+                results[index] = schemas.BulkItemResult(index=index, status="exists", id=existing[genre.name].id)
+            else:
+                results[index] = error_result(index, "Жанр с таким названием уже существует")
+            continue
+        if genre.name in seen_names:
+            results[index] = error_result(index, "Название жанра повторяется в запросе")
+            continue
+        seen_names.add(genre.name)
+        inserts.append((index, genre.model_dump()))
+
+    insert_batches(db, models.Genre, inserts, results, settings.bulk_batch_size)
+    response_cache.invalidate("genres")
+    return build_response(results)
+
+
+@router.post("/batch-get", response_model=schemas.GenreBatch)
+def batch_get_genres(batch: schemas.BatchGetRequest, db: Session = Depends(get_read_db)):
+    ids = batch_ids(batch.ids, settings.batch_get_max_ids)
+    return batch_result(ids, fetch_by_ids(db.query(models.Genre), models.Genre.id, ids))
 
 
 @router.get("/{genre_id}", response_model=schemas.Genre)
-def get_genre(genre_id: int, db: Session = Depends(get_db)):
+def get_genre(genre_id: int, request: Request, db: Session = Depends(get_read_db)):
+    key = cache_key("genres:get", genre_id=genre_id)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return conditional(request, cached)
+
     genre = db.query(models.Genre).filter(models.Genre.id == genre_id).first()
     if not genre:
         raise HTTPException(status_code=404, detail="Жанр не найден")
-    return genre
 
+    headers = validators(genre_etag(genre), genre.updated_at)
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    return response_cache.store(
+        key, serialize(schemas.Genre, genre), tags=[f"genre:{genre_id}", f"genre_books:{genre_id}"], headers=headers
+    )
 
-@router.put("/{genre_id}", response_model=schemas.Genre)
-def update_genre(genre_id: int, genre_update: schemas.GenreUpdate, db: Session = Depends(get_db)):
+
+def _update_genre(db: Session, genre_id: int, genre_update: schemas.GenreUpdate, request: Request):
     genre = db.query(models.Genre).filter(models.Genre.id == genre_id).first()
     if not genre:
         raise HTTPException(status_code=404, detail="Жанр не найден")
-    
+    check_if_match(request, genre_etag(genre))
 
     if genre_update.name is not None:
-        existing_genre = db.query(models.Genre).filter(
-            models.Genre.name == genre_update.name
-        ).filter(models.Genre.id != genre_id).first()
-        if existing_genre:
+        existing_id = reference_cache.genre_id(db, genre_update.name)
+        if existing_id is not None and existing_id != genre_id:
             raise HTTPException(status_code=400, detail="Жанр с таким названием уже существует")
     
     # Обновление атрибутов жанра
     for field, value in genre_update.dict(exclude_unset=True).items():
         if value is not None:
             setattr(genre, field, value)
-    
-    db.commit()
-    db.refresh(genre)
+
+
+@router.put("/{genre_id}", response_model=schemas.Genre)
+def update_genre(
+    genre_id: int,
+    genre_update: schemas.GenreUpdate,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db)
+):
+    run_write(db, _update_genre, genre_id, genre_update, request)
+    # Название жанра участвует в фильтре genre_name списка книг
+    totals_cache.invalidate()
+    # Тег genre:{id} сбрасывает и закэшированные книги этого жанра
+    response_cache.invalidate("genres", "books", f"genre:{genre_id}")
+    genre = db.get(models.Genre, genre_id)
+    response.headers.update(validators(genre_etag(genre), genre.updated_at))
     return genre
 
 
-@router.delete("/{genre_id}")
-def delete_genre(genre_id: int, db: Session = Depends(get_db)):
+def _delete_genre(db: Session, genre_id: int):
     genre = db.query(models.Genre).filter(models.Genre.id == genre_id).first()
     if not genre:
         raise HTTPException(status_code=404, detail="Жанр не найден")
     
     db.delete(genre)
-    db.commit()
+
+
+@router.delete("/{genre_id}")
+def delete_genre(genre_id: int, db: Session = Depends(get_db)):
+    run_write(db, _delete_genre, genre_id)
+    totals_cache.invalidate()
+    response_cache.invalidate("genres", "books", f"genre:{genre_id}")
     return {"message": "Жанр успешно удален"}
 
 
 @router.get("/", response_model=List[schemas.Genre])
 def get_genres(
-    db: Session = Depends(get_db),
+    request: Request,
+    db: Session = Depends(get_read_db),
     skip: int = Query(0, ge=0, description="Количество пропущенных записей"),
     limit: int = Query(10, ge=1, le=100, description="Максимальное количество возвращаемых записей")
 ):
+    key = cache_key("genres:list", skip=skip, limit=limit)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return conditional(request, cached)
+
     genres = db.query(models.Genre).offset(skip).limit(limit).all()
-    return genres
\ No newline at end of file
+    headers = validators(
+        make_etag(key, [(genre.id, genre.version, genre.book_count) for genre in genres])
+    )
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    return response_cache.store(
+        key, serialize(List[schemas.Genre], genres), tags=["genres"], headers=headers
+    )
\ No newline at end of file
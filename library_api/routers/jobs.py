@@ -0,0 +1,78 @@
+import os
+import uuid
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from library_api import models, schemas
+from library_api.bulk import NDJSON_TYPES
+from library_api.config import settings
+from library_api.db import get_db
+from library_api.imports import create_job, import_queue, job_status
+
+router = APIRouter(prefix="/api/v1/jobs", tags=["jobs"])
+
+CSV_TYPES = ("text/csv", "application/csv")
+
+
+def _file_format(request: Request, format: Optional[str]) -> str:
+    if format is not None:
+        return format
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in CSV_TYPES:
+        return "csv"
+    if content_type in NDJSON_TYPES:
+        return "ndjson"
+    raise HTTPException(status_code=400, detail="Укажите format=csv или format=ndjson")
+
+
+@router.post("/imports", response_model=schemas.ImportJob, status_code=202)
+async def create_import_job(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Формат файла; по умолчанию по Content-Type")
+):
+    file_format = _file_format(request, format)
+    await run_in_threadpool(os.makedirs, settings.import_dir, exist_ok=True)
+    path = os.path.join(settings.import_dir, f"{uuid.uuid4().hex}.{file_format}")
+
+    # Файл пишется на диск по частям, без загрузки в память целиком; операции
+    # с файлом выполняются в пуле потоков, чтобы не останавливать цикл событий
+    lines = 0
+    last = b"\n"
+    file = await run_in_threadpool(open, path, "wb")
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                await run_in_threadpool(file.write, chunk)
+                lines += chunk.count(b"\n")
+                last = chunk[-1:]
+    finally:
+        await run_in_threadpool(file.close)
+    if last != b"\n":
+        lines += 1
+    # Оценка: пустые строки тоже учитываются, у CSV вычитается заголовок
+    total_rows = max(lines - 1, 0) if file_format == "csv" else lines
+
+    job = await run_in_threadpool(create_job, path, file_format, total_rows)
+    import_queue.submit(job.id)
+    return job_status(job)
+
+
+@router.get("/{job_id}", response_model=schemas.ImportJob)
+def get_job(job_id: int, db: Session = Depends(get_db)):
+    # Прогресс читается с основной базы: на реплике он отставал бы
+    job = db.get(models.ImportJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job_status(job)
+
+
+@router.get("/", response_model=List[schemas.ImportJob])
+def get_jobs(
+    db: Session = Depends(get_db),
+    limit: int = Query(20, ge=1, le=100, description="Сколько последних задач вернуть")
+):
+    jobs = db.query(models.ImportJob).order_by(models.ImportJob.id.desc()).limit(limit).all()
+    return [job_status(job) for job in jobs]
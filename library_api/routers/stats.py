@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Depends, Query, Request
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from library_api import models, schemas
+from library_api.cache import cache_key, response_cache, serialize
+from library_api.conditional import conditional, is_not_modified, make_etag, not_modified, validators
+from library_api.counters import author_total, is_supported
+from library_api.db import get_read_db
+
+router = APIRouter(prefix="/api/v1/stats", tags=["stats"])
+
+
+@router.get("/", response_model=schemas.CatalogStats)
+def get_stats(
+    request: Request,
+    db: Session = Depends(get_read_db),
+    top_authors: int = Query(10, ge=0, le=100, description="Сколько авторов с наибольшим числом книг вернуть")
+):
+    key = cache_key("stats", top_authors=top_authors)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return conditional(request, cached)
+
+    # Счётчики хранятся в строках жанров и авторов и в catalog_counts
+    # (library_api.counters): таблицы книг и авторов не сканируются
+    genres = db.query(models.Genre).order_by(models.Genre.book_count.desc(), models.Genre.id).all()
+    authors = (
+        db.query(models.Author).order_by(models.Author.book_count.desc(), models.Author.id)
+        .limit(top_authors).all()
+    ) if top_authors else []
+
+    if is_supported(db.get_bind()):
+        books = sum(genre.book_count for genre in genres)
+    else:
+        # Без триггеров счётчики жанров не ведутся
+        books = db.query(func.count(models.Book.id)).scalar()
+
+    stats = {
+        "books": books,
+        "authors": author_total(db),
+        "genres": len(genres),
+        "by_genre": genres,
+        "top_authors": authors,
+    }
+    headers = validators(make_etag(
+        key, stats["books"], stats["authors"],
+        [(genre.id, genre.version, genre.book_count) for genre in genres],
+        [(author.id, author.version, author.book_count) for author in authors]
+    ))
+    if is_not_modified(request, headers):
+        return not_modified(headers)
+    # Любая запись книг, авторов или жанров сбрасывает сводку
+    return response_cache.store(
+        key, serialize(schemas.CatalogStats, stats), tags=["books", "authors", "genres"], headers=headers
+    )
@@ -1,3 +1,4 @@
+import argparse
 import uvicorn
 import sys
 import os
@@ -5,11 +6,80 @@ import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-if __name__ == "__main__":
+from library_api.config import settings
+
+
+def run_dev(host: str, port: int):
+    # Перезапуск при изменении кода, подробный лог
     uvicorn.run(
         "library_api.main:app",
-        host="127.0.0.1",
-        port=8000,
+        host=host,
+        port=port,
         reload=True,
         log_level="info"
-    )
\ No newline at end of file
+    )
+
+
+def prepare_workers(workers: int):
+    """Один раз до запуска рабочих процессов: схема базы и общий кэш."""
+    if workers > 1 and "response_cache_backend" not in settings.model_fields_set:
+        # Кэш в памяти у каждого процесса свой и не видит инвалидаций других
+        os.environ["LIBRARY_RESPONSE_CACHE_BACKEND"] = "sqlite"
+        settings.response_cache_backend = "sqlite"
+
+    from library_api.cache import response_cache
+    from library_api.db import engine, init_db, is_sqlite
+    from library_api.imports import requeue_interrupted
+
+    if workers > 1 and is_sqlite(settings.database_url) and settings.sqlite_journal_mode.upper() != "WAL":
+        print("Warning: without journal_mode=WAL SQLite readers in other workers wait for every write")
+
+    # LIBRARY_INIT_DB_ON_STARTUP=false: схема уже создана (python -m library_api.migrations)
+    if settings.init_db_on_startup:
+        # Первое соединение переводит базу в WAL (режим сохраняется в файле),
+        # поэтому рабочие процессы не переключают его одновременно
+        init_db(engine)
+        requeue_interrupted(engine)
+        response_cache.clear()
+        # Соединения родительского процесса рабочим не передаются
+        engine.dispose()
+    # Рабочие процессы читают настройки из окружения заново
+    os.environ["LIBRARY_INIT_DB_ON_STARTUP"] = "false"
+    settings.init_db_on_startup = False
+
+
+def run_prod(host: str, port: int, workers: int):
+    prepare_workers(workers)
+    # loop/http="auto" выбирают uvloop и httptools, если они установлены (uvicorn[standard])
+    uvicorn.run(
+        "library_api.main:app",
+        host=host,
+        port=port,
+        workers=workers,
+        reload=False,
+        loop="auto",
+        http="auto",
+        backlog=settings.server_backlog,
+        timeout_keep_alive=settings.server_keepalive_timeout,
+        access_log=False,
+        log_level="warning"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Запуск API библиотеки")
+    parser.add_argument("--mode", choices=["dev", "prod"], default="dev",
+                        help="dev - один процесс с перезагрузкой, prod - рабочие процессы без перезагрузки")
+    parser.add_argument("--host", default=settings.server_host)
+    parser.add_argument("--port", type=int, default=settings.server_port)
+    parser.add_argument("--workers", type=int, default=settings.server_workers, help="Число рабочих процессов (prod)")
+    args = parser.parse_args()
+
+    if args.mode == "prod":
+        run_prod(args.host, args.port, args.workers)
+    else:
+        run_dev(args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
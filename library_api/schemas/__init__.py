@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -19,13 +19,17 @@ class AuthorUpdate(BaseModel):
     bio: Optional[str] = None
 
 
-class Author(AuthorBase):
+class AuthorSummary(AuthorBase):
     id: int
     
     class Config:
         from_attributes = True
 
 
+class Author(AuthorSummary):
+    book_count: int = 0
+
+
 
 class GenreBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=100)
@@ -39,13 +43,17 @@ class GenreUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=100)
 
 
-class Genre(GenreBase):
+class GenreSummary(GenreBase):
     id: int
     
     class Config:
         from_attributes = True
 
 
+class Genre(GenreSummary):
+    book_count: int = 0
+
+
 
 class BookBase(BaseModel):
     title: str = Field(..., min_length=1, max_length=300)
@@ -77,8 +85,9 @@ class Book(BookBase):
     id: int
     created_at: datetime
 
-    author: Optional[Author] = None
-    genre: Optional[Genre] = None
+    # Без счётчиков: ответ книги не меняется при добавлении других книг автора
+    author: Optional[AuthorSummary] = None
+    genre: Optional[GenreSummary] = None
     
     class Config:
         from_attributes = True
@@ -87,7 +96,94 @@ class Book(BookBase):
 
 class PaginatedResponse(BaseModel):
     items: list[Book]
-    total: int
-    page: int
+    # total/pages равны None при with_total=false
+    total: Optional[int]
+    # None при курсорной пагинации
+    page: Optional[int]
     limit: int
-    pages: int
\ No newline at end of file
+    pages: Optional[int]
+    total_approximate: bool = False
+    # total (и pages) - нижняя граница: строк не меньше, но может быть намного больше
+    total_lower_bound: bool = False
+    next_cursor: Optional[str] = None
+
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: Literal["created", "updated", "exists", "error"]
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class BulkResponse(BaseModel):
+    created: int
+    updated: int
+    existing: int
+    errors: int
+    items: list[BulkItemResult]
+
+
+class BatchGetRequest(BaseModel):
+    ids: list[int] = Field(..., min_length=1)
+
+
+class BookBatch(BaseModel):
+    items: list[Book]
+    # Запрошенные id, которых нет в базе
+    missing: list[int]
+
+
+class AuthorBatch(BaseModel):
+    items: list[Author]
+    missing: list[int]
+
+
+class GenreBatch(BaseModel):
+    items: list[Genre]
+    missing: list[int]
+
+
+
+class CatalogStats(BaseModel):
+    books: int
+    authors: int
+    genres: int
+    by_genre: list[Genre]
+    top_authors: list[Author]
+
+
+
+class BookImportRow(BaseModel):
+    """Строка файла импорта: автор и жанр указываются по имени."""
+    title: str = Field(..., min_length=1, max_length=300)
+    isbn: Optional[str] = Field(None, max_length=20)
+    publication_year: Optional[int] = Field(None, ge=1000, le=2100)
+    description: Optional[str] = None
+    page_count: Optional[int] = Field(None, ge=1)
+    author: str = Field(..., min_length=1, max_length=200)
+    genre: str = Field(..., min_length=1, max_length=100)
+
+
+class ImportJobError(BaseModel):
+    line: int
+    detail: str
+
+
+class ImportJob(BaseModel):
+    id: int
+    status: Literal["queued", "running", "done", "failed"]
+    format: Literal["csv", "ndjson"]
+    # Оценка по числу строк файла; после завершения - точное значение
+    total_rows: Optional[int]
+    processed_rows: int
+    created_rows: int
+    error_count: int
+    progress: float
+    rows_per_second: Optional[float]
+    # Первые ошибки по строкам файла (не больше import_max_errors)
+    errors: list[ImportJobError]
+    detail: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,182 @@
+"""
+Full-text search over books (SQLite FTS5)
+
+Usage:
+    python -m library_api.search rebuild
+"""
+import argparse
+from contextlib import contextmanager
+
+from sqlalchemy import column, func, literal_column, or_, select, table, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query
+
+from library_api import models
+
+FTS_TABLE = "books_fts"
+
+# Веса колонок для bm25: title, description, author_name, genre_name
+RANK_WEIGHTS = (10.0, 1.0, 5.0, 2.0)
+
+books_fts = table(FTS_TABLE, column("rowid"), column("title"), column("description"),
+                  column("author_name"), column("genre_name"))
+
+_CREATE_TABLE = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    title, description, author_name, genre_name,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+_INSERT_BOOK = f"""
+    INSERT INTO {FTS_TABLE} (rowid, title, description, author_name, genre_name)
+    SELECT new.id, new.title, new.description,
+           (SELECT name FROM authors WHERE id = new.author_id),
+           (SELECT name FROM genres WHERE id = new.genre_id);
+"""
+
+# Триггеры поддерживают индекс в актуальном состоянии при любых записях,
+# в том числе сделанных в обход API (скрипты заполнения данных и т.п.)
+_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+    {_INSERT_BOOK}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS books_fts_au
+    AFTER UPDATE OF title, description, author_id, genre_id ON books BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    {_INSERT_BOOK}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS authors_fts_au AFTER UPDATE OF name ON authors BEGIN
+        UPDATE {FTS_TABLE} SET author_name = new.name
+        WHERE rowid IN (SELECT id FROM books WHERE author_id = new.id);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS genres_fts_au AFTER UPDATE OF name ON genres BEGIN
+        UPDATE {FTS_TABLE} SET genre_name = new.name
+        WHERE rowid IN (SELECT id FROM books WHERE genre_id = new.id);
+    END
+    """,
+]
+
+
+def is_supported(engine: Engine) -> bool:
+    return engine.dialect.name == "sqlite"
+
+
+def create_search_index(engine: Engine):
+    if not is_supported(engine):
+        return
+
+    with engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE}
+        ).first()
+        conn.execute(text(_CREATE_TABLE))
+        for trigger in _TRIGGERS:
+            conn.execute(text(trigger))
+
+    # Для существующей базы индекс заполняется один раз при создании
+    if not exists:
+        rebuild_search_index(engine)
+
+
+def rebuild_search_index(engine: Engine) -> int:
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        result = conn.execute(text(f"""
+            INSERT INTO {FTS_TABLE} (rowid, title, description, author_name, genre_name)
+            SELECT books.id, books.title, books.description, authors.name, genres.name
+            FROM books
+            JOIN authors ON authors.id = books.author_id
+            JOIN genres ON genres.id = books.genre_id
+        """))
+        return result.rowcount
+
+
+@contextmanager
+def deferred_search_index(engine: Engine):
+    """Массовая загрузка книг без построчного обновления индекса.
+
+    Триггер вставки снимается на время загрузки, после неё индекс
+    перестраивается целиком одним INSERT ... SELECT.
+    """
+    if not is_supported(engine):
+        yield
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP TRIGGER IF EXISTS books_fts_ai"))
+    try:
+        yield
+    finally:
+        create_search_index(engine)
+        rebuild_search_index(engine)
+
+
+def match_expression(q: str) -> str:
+    # Каждое слово ищется как префикс; спецсимволы FTS5 экранируются кавычками
+    terms = ['"' + term.replace('"', '""') + '"*' for term in q.split()]
+    return " ".join(terms)
+
+
+def apply_search(query: Query, q: str):
+    """Ограничивает запрос книгами, найденными по q.
+
+    Возвращает (query, rank_column); rank_column больше у более релевантных
+    книг и равен None, если полнотекстовый индекс недоступен.
+    """
+    expression = match_expression(q)
+    if not expression:
+        return query, None
+
+    if not is_supported(query.session.get_bind()):
+        pattern = f"%{q}%"
+        return query.filter(or_(
+            models.Book.title.ilike(pattern),
+            models.Book.description.ilike(pattern),
+            models.Author.name.ilike(pattern)
+        )), None
+
+    matches = (
+        select(
+            books_fts.c.rowid.label("book_id"),
+            func.bm25(literal_column(FTS_TABLE), *RANK_WEIGHTS).label("rank")
+        )
+        .where(literal_column(FTS_TABLE).op("MATCH")(expression))
+        .subquery("search")
+    )
+    query = query.join(matches, matches.c.book_id == models.Book.id)
+    # bm25 отрицателен и меньше у лучших совпадений
+    return query, -matches.c.rank
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Полнотекстовый индекс книг")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    from library_api.db import engine, init_db
+
+    if not is_supported(engine):
+        print("Full-text search requires SQLite")
+        return
+    # Создаёт и индекс, если его ещё нет
+    init_db(engine)
+    count = rebuild_search_index(engine)
+    print(f"Search index rebuilt: {count} books")
+
+
+if __name__ == "__main__":
+    main()
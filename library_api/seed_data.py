@@ -6,11 +6,12 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from sqlalchemy.orm import Session
-from db import SessionLocal
+from db import SessionLocal, init_db
 from models import Author, Genre, Book
 
 
 def create_test_data():
+    init_db()
     db: Session = SessionLocal()
     
     try:
@@ -0,0 +1,132 @@
+"""
+Request coalescing (single-flight) for identical concurrent GET requests
+
+While a GET request is being handled, identical requests (same path,
+normalized query string and conditional headers) do not run the handler:
+they wait for the first one and receive a copy of its response - status,
+headers and the already serialized body. The waiting happens in the ASGI
+layer on the event loop, so it works the same for sync handlers (threadpool)
+and for the async mode.
+
+  * a waiter waits at most ``single_flight_timeout`` seconds and then handles
+    the request itself;
+  * an exception in the first request is raised in its waiters too, so all
+    of them get the same 500 response; if the first request is cancelled,
+    the waiters handle the request themselves;
+  * streaming responses (exports) are not shared;
+  * a successful write ends the sharing of requests started before it, so a
+    client reading after its own write never gets a response computed
+    before that write (within one process).
+"""
+import asyncio
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers
+
+from library_api.metrics import registry
+from library_api.replicas import READ_ONLY_SUFFIXES, SAFE_METHODS, reads_from_replica
+
+PATH_PREFIX = "/api/"
+# Заголовки запроса, от которых зависит ответ (304 вместо 200)
+VARY_HEADERS = ("if-none-match", "if-modified-since")
+
+
+class _Flight:
+    def __init__(self):
+        self.done = asyncio.Event()
+        # (http.response.start, тело), если ответ можно отдать ожидающим
+        self.response: Optional[tuple] = None
+        self.error: Optional[BaseException] = None
+
+
+def flight_key(scope) -> tuple:
+    # Параметры упорядочиваются по имени; порядок повторяющихся параметров сохраняется
+    query = sorted(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True), key=lambda item: item[0])
+    headers = Headers(scope=scope)
+    return (scope["path"], urlencode(query), *[headers.get(name) for name in VARY_HEADERS], reads_from_replica())
+
+
+class SingleFlightMiddleware:
+    """ASGI-middleware: одно выполнение одинаковых одновременных GET-запросов."""
+
+    def __init__(self, app, timeout: float = 10.0):
+        self.app = app
+        self.timeout = timeout
+        self._flights = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(PATH_PREFIX):
+            await self.app(scope, receive, send)
+            return
+        if scope["method"] not in SAFE_METHODS and not scope["path"].endswith(READ_ONLY_SUFFIXES):
+            await self.app(scope, receive, self._write_wrapper(send))
+            return
+        if scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        # Event привязан к циклу событий, поэтому ключ включает цикл
+        key = (id(asyncio.get_running_loop()), *flight_key(scope))
+        flight = self._flights.get(key)
+        if flight is not None and await self._wait(flight, send):
+            return
+        await self._lead(key, scope, receive, send)
+
+    def _write_wrapper(self, send):
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                # Запросы, начатые до записи, больше не разделяются
+                self._flights = {}
+            await send(message)
+        return send_wrapper
+
+    async def _wait(self, flight: _Flight, send) -> bool:
+        """Отдаёт ответ выполняющегося запроса; False - запрос нужно выполнить самому."""
+        try:
+            await asyncio.wait_for(flight.done.wait(), self.timeout)
+        except asyncio.TimeoutError:
+            registry.observe_coalesced("timeout")
+            return False
+        if flight.error is not None:
+            registry.observe_coalesced("error")
+            raise flight.error
+        if flight.response is None:
+            # Потоковый ответ или отменённый запрос
+            return False
+
+        registry.observe_coalesced("shared")
+        start, body = flight.response
+        await send({**start, "headers": list(start["headers"])})
+        await send({"type": "http.response.body", "body": body, "more_body": False})
+        return True
+
+    async def _lead(self, key: tuple, scope, receive, send):
+        flight = _Flight()
+        self._flights[key] = flight
+        start, chunks, shareable = None, [], True
+
+        async def send_wrapper(message):
+            nonlocal start, shareable
+            if message["type"] == "http.response.start":
+                start = message
+            elif message["type"] == "http.response.body" and shareable:
+                if message.get("more_body", False):
+                    shareable = False
+                    chunks.clear()
+                else:
+                    chunks.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as error:
+            flight.error = error
+            raise
+        else:
+            if shareable and start is not None:
+                flight.response = (start, b"".join(chunks))
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            flight.done.set()
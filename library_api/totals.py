@@ -0,0 +1,195 @@
+"""
+Cache of exact COUNT(*) results for filtered book lists
+
+estimate_total avoids a full count over a large filtered set: for author_id /
+genre_id filters it uses the books counters of authors and genres and the
+table size from sqlite_stat1 (ANALYZE), or counts exactly where the counters
+are not maintained; for text filters it returns the scan limit flagged as a
+lower bound.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Query, Session
+
+from library_api import counters, models
+from library_api.cache import CacheBackend, response_cache
+from library_api.config import settings
+from library_api.replicas import replica_may_lag
+
+# Сколько строк максимум просматривает оценочный подсчёт
+ESTIMATE_SCAN_LIMIT = 10000
+# Счётчик инвалидаций в общем кэше (CacheBackend.incr_counter)
+GENERATION_COUNTER = "totals"
+
+
+class TotalsCache:
+    def __init__(self, ttl: float = 60.0, max_entries: int = 1024, stale_max_age: float = 300.0,
+                 shared: Optional[CacheBackend] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stale_max_age = stale_max_age
+        self._lock = threading.Lock()
+        # key -> (значение, время подсчёта)
+        self._fresh = OrderedDict()
+        # После инвалидации значения остаются здесь как приблизительные,
+        # но не дольше stale_max_age секунд с момента подсчёта
+        self._stale = {}
+        # Значения остаются в памяти процесса, а через общий счётчик поколений
+        # процесс узнаёт об инвалидациях, сделанных другими рабочими процессами
+        self._shared = shared
+        self._generation = shared.get_counter(GENERATION_COUNTER) if shared else 0
+        # Растёт при каждой инвалидации: подсчёт, начатый до неё, не сохраняется
+        self._version = 0
+
+    def _sync_generation(self):
+        if self._shared is None:
+            return
+        generation = self._shared.get_counter(GENERATION_COUNTER)
+        if generation != self._generation:
+            self._generation = generation
+            self._expire_all()
+
+    def _expire_all(self):
+        self._version += 1
+        self._stale.update(self._fresh)
+        self._fresh.clear()
+
+    def get(self, key) -> Optional[int]:
+        with self._lock:
+            self._sync_generation()
+            entry = self._fresh.get(key)
+            if entry is None:
+                return None
+            value, counted_at = entry
+            if counted_at + self.ttl < time.monotonic():
+                self._stale[key] = self._fresh.pop(key)
+                return None
+            self._fresh.move_to_end(key)
+            return value
+
+    def version(self) -> int:
+        """Значение для set: подсчитанное до следующей инвалидации."""
+        with self._lock:
+            self._sync_generation()
+            return self._version
+
+    def get_stale(self, key) -> Optional[int]:
+        with self._lock:
+            entry = self._stale.get(key)
+            if entry is None:
+                return None
+            value, counted_at = entry
+            if counted_at + self.stale_max_age < time.monotonic():
+                # Слишком старое значение лучше пересчитать
+                del self._stale[key]
+                return None
+            return value
+
+    def set(self, key, value: int, version: int):
+        if replica_may_lag(self._shared):
+            return
+        with self._lock:
+            self._sync_generation()
+            if version != self._version:
+                # Запись успела сбросить кэш, пока выполнялся подсчёт
+                return
+            self._fresh[key] = (value, time.monotonic())
+            self._fresh.move_to_end(key)
+            self._stale.pop(key, None)
+            while len(self._fresh) > self.max_entries:
+                self._fresh.popitem(last=False)
+            while len(self._stale) > self.max_entries:
+                self._stale.pop(next(iter(self._stale)))
+
+    def invalidate(self):
+        with self._lock:
+            self._expire_all()
+            if self._shared is not None:
+                self._generation = self._shared.incr_counter(GENERATION_COUNTER)
+
+
+totals_cache = TotalsCache(
+    settings.totals_cache_ttl, settings.totals_cache_max_entries, settings.totals_stale_max_age,
+    shared=response_cache.backend if settings.response_cache_backend == "sqlite" else None
+)
+
+
+def filters_key(**filters) -> tuple:
+    return tuple(sorted((name, value) for name, value in filters.items() if value is not None))
+
+
+def exact_total(query: Query, key: tuple) -> int:
+    total = totals_cache.get(key)
+    if total is None:
+        version = totals_cache.version()
+        total = query.order_by(None).count()
+        totals_cache.set(key, total, version)
+    return total
+
+
+def _table_rows(db: Session) -> int:
+    """Число книг по статистике ANALYZE (sqlite_stat1), без неё - по максимальному id."""
+    if db.get_bind().dialect.name == "sqlite" and db.scalar(
+        text("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+    ):
+        stat = db.scalar(text("SELECT stat FROM sqlite_stat1 WHERE tbl = 'books' LIMIT 1"))
+        if stat:
+            return int(stat.split()[0])
+    return db.scalar(select(func.max(models.Book.id))) or 0
+
+
+def _counter_estimate(db: Session, filters: dict, scanned: int) -> tuple[int, bool]:
+    """Оценка по счётчикам книг автора и жанра: (total, approximate).
+
+    Счётчики ведут только триггеры SQLite (library_api.counters).
+    """
+    counts = []
+    if "author_id" in filters:
+        counts.append(db.scalar(select(models.Author.book_count).where(models.Author.id == filters["author_id"])) or 0)
+    if "genre_id" in filters:
+        counts.append(db.scalar(select(models.Genre.book_count).where(models.Genre.id == filters["genre_id"])) or 0)
+    if len(counts) == 1:
+        # Счётчик поддерживается триггерами и точен
+        return max(counts[0], scanned), False
+    # Автор и жанр считаются независимыми: доля книг автора среди книг жанра
+    # та же, что во всём каталоге
+    author_books, genre_books = counts
+    estimate = author_books * genre_books // max(_table_rows(db), 1)
+    return min(max(estimate, scanned), author_books, genre_books), True
+
+
+def estimate_total(db: Session, query: Query, key: tuple) -> tuple[int, bool, bool]:
+    """Возвращает (total, approximate, lower_bound) без полного подсчёта по большой выборке."""
+    total = totals_cache.get(key)
+    if total is not None:
+        return total, False, False
+
+    stale = totals_cache.get_stale(key)
+    if stale is not None:
+        return stale, True, False
+
+    # Считаем не больше ESTIMATE_SCAN_LIMIT + 1 строк
+    version = totals_cache.version()
+    limited = query.order_by(None).with_entities(models.Book.id).limit(ESTIMATE_SCAN_LIMIT + 1).subquery()
+    scanned = db.scalar(select(func.count()).select_from(limited))
+    if scanned <= ESTIMATE_SCAN_LIMIT:
+        totals_cache.set(key, scanned, version)
+        return scanned, False, False
+
+    if not key:
+        # Без фильтров максимальный id берётся из первичного ключа за O(log n)
+        return db.scalar(select(func.max(models.Book.id))) or scanned, True, False
+    filters = dict(key)
+    if filters.keys() <= {"author_id", "genre_id"}:
+        if counters.is_supported(db.get_bind()):
+            return (*_counter_estimate(db, filters, scanned), False)
+        # Без триггеров book_count не ведётся: точный подсчёт по индексу внешнего ключа
+        total = query.order_by(None).count()
+        totals_cache.set(key, total, version)
+        return total, False, False
+    # Для текстовых фильтров оценки нет: известно только, что строк больше лимита
+    return scanned, True, True
@@ -0,0 +1,153 @@
+"""
+Group commit for single-item writes
+
+With ``write_batch_window_ms`` > 0, create/update/delete handlers hand their
+write to a GroupCommitWriter instead of committing it themselves. The writer
+thread collects the writes that arrive within the window (up to
+``write_batch_max_size``), runs each one in its own SAVEPOINT of a shared
+transaction and commits them together, so N concurrent writes cost one
+commit (one fsync) instead of N. A write that fails is rolled back to its
+savepoint and only its caller gets the error; the others are committed.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.orm.exc import StaleDataError
+
+from library_api.conditional import PRECONDITION_FAILED, commit_versioned
+from library_api.config import settings
+from library_api.db import SQLALCHEMY_DATABASE_URL, apply_sqlite_pragmas, engine, engine_options, is_sqlite
+from library_api.metrics import instrument_engine, registry
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """Поток, выполняющий записи пакетами в одной транзакции."""
+
+    def __init__(self, session_factory, window_ms: float, max_batch: int = 64):
+        self._session_factory = session_factory
+        self._window = window_ms / 1000
+        self._max_batch = max_batch
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, work, *args):
+        """Выполняет work(session, *args) в ближайшем пакете; результат или исключение work."""
+        future = Future()
+        self._start()
+        self._queue.put((future, work, args))
+        return future.result()
+
+    def close(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            # Окно отсчитывается от первой записи пакета
+            deadline = time.monotonic() + self._window
+            stop = False
+            while len(batch) < self._max_batch:
+                timeout = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._execute(batch)
+            if stop:
+                return
+
+    def _execute(self, batch: list):
+        done = []
+        with self._session_factory() as session:
+            for future, work, args in batch:
+                try:
+                    # Ошибка одной записи откатывает только её SAVEPOINT
+                    with session.begin_nested():
+                        result = work(session, *args)
+                except Exception as error:
+                    future.set_exception(error)
+                    continue
+                done.append((future, result))
+
+            try:
+                session.commit()
+            except Exception as error:
+                session.rollback()
+                for future, _ in done:
+                    future.set_exception(error)
+                return
+        registry.observe_write_batch(len(batch))
+        for future, result in done:
+            future.set_result(result)
+
+
+def writer_sessionmaker(url: str = SQLALCHEMY_DATABASE_URL) -> sessionmaker:
+    if not is_sqlite(url):
+        return sessionmaker(bind=engine, autoflush=False)
+
+    # pysqlite не начинает транзакцию до первого INSERT, и RELEASE первого
+    # SAVEPOINT фиксировал бы запись отдельно; транзакция пакета открывается
+    # явно, сразу с блокировкой записи
+    writer_engine = create_engine(url, **engine_options(url))
+    apply_sqlite_pragmas(writer_engine)
+    if settings.metrics_enabled:
+        instrument_engine(writer_engine)
+
+    @event.listens_for(writer_engine, "connect")
+    def _disable_implicit_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(writer_engine, "begin")
+    def _begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return sessionmaker(bind=writer_engine, autoflush=False)
+
+
+def make_writer():
+    # В асинхронном режиме обработчик выполняется в потоке цикла событий,
+    # ожидание пакета остановило бы его
+    if settings.write_batch_window_ms <= 0 or settings.async_mode:
+        return None
+    return GroupCommitWriter(writer_sessionmaker(), settings.write_batch_window_ms, settings.write_batch_max_size)
+
+
+group_writer = make_writer()
+
+
+def run_write(db: Session, work, *args):
+    """Выполняет и фиксирует work(session, *args), сам или через group_writer."""
+    if group_writer is None:
+        result = work(db, *args)
+        commit_versioned(db)
+        return result
+
+    try:
+        return group_writer.submit(work, *args)
+    except StaleDataError:
+        raise HTTPException(status_code=412, detail=PRECONDITION_FAILED)
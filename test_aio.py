@@ -0,0 +1,115 @@
+import asyncio
+import itertools
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from library_api import db as database
+from library_api.cache import response_cache
+from library_api.config import settings
+from library_api.db import get_async_db, get_async_read_db, init_db
+from library_api.reference import reference_cache
+from library_api.routers import authors, books, genres, stats
+from library_api.routers.aio import make_async_router
+from library_api.totals import totals_cache
+
+# Асинхронный режим: CRUD и списки через AsyncSession, чтение - через асинхронную get_read_db
+
+sessions = []
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    path = tmp_path_factory.mktemp("aio") / "library.db"
+    engine = create_engine(f"sqlite:///{path}")
+    init_db(engine)
+    engine.dispose()
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    factory = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+    def override(role):
+        async def get_session():
+            sessions.append(role)
+            async with factory() as db:
+                yield db
+        return get_session
+
+    app = FastAPI()
+    for router in (books.router, authors.router, genres.router, stats.router):
+        app.include_router(make_async_router(router))
+    app.dependency_overrides[get_async_db] = override("primary")
+    app.dependency_overrides[get_async_read_db] = override("read")
+
+    totals_cache.invalidate()
+    response_cache.clear()
+    reference_cache.clear()
+    yield TestClient(app)
+    totals_cache.invalidate()
+    response_cache.clear()
+    reference_cache.clear()
+    asyncio.run(async_engine.dispose())
+
+
+def _call(client, method, path, role, **kwargs):
+    sessions.clear()
+    response = client.request(method, path, **kwargs)
+    assert response.status_code == 200, response.text
+    # Обработчик получил асинхронный вариант своей зависимости
+    assert sessions == [role]
+    return response
+
+
+def test_crud_and_lists(client):
+    genre = _call(client, "POST", "/api/v1/genres/", "primary", json={"name": "Роман"}).json()
+    author = _call(client, "POST", "/api/v1/authors/", "primary", json={"name": "Толстой"}).json()
+    book = _call(client, "POST", "/api/v1/books/", "primary", json={
+        "title": "Война и мир", "author_id": author["id"], "genre_id": genre["id"], "publication_year": 1869
+    }).json()
+    assert book["author"]["name"] == "Толстой"
+
+    response = _call(client, "GET", f"/api/v1/books/{book['id']}", "read")
+    assert response.json()["title"] == "Война и мир"
+    assert "etag" in response.headers
+
+    # Заголовки, выставленные обработчиком через параметр Response, сохраняются
+    response = _call(client, "PUT", f"/api/v1/authors/{author['id']}", "primary", json={"bio": "Писатель"})
+    assert response.json()["bio"] == "Писатель"
+    assert "etag" in response.headers
+    response = _call(client, "PUT", f"/api/v1/books/{book['id']}", "primary", json={"page_count": 1300})
+    assert response.json()["page_count"] == 1300
+
+    listing = _call(client, "GET", "/api/v1/books/", "read", params={"author_id": author["id"]}).json()
+    assert [item["id"] for item in listing["items"]] == [book["id"]]
+    assert listing["total"] == 1
+    assert [item["name"] for item in _call(client, "GET", "/api/v1/authors/", "read").json()] == ["Толстой"]
+    assert [item["book_count"] for item in _call(client, "GET", "/api/v1/genres/", "read").json()] == [1]
+    assert _call(client, "GET", "/api/v1/stats/", "read").json()["books"] == 1
+
+    _call(client, "DELETE", f"/api/v1/books/{book['id']}", "primary")
+    assert client.get(f"/api/v1/books/{book['id']}").status_code == 404
+    assert _call(client, "GET", "/api/v1/books/", "read").json()["total"] == 0
+
+
+def test_async_read_db_uses_replica(monkeypatch):
+    replica = create_async_engine("sqlite+aiosqlite://")
+    monkeypatch.setattr(settings, "read_replica_urls", ["sqlite://"])
+    monkeypatch.setattr(database, "_next_async_replica", lambda: itertools.cycle([replica]))
+
+    async def bind():
+        generator = get_async_read_db()
+        db = await generator.__anext__()
+        try:
+            return db.bind
+        finally:
+            await generator.aclose()
+
+    assert asyncio.run(bind()) is replica
+    asyncio.run(replica.dispose())
@@ -0,0 +1,76 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import pytest
+
+from library_api import bulk
+from library_api.config import settings
+from library_api.models.database import Author, Book, Genre
+
+# Batch-get: порядок запроса, отсутствующие и повторяющиеся id, ограничение числа id
+
+
+@pytest.fixture(scope="module")
+def client(api_client, db_session):
+    db = db_session()
+    authors = [Author(name=f"Автор {i}") for i in range(3)]
+    genres = [Genre(name=f"Жанр {i}") for i in range(3)]
+    db.add_all(authors + genres)
+    db.flush()
+    db.add_all([
+        Book(title=f"Книга {i}", isbn=f"batch-{i}", author_id=authors[i % 3].id, genre_id=genres[i % 3].id)
+        for i in range(6)
+    ])
+    db.commit()
+    db.close()
+    return api_client
+
+
+def _ids(body) -> list:
+    return [item["id"] for item in body["items"]]
+
+
+@pytest.mark.parametrize("path", ["/api/v1/books/batch-get", "/api/v1/authors/batch-get", "/api/v1/genres/batch-get"])
+def test_missing_ids_are_listed_in_request_order(client, path):
+    response = client.post(path, json={"ids": [3, 999, 1, 998]})
+    assert response.status_code == 200
+    body = response.json()
+    assert _ids(body) == [3, 1]
+    assert body["missing"] == [999, 998]
+
+
+def test_books_include_author_and_genre(client):
+    body = client.post("/api/v1/books/batch-get", json={"ids": [2]}).json()
+    book = client.get("/api/v1/books/2").json()
+    assert body["items"] == [book]
+    assert body["items"][0]["author"]["name"] == "Автор 1"
+
+
+@pytest.mark.parametrize("path", ["/api/v1/books/batch-get", "/api/v1/authors/batch-get"])
+def test_duplicate_ids_are_returned_once(client, path):
+    body = client.post(path, json={"ids": [2, 1, 2, 999, 1, 999]}).json()
+    assert _ids(body) == [2, 1]
+    assert body["missing"] == [999]
+
+
+def test_max_ids_limit(client, monkeypatch):
+    monkeypatch.setattr(settings, "batch_get_max_ids", 3)
+    assert client.post("/api/v1/books/batch-get", json={"ids": [1, 2, 3]}).status_code == 200
+    # Ограничение проверяется до удаления повторов
+    response = client.post("/api/v1/books/batch-get", json={"ids": [1, 2, 3, 3]})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Не больше 3 идентификаторов в запросе"
+
+
+def test_empty_and_invalid_ids_are_rejected(client):
+    assert client.post("/api/v1/books/batch-get", json={"ids": []}).status_code == 422
+    assert client.post("/api/v1/genres/batch-get", json={"ids": ["x"]}).status_code == 422
+
+
+def test_ids_are_fetched_in_chunks(client, monkeypatch):
+    monkeypatch.setattr(bulk, "IN_CHUNK_SIZE", 2)
+    body = client.post("/api/v1/books/batch-get", json={"ids": [6, 5, 4, 3, 2, 1, 7]}).json()
+    assert _ids(body) == [6, 5, 4, 3, 2, 1]
+    assert body["missing"] == [7]
@@ -0,0 +1,94 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import pytest
+from sqlalchemy import event
+
+from library_api.models.database import Author, Book, Genre
+from library_api.projection import SparseBookPage, parse_projection, projection_page_model
+
+# Тест количества SQL-запросов на эндпоинты книг (защита от N+1)
+
+statements = []
+
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    statements.append(statement)
+
+
+@pytest.fixture(scope="module")
+def client(api_client, db_engine, db_session):
+    db = db_session()
+    authors = [Author(name=f"Author {i}", bio="bio") for i in range(20)]
+    genres = [Genre(name=f"Genre {i}") for i in range(20)]
+    db.add_all(authors + genres)
+    db.flush()
+    for i in range(60):
+        db.add(Book(title=f"Book {i}", isbn=f"isbn-{i}",
+                    author_id=authors[i % 20].id, genre_id=genres[i % 20].id))
+    db.commit()
+    db.close()
+
+    event.listen(db_engine, "before_cursor_execute", _record_statement)
+    return api_client
+
+
+def _count_statements(call):
+    statements.clear()
+    response = call()
+    assert response.status_code == 200, response.text
+    return len(statements), response.json()
+
+
+def test_list_books_statement_count_does_not_depend_on_page_size(client):
+    small, body = _count_statements(lambda: client.get("/api/v1/books/", params={"limit": 5}))
+    large, body = _count_statements(lambda: client.get("/api/v1/books/", params={"limit": 50}))
+
+    assert len(body["items"]) == 50
+    assert all(item["author"] and item["genre"] for item in body["items"])
+    # COUNT (из кэша после первого запроса) + выборка страницы
+    assert small <= 2
+    assert large <= 1
+
+
+def test_get_book_is_single_statement(client):
+    count, body = _count_statements(lambda: client.get("/api/v1/books/1"))
+
+    assert body["author"]["name"] == "Author 0"
+    assert count == 1
+
+
+def test_create_and_update_book_load_relations_once(client):
+    payload = {"title": "New", "isbn": "new-isbn", "author_id": 1, "genre_id": 2}
+    count, body = _count_statements(lambda: client.post("/api/v1/books/", json=payload))
+    assert body["author"]["id"] == 1 and body["genre"]["id"] == 2
+    # проверки автора, жанра и ISBN, INSERT и одна выборка результата
+    assert count <= 5
+
+    count, body = _count_statements(
+        lambda: client.put(f"/api/v1/books/{body['id']}", json={"author_id": 3})
+    )
+    assert body["author"]["id"] == 3
+    # выборка книги, проверка автора, UPDATE и одна выборка результата
+    assert count <= 4
+
+
+def test_list_books_projection_selects_only_requested_columns(client):
+    params = {"fields": "id,title,author.name", "with_total": "false"}
+    count, body = _count_statements(lambda: client.get("/api/v1/books/", params=params))
+
+    assert count == 1
+    # Тексты описания и биографии не читаются из базы
+    assert "description" not in statements[0] and "bio" not in statements[0]
+    for item in body["items"]:
+        assert set(item) == {"id", "title", "author"}
+    projection_page_model(parse_projection(params["fields"], None)).model_validate(body)
+    SparseBookPage.model_validate(body)
+
+
+def test_list_books_schema_describes_projection_pages(client):
+    response = client.get("/openapi.json").json()["paths"]["/api/v1/books/"]["get"]["responses"]["200"]
+    refs = [option["$ref"] for option in response["content"]["application/json"]["schema"]["anyOf"]]
+    assert refs == ["#/components/schemas/PaginatedResponse", "#/components/schemas/SparseBookPage"]
@@ -0,0 +1,128 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import pytest
+
+from library_api.config import settings
+
+# Пакетное создание: JSON-массив и NDJSON, повторы в запросе, upsert, некорректные строки
+
+NDJSON = {"Content-Type": "application/x-ndjson"}
+
+
+@pytest.fixture(scope="module")
+def client(api_client):
+    return api_client
+
+
+@pytest.fixture(scope="module")
+def refs(client):
+    author = client.post("/api/v1/authors/", json={"name": "Автор"}).json()["id"]
+    genre = client.post("/api/v1/genres/", json={"name": "Жанр"}).json()["id"]
+    return author, genre
+
+
+def _ndjson(items) -> str:
+    return "\n".join(json.dumps(item, ensure_ascii=False) for item in items) + "\n"
+
+
+def _statuses(body) -> list:
+    return [(item["index"], item["status"]) for item in body["items"]]
+
+
+def test_json_array_and_ndjson_give_same_result(client, refs, monkeypatch):
+    # Несколько пакетов INSERT: id сопоставляются со своими строками
+    monkeypatch.setattr(settings, "bulk_batch_size", 2)
+    author, genre = refs
+    books = [{"title": f"Формат {i}", "author_id": author, "genre_id": genre} for i in range(5)]
+
+    from_array = client.post("/api/v1/books/bulk", json=books).json()
+    from_ndjson = client.post("/api/v1/books/bulk", content=_ndjson(books), headers=NDJSON).json()
+
+    for body in (from_array, from_ndjson):
+        assert (body["created"], body["errors"]) == (5, 0)
+        assert _statuses(body) == [(i, "created") for i in range(5)]
+        for item, book in zip(body["items"], books):
+            assert client.get(f"/api/v1/books/{item['id']}").json()["title"] == book["title"]
+    assert not {item["id"] for item in from_array["items"]} & {item["id"] for item in from_ndjson["items"]}
+
+
+def test_ndjson_skips_blank_lines(client):
+    response = client.post("/api/v1/authors/bulk", content='{"name": "Первый"}\n\n  \n{"name": "Второй"}', headers=NDJSON)
+    assert response.status_code == 200
+    assert response.json()["created"] == 2
+
+
+def test_duplicates_in_payload(client, refs):
+    author, genre = refs
+    books = [
+        {"title": "Дубль 1", "isbn": "dup-1", "author_id": author, "genre_id": genre},
+        {"title": "Дубль 2", "isbn": "dup-1", "author_id": author, "genre_id": genre},
+        {"title": "Без ISBN", "author_id": author, "genre_id": genre},
+        {"title": "Без ISBN", "author_id": author, "genre_id": genre},
+    ]
+    body = client.post("/api/v1/books/bulk", json=books).json()
+    assert _statuses(body) == [(0, "created"), (1, "error"), (2, "created"), (3, "created")]
+    assert body["items"][1]["detail"] == "ISBN повторяется в запросе"
+    # Одинаковые строки получают разные id
+    assert body["items"][2]["id"] != body["items"][3]["id"]
+
+    body = client.post("/api/v1/genres/bulk", json=[{"name": "Повтор"}, {"name": "Повтор"}]).json()
+    assert _statuses(body) == [(0, "created"), (1, "error")]
+    assert body["items"][1]["detail"] == "Название жанра повторяется в запросе"
+
+
+def test_upsert_updates_existing_rows(client, refs):
+    author, genre = refs
+    other_author = client.post("/api/v1/authors/", json={"name": "Другой автор"}).json()["id"]
+    created = client.post("/api/v1/books/", json={
+        "title": "Старое название", "isbn": "up-1", "author_id": author, "genre_id": genre
+    }).json()
+    assert client.get(f"/api/v1/books/{created['id']}").status_code == 200
+
+    update = [{"title": "Новое название", "isbn": "up-1", "author_id": other_author, "genre_id": genre}]
+    body = client.post("/api/v1/books/bulk", json=update).json()
+    assert _statuses(body) == [(0, "error")]
+    assert body["items"][0]["detail"] == "Книга с таким ISBN уже существует"
+
+    body = client.post("/api/v1/books/bulk", params={"upsert": "true"}, json=update).json()
+    assert (body["created"], body["updated"]) == (0, 1)
+    assert body["items"][0] == {"index": 0, "status": "updated", "id": created["id"], "detail": None}
+
+    # Закэшированная карточка и списки автора сброшены
+    book = client.get(f"/api/v1/books/{created['id']}").json()
+    assert (book["title"], book["author"]["id"]) == ("Новое название", other_author)
+    assert client.get("/api/v1/books/", params={"author_id": other_author}).json()["total"] == 1
+
+    body = client.post("/api/v1/genres/bulk", params={"upsert": "true"}, json=[{"name": "Жанр"}]).json()
+    assert body["items"][0] == {"index": 0, "status": "exists", "id": genre, "detail": None}
+
+
+def test_invalid_items_are_reported_per_index(client, refs):
+    author, genre = refs
+    lines = [
+        {"title": "Годная", "author_id": author, "genre_id": genre},
+        {"author_id": author, "genre_id": genre},
+        42,
+        {"title": "Нет автора", "author_id": 10 ** 6, "genre_id": genre},
+    ]
+    body = client.post("/api/v1/books/bulk", content=_ndjson(lines), headers=NDJSON).json()
+    assert _statuses(body) == [(0, "created"), (1, "error"), (2, "error"), (3, "error")]
+    assert body["items"][1]["detail"].startswith("title:")
+    assert body["items"][3]["detail"] == "Автор не найден"
+
+
+@pytest.mark.parametrize("content, headers", [
+    ('{"name": "Целая"}\n{"name": оборвана\n', NDJSON),
+    ('[{"name": "Незакрытый"}', {"Content-Type": "application/json"}),
+    ('{"name": "Не массив"}', {"Content-Type": "application/json"}),
+])
+def test_malformed_payload_is_rejected(client, content, headers):
+    before = client.get("/api/v1/genres/").json()
+    response = client.post("/api/v1/genres/bulk", content=content.encode(), headers=headers)
+    assert response.status_code == 400
+    # Ни одна строка не создана
+    assert client.get("/api/v1/genres/").json() == before
@@ -0,0 +1,53 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import pytest
+
+from library_api.cache import MemoryBackend, ResponseCache, SQLiteBackend
+
+# Кэш ответов: тело, вычисленное до записи, не сохраняется после её инвалидации
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        backend = MemoryBackend(100)
+    else:
+        backend = SQLiteBackend(str(tmp_path / "cache.db"), 100)
+    return ResponseCache(backend, ttl=30.0)
+
+
+def test_store_after_invalidation_of_its_tag_is_dropped(cache):
+    assert cache.get("books:get?book_id=1") is None
+    # Запись сбросила тег, пока чтение вычисляло ответ
+    cache.invalidate("book:1")
+    cache.store("books:get?book_id=1", b'{"title":"old"}', tags=["book:1"])
+    assert cache.get("books:get?book_id=1") is None
+
+    cache.store("books:get?book_id=1", b'{"title":"new"}', tags=["book:1"])
+    assert cache.get("books:get?book_id=1").body == b'{"title":"new"}'
+
+
+def test_other_tags_and_clear(cache):
+    assert cache.get("books:get?book_id=1") is None
+    cache.invalidate("book:2")
+    cache.store("books:get?book_id=1", b"{}", tags=["book:1"])
+    assert cache.get("books:get?book_id=1") is not None
+
+    assert cache.get("books:get?book_id=3") is None
+    cache.clear()
+    cache.store("books:get?book_id=3", b"{}", tags=["book:3"])
+    assert cache.get("books:get?book_id=3") is None
+
+
+def test_invalidation_by_concurrent_request_drops_store(cache):
+    # Другой запрос в своём потоке промахивается и сбрасывает тег, пока этот вычисляет ответ
+    assert cache.get("key") is None
+    thread = threading.Thread(target=lambda: (cache.get("key"), cache.invalidate("tag")))
+    thread.start()
+    thread.join()
+    cache.store("key", b"{}", tags=["tag"])
+    assert cache.get("key") is None
@@ -0,0 +1,54 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response
+from fastapi.testclient import TestClient
+
+from library_api.compression import CompressionMiddleware
+
+# Сжатие ответов: Vary у каждого ответа, который мог быть сжат
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = FastAPI()
+
+    @app.get("/large")
+    def large():
+        return PlainTextResponse("книга " * 100)
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("книга")
+
+    @app.get("/image")
+    def image():
+        return Response(b"\0" * 1000, media_type="image/png")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+    return TestClient(app)
+
+
+def test_compressed_response_varies_on_accept_encoding(client):
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.text == "книга " * 100
+
+
+def test_uncompressed_eligible_response_varies_on_accept_encoding(client):
+    response = client.get("/large", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == ("книга " * 100).encode()
+
+
+@pytest.mark.parametrize("path", ["/small", "/image"])
+def test_ineligible_response_has_no_vary(client, path):
+    response = client.get(path, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
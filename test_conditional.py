@@ -0,0 +1,77 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import pytest
+
+# Условные запросы к спискам: страница, изменившаяся после удаления, не отдаётся как 304
+
+
+@pytest.fixture(scope="module")
+def client(api_client):
+    return api_client
+
+
+def _create(client, path, payload) -> int:
+    response = client.post(path, json=payload)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def test_list_page_after_delete_is_not_reported_unmodified(client):
+    genre = _create(client, "/api/v1/genres/", {"name": "Роман"})
+    author_y = _create(client, "/api/v1/authors/", {"name": "Y"})
+    first, second = [
+        _create(client, "/api/v1/books/", {"title": f"Книга {i}", "author_id": author_y, "genre_id": genre})
+        for i in (1, 2)
+    ]
+    # Книга 3 - автора X, созданного позже
+    author_x = _create(client, "/api/v1/authors/", {"name": "X"})
+    third = _create(client, "/api/v1/books/", {"title": "Книга 3", "author_id": author_x, "genre_id": genre})
+
+    params = {"genre_id": genre, "sort_by": "id", "sort_order": "desc", "limit": 2}
+    response = client.get("/api/v1/books/", params=params)
+    assert [book["id"] for book in response.json()["items"]] == [third, second]
+    etag = response.headers["etag"]
+
+    assert client.delete(f"/api/v1/books/{third}").status_code == 200
+
+    # Книга 1 старше книг 2 и 3, но страница теперь другая
+    since = format_datetime(datetime.now(timezone.utc) + timedelta(minutes=1), usegmt=True)
+    response = client.get("/api/v1/books/", params=params, headers={"If-Modified-Since": since})
+    assert response.status_code == 200
+    assert [book["id"] for book in response.json()["items"]] == [second, first]
+
+    response = client.get("/api/v1/books/", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.parametrize("path", ["/api/v1/books/", "/api/v1/authors/", "/api/v1/genres/"])
+def test_lists_send_etag_without_last_modified(client, path):
+    response = client.get(path)
+    assert response.status_code == 200
+    assert "etag" in response.headers
+    assert "last-modified" not in response.headers
+    # Повтор из кэша ответов - те же заголовки
+    response = client.get(path)
+    assert "last-modified" not in response.headers
+    assert client.get(path, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+
+def test_if_match_uses_strong_comparison(client):
+    genre = _create(client, "/api/v1/genres/", {"name": "Повесть"})
+    author = _create(client, "/api/v1/authors/", {"name": "Z"})
+    book = _create(client, "/api/v1/books/", {"title": "Книга", "author_id": author, "genre_id": genre})
+    etag = client.get(f"/api/v1/books/{book}", headers={"Accept-Encoding": "identity"}).headers["etag"]
+    assert not etag.startswith("W/")
+
+    # If-None-Match сравнивает слабо, If-Match - сильно
+    assert client.get(f"/api/v1/books/{book}", headers={"If-None-Match": "W/" + etag}).status_code == 304
+    response = client.put(f"/api/v1/books/{book}", json={"page_count": 10}, headers={"If-Match": "W/" + etag})
+    assert response.status_code == 412
+    response = client.put(f"/api/v1/books/{book}", json={"page_count": 10}, headers={"If-Match": etag})
+    assert response.status_code == 200
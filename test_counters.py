@@ -0,0 +1,94 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from library_api import counters
+from library_api.counters import reconcile_book_counts
+from library_api.db import init_db
+
+# Счётчики книг и сводка каталога: создание, перенос и удаление книг и авторов
+
+
+@pytest.fixture(scope="module")
+def db_engine():
+    # В отличие от базы из conftest - с триггерами счётчиков
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    init_db(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def client(api_client):
+    return api_client
+
+
+def _create(client, path, payload) -> int:
+    response = client.post(path, json=payload)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _counts(client, author_ids, genre_ids) -> tuple:
+    return (
+        [client.get(f"/api/v1/authors/{author_id}").json()["book_count"] for author_id in author_ids],
+        [client.get(f"/api/v1/genres/{genre_id}").json()["book_count"] for genre_id in genre_ids],
+    )
+
+
+def _stats(client) -> tuple:
+    stats = client.get("/api/v1/stats/").json()
+    return stats["books"], stats["authors"], stats["genres"]
+
+
+def test_counts_follow_book_writes(client):
+    genres = [_create(client, "/api/v1/genres/", {"name": f"Жанр {i}"}) for i in range(2)]
+    authors = [_create(client, "/api/v1/authors/", {"name": f"Автор {i}"}) for i in range(3)]
+    assert _stats(client) == (0, 3, 2)
+
+    books = [
+        _create(client, "/api/v1/books/", {"title": f"Книга {i}", "author_id": authors[i // 2], "genre_id": genres[0]})
+        for i in range(3)
+    ]
+    assert _counts(client, authors, genres) == ([2, 1, 0], [3, 0])
+    assert _stats(client) == (3, 3, 2)
+
+    # Перенос книги к другому автору и жанру
+    response = client.put(f"/api/v1/books/{books[0]}", json={"author_id": authors[1], "genre_id": genres[1]})
+    assert response.status_code == 200
+    assert _counts(client, authors, genres) == ([1, 2, 0], [2, 1])
+
+    assert client.delete(f"/api/v1/books/{books[1]}").status_code == 200
+    assert _counts(client, authors, genres) == ([0, 2, 0], [1, 1])
+    assert _stats(client) == (2, 3, 2)
+
+    # Число авторов берётся из catalog_counts и следует за удалением
+    assert client.delete(f"/api/v1/authors/{authors[2]}").status_code == 200
+    assert _stats(client) == (2, 2, 2)
+
+
+def test_reconcile_fixes_drifted_counts(client, db_engine):
+    with db_engine.begin() as conn:
+        conn.execute(text("UPDATE catalog_counts SET value = 100 WHERE name = 'authors'"))
+        conn.execute(text("UPDATE genres SET book_count = 100"))
+    fixed = reconcile_book_counts(db_engine)
+    assert fixed["catalog_counts"] == 1 and fixed["genres"] == 2
+    with db_engine.connect() as conn:
+        assert conn.scalar(text("SELECT value FROM catalog_counts WHERE name = 'authors'")) == 2
+        assert conn.scalar(text("SELECT SUM(book_count) FROM genres")) == 2
+
+
+def test_stats_without_counter_triggers_are_counted(client, db_engine, monkeypatch):
+    # Как в базе, где триггеры не поддерживаются: счётчики не используются
+    with db_engine.begin() as conn:
+        conn.execute(text("UPDATE catalog_counts SET value = 0"))
+        conn.execute(text("UPDATE genres SET book_count = 0"))
+    monkeypatch.setattr(counters, "is_supported", lambda engine: False)
+    monkeypatch.setattr("library_api.routers.stats.is_supported", lambda engine: False)
+    client.post("/api/v1/genres/", json={"name": "Сброс кэша"})
+    assert _stats(client) == (2, 2, 3)
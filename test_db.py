@@ -3,13 +3,12 @@ import sys
 
 sys.path.insert(0, os.path.abspath('.'))
 
-from library_api.db import engine, SessionLocal
-from library_api.models.database import Base
+from library_api.db import engine, SessionLocal, init_db
 
 # Тест бд
 try:
 
-    Base.metadata.create_all(bind=engine)
+    init_db(engine)
     print("Database tables created successfully")
     
 
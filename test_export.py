@@ -0,0 +1,126 @@
+import csv
+import io
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import pytest
+
+from library_api.config import settings
+from library_api.export import CSV_HEADER, encode_csv, encode_ndjson
+from library_api.models.database import Author, Book, Genre
+from library_api.routers import books
+
+# Выгрузка каталога: NDJSON и CSV совпадают с API, экранирование CSV, выгрузка порциями
+
+TITLES = [
+    "Простое название",
+    "Запятая, в названии",
+    'Кавычки "внутри"',
+    "Перевод\nстроки",
+    "  пробелы по краям  ",
+    "Ünïcödé — 书",
+    "Последняя",
+]
+
+
+@pytest.fixture(scope="module")
+def client(api_client, db_engine, db_session):
+    db = db_session()
+    authors = [Author(name="Толстой, Лев", bio="bio"), Author(name='Автор "Б"')]
+    genre = Genre(name="Роман; проза")
+    db.add_all(authors + [genre])
+    db.flush()
+    for i, title in enumerate(TITLES):
+        db.add(Book(
+            title=title, isbn=f"exp-{i}" if i % 2 else None, publication_year=1900 + i if i % 3 else None,
+            description="строка 1\nстрока 2, \"с кавычками\"" if i == 1 else None,
+            page_count=100 + i, author_id=authors[i % 2].id, genre_id=genre.id,
+        ))
+    db.commit()
+    db.close()
+
+    # Выгрузка открывает свою сессию на движке чтения
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(books, "read_engine", lambda: db_engine)
+        yield api_client
+
+
+def _export(client, **params):
+    response = client.get("/api/v1/books/export", params=params)
+    assert response.status_code == 200
+    return response
+
+
+def test_ndjson_matches_book_schema(client):
+    response = _export(client, format="ndjson")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["content-disposition"] == 'attachment; filename="books.ndjson"'
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["title"] for line in lines] == TITLES
+    for line in lines:
+        assert line == client.get(f"/api/v1/books/{line['id']}").json()
+
+
+def test_csv_round_trip_with_escaping(client):
+    response = _export(client, format="csv")
+    assert response.headers["content-type"] == "text/csv; charset=utf-8"
+
+    reader = csv.DictReader(io.StringIO(response.text, newline=""))
+    assert reader.fieldnames == CSV_HEADER
+    rows = list(reader)
+    assert [row["title"] for row in rows] == TITLES
+
+    for row in rows:
+        book = client.get(f"/api/v1/books/{row['id']}").json()
+        assert row["isbn"] == (book["isbn"] or "")
+        assert row["description"] == (book["description"] or "")
+        assert row["publication_year"] == ("" if book["publication_year"] is None else str(book["publication_year"]))
+        assert row["author_name"] == book["author"]["name"]
+        assert row["genre_name"] == book["genre"]["name"]
+        assert int(row["author_id"]) == book["author_id"]
+
+
+def test_filters_and_sorting(client):
+    author_id = client.get("/api/v1/authors/").json()[1]["id"]
+    response = _export(client, format="ndjson", author_id=author_id, sort_by="id", sort_order="desc")
+    ids = [json.loads(line)["id"] for line in response.text.splitlines()]
+    assert len(ids) == 3
+    assert ids == sorted(ids, reverse=True)
+
+
+@pytest.mark.parametrize("format", ["ndjson", "csv"])
+def test_partitioned_export_is_complete(client, monkeypatch, format):
+    full = _export(client, format=format).content
+    # Порции меньше каталога: курсор читается несколько раз
+    monkeypatch.setattr(settings, "export_batch_size", 2)
+    assert _export(client, format=format).content == full
+    # Сжатие потоком, по фрагментам
+    response = client.get("/api/v1/books/export", params={"format": format}, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == full
+
+
+def _row(id, title):
+    return SimpleNamespace(
+        id=id, title=title, isbn=None, publication_year=None, description=None, page_count=None,
+        created_at=None, author_id=1, author_name="A", author_bio=None, genre_id=1, genre_name="G",
+    )
+
+
+def test_encoders_yield_one_chunk_per_partition():
+    partitions = [[_row(1, "a"), _row(2, "b")], [_row(3, "c")]]
+
+    chunks = list(encode_ndjson(iter(partitions)))
+    assert len(chunks) == 2
+    assert [json.loads(line)["id"] for line in chunks[1].splitlines()] == [3]
+
+    chunks = list(encode_csv(iter(partitions)))
+    assert len(chunks) == 2
+    # Заголовок - только в первом фрагменте
+    assert chunks[0].startswith(",".join(CSV_HEADER))
+    assert chunks[1] == "3,c,,,,,,1,A,1,G\r\n"
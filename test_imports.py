@@ -0,0 +1,142 @@
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import pytest
+from sqlalchemy import create_engine, event, func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from library_api import imports
+from library_api.config import settings
+from library_api.db import init_db
+from library_api.models.database import Author, Book, Genre, ImportJob
+
+# Фоновый импорт: пакеты с прогрессом, ошибки строк, продолжение после перезапуска
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'imports.db'}")
+    init_db(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(imports, "SessionLocal", factory)
+    monkeypatch.setattr(settings, "import_batch_size", 2)
+    yield factory
+    engine.dispose()
+
+
+def _create_job(factory, path, format, **values) -> int:
+    with factory() as db:
+        job = ImportJob(path=str(path), format=format, **values)
+        db.add(job)
+        db.commit()
+        return job.id
+
+
+def test_csv_import_resolves_names_and_reports_errors(session_factory, tmp_path):
+    with session_factory() as db:
+        db.add(Genre(name="Роман"))
+        db.commit()
+    path = tmp_path / "books.csv"
+    path.write_text(
+        "title,isbn,publication_year,author,genre\n"
+        "Первая,111,1900,Толстой,Роман\n"
+        "Вторая,111,1901,Толстой,Роман\n"
+        "Третья,,не год,Чехов,Рассказ\n"
+        "Четвёртая,,,Чехов,Рассказ\n",
+        encoding="utf-8",
+    )
+    job_id = _create_job(session_factory, path, "csv", total_rows=4)
+
+    assert imports.run_job(job_id, threading.Event())
+
+    with session_factory() as db:
+        job = db.get(ImportJob, job_id)
+        assert (job.processed_rows, job.created_rows, job.error_count) == (4, 2, 2)
+        assert [error["line"] for error in json.loads(job.errors)] == [3, 4]
+        assert db.scalar(select(func.count()).select_from(Genre)) == 2
+        assert sorted(db.scalars(select(Author.name))) == ["Толстой", "Чехов"]
+
+
+def test_interrupted_job_continues_after_committed_rows(session_factory, tmp_path):
+    path = tmp_path / "books.ndjson"
+    path.write_text(
+        "\n".join(json.dumps({"title": f"Книга {i}", "author": "Автор", "genre": "Жанр"}) for i in range(5)),
+        encoding="utf-8",
+    )
+    job_id = _create_job(session_factory, path, "ndjson", total_rows=5, status="running", processed_rows=2)
+    imports.requeue_interrupted(session_factory.kw["bind"])
+
+    assert imports.run_job(job_id, threading.Event())
+
+    with session_factory() as db:
+        job = db.get(ImportJob, job_id)
+        assert job.status == "queued"
+        assert (job.processed_rows, job.created_rows) == (5, 3)
+        assert list(db.scalars(select(Book.title).order_by(Book.id))) == ["Книга 2", "Книга 3", "Книга 4"]
+
+
+def test_author_created_by_another_worker_is_reused(session_factory, tmp_path):
+    engine = session_factory.kw["bind"]
+    path = tmp_path / "books.ndjson"
+    path.write_text(
+        "\n".join(json.dumps({"title": f"Книга {i}", "author": "Толстой", "genre": "Роман"}) for i in range(2)),
+        encoding="utf-8",
+    )
+    job_id = _create_job(session_factory, path, "ndjson", total_rows=2)
+
+    # Другой рабочий процесс создаёт того же автора между поиском имён и вставкой
+    competing = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _create_concurrently(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("INSERT INTO authors") and not competing:
+            competing.append(True)
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as other:
+                other.execute(insert(Author).values(name="Толстой", import_name="Толстой"))
+
+    assert imports.run_job(job_id, threading.Event())
+    event.remove(engine, "before_cursor_execute", _create_concurrently)
+
+    with session_factory() as db:
+        assert db.scalar(select(func.count()).select_from(Author)) == 1
+        assert db.scalar(select(func.count()).select_from(Genre)) == 1
+        author_id = db.scalar(select(Author.id))
+        assert list(db.scalars(select(Book.author_id))) == [author_id, author_id]
+        assert db.get(ImportJob, job_id).created_rows == 2
+
+
+def test_renamed_imported_author_is_not_created_again(session_factory, tmp_path):
+    with session_factory() as db:
+        db.add(Author(name="Лев Толстой", import_name="Толстой"))
+        db.commit()
+    path = tmp_path / "books.csv"
+    path.write_text("title,author,genre\nКнига,Толстой,Роман\n", encoding="utf-8")
+    job_id = _create_job(session_factory, path, "csv", total_rows=1)
+
+    assert imports.run_job(job_id, threading.Event())
+
+    with session_factory() as db:
+        assert list(db.scalars(select(Author.name))) == ["Лев Толстой"]
+
+
+def test_upload_is_written_in_chunks(session_factory, api_client, monkeypatch, tmp_path):
+    submitted = []
+    monkeypatch.setattr(settings, "import_dir", str(tmp_path / "uploads"))
+    monkeypatch.setattr(imports.import_queue, "submit", submitted.append)
+
+    def body():
+        yield b"title,author,genre\nA,"
+        yield b"X,Y\nB,X,Y"
+
+    response = api_client.post("/api/v1/jobs/imports", content=body(), headers={"Content-Type": "text/csv"})
+    assert response.status_code == 202
+    assert response.json()["total_rows"] == 2
+    assert submitted == [response.json()["id"]]
+    with session_factory() as db:
+        stored = db.get(ImportJob, submitted[0]).path
+    with open(stored, "rb") as file:
+        assert file.read() == b"title,author,genre\nA,X,Y\nB,X,Y"
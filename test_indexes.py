@@ -0,0 +1,90 @@
+import itertools
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from library_api.fastjson import BOOK_COLUMNS
+from library_api.generate_data import generate
+from library_api.models.database import Base
+from library_api.pagination import keyset_filters
+from library_api.routers.books import _books_query
+from library_api.search import create_search_index
+
+# Планы запросов get_books: каждая комбинация фильтра и сортировки читается
+# из индекса в нужном порядке, без сортировки во временном B-дереве
+
+SORT_FIELDS = ["id", "title", "publication_year", "created_at", "author_name", "genre_name"]
+FILTERS = [
+    {},
+    {"author_id": 1},
+    {"genre_id": 1},
+    {"title": "тайна"},
+    {"author_name": "Иван"},
+    {"genre_name": "Роман"},
+]
+# Фильтр по автору + сортировка по жанру (и наоборот): книги одного автора
+# (жанра) находятся по индексу, и планировщик по статистике может предпочесть
+# отсортировать эту небольшую выборку
+SORTED_AFTER_INDEX_SEARCH = {("author_id", "genre_name"), ("genre_id", "author_name")}
+
+CURSOR_VALUES = {
+    "id": [100],
+    "title": ["m"],
+    "publication_year": [1950],
+    "created_at": [datetime(2020, 1, 1)],
+    "author_name": ["m", 10],
+    "genre_name": ["m", 10],
+}
+
+
+@pytest.fixture(scope="module")
+def db():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    create_search_index(engine)
+    # Небольшой каталог с перекосом по авторам и жанрам и статистикой ANALYZE
+    generate(engine, books=3000, authors=150, genres=20)
+
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+
+
+def _plan(db, query) -> list:
+    sql = str(query.limit(11).statement.compile(db.get_bind(), compile_kwargs={"literal_binds": True}))
+    return [row[3] for row in db.execute(text("EXPLAIN QUERY PLAN " + sql))]
+
+
+@pytest.mark.parametrize("filters,sort_by,sort_order,with_cursor", [
+    pytest.param(filters, sort_by, sort_order, with_cursor,
+                 id=f"{'-'.join(filters) or 'all'}-{sort_by}-{sort_order}{'-cursor' if with_cursor else ''}")
+    for filters, sort_by, sort_order, with_cursor
+    in itertools.product(FILTERS, SORT_FIELDS, ["asc", "desc"], [False, True])
+])
+def test_get_books_query_uses_index_order(db, filters, sort_by, sort_order, with_cursor):
+    query, sort_by, sort_order, key_columns = _books_query(
+        db, BOOK_COLUMNS, sort_by=sort_by, sort_order=sort_order, **filters
+    )
+    queries = [query]
+    if with_cursor:
+        values = CURSOR_VALUES[sort_by] + [100]
+        conditions = keyset_filters(key_columns, values, descending=sort_order == "desc")
+        queries = [query.filter(condition) for condition in conditions]
+
+    filter_name = next(iter(filters), None)
+    for query in queries:
+        plan = _plan(db, query)
+        if filter_name in ("author_id", "genre_id"):
+            # Фильтр по внешнему ключу - поиск по индексу, а не просмотр всей таблицы
+            assert any(step.startswith("SEARCH books USING") and f"{filter_name}=?" in step for step in plan), plan
+        if (filter_name, sort_by) not in SORTED_AFTER_INDEX_SEARCH:
+            assert not any("TEMP B-TREE" in step for step in plan), plan
@@ -0,0 +1,121 @@
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from library_api import metrics
+from library_api.cache import response_cache
+from library_api.main import app
+from library_api.metrics import MetricsMiddleware, instrument_engine, instrument_sessions, registry
+from library_api.models.database import Author, Book, Genre
+from library_api.routers import books
+
+# Метрики: текст /metrics и заголовок Server-Timing
+
+SERVER_TIMING = re.compile(
+    r'^db;dur=[\d.]+;desc="(\d+) queries, (\d+) rows", app;dur=-?[\d.]+, total;dur=[\d.]+$'
+)
+
+
+@pytest.fixture(scope="module")
+def db_engine(db_engine):
+    instrument_engine(db_engine)
+    return db_engine
+
+
+@pytest.fixture(scope="module")
+def client(api_client, db_session):
+    db = db_session()
+    author, genre = Author(name="Автор"), Genre(name="Жанр")
+    db.add_all([author, genre])
+    db.flush()
+    db.add_all([Book(title=f"Книга {i}", author_id=author.id, genre_id=genre.id) for i in range(3)])
+    db.commit()
+    db.close()
+    return api_client
+
+
+@pytest.fixture(scope="module")
+def timed_client(client):
+    # Отдельное приложение с Server-Timing и теми же зависимостями базы
+    timed = FastAPI()
+    timed.include_router(books.router)
+    timed.dependency_overrides = app.dependency_overrides
+    timed.add_middleware(MetricsMiddleware, server_timing=True)
+    return TestClient(timed)
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    registry.reset()
+    response_cache.clear()
+
+
+def _metric(text: str, line_prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{line_prefix} not found in /metrics")
+
+
+def _server_timing(response) -> tuple:
+    match = SERVER_TIMING.match(response.headers["server-timing"])
+    assert match, response.headers["server-timing"]
+    return int(match.group(1)), int(match.group(2))
+
+
+def test_metrics_output(client):
+    book_id = client.get("/api/v1/books/").json()["items"][0]["id"]
+    assert client.get(f"/api/v1/books/{book_id}").status_code == 200
+    assert client.get("/api/v1/no-such-route").status_code == 404
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+
+    route = 'method="GET",route="/api/v1/books/{book_id}"'
+    assert _metric(text, 'http_requests_total{%s,status="200"}' % route) == 1
+    assert _metric(text, 'http_requests_total{method="GET",route="unmatched",status="404"}') == 1
+    assert _metric(text, "http_request_duration_seconds_count{%s}" % route) == 1
+    assert _metric(text, 'http_request_duration_seconds_bucket{%s,le="+Inf"}' % route) == 1
+    assert _metric(text, "db_statements_total{%s}" % route) >= 1
+    assert _metric(text, "db_statement_duration_seconds_total{%s}" % route) > 0
+    assert _metric(text, "db_statements_per_request_count{%s}" % route) == 1
+    assert "# TYPE db_rows_total counter" in text
+
+
+def test_server_timing_header(timed_client):
+    response = timed_client.get("/api/v1/books/")
+    assert response.status_code == 200
+    queries, rows = _server_timing(response)
+    assert queries >= 1
+    # Строки выборок без metrics_count_rows не считаются
+    assert rows == 0
+
+
+def test_changed_rows_are_counted(timed_client):
+    book_id = timed_client.get("/api/v1/books/").json()["items"][0]["id"]
+    response = timed_client.put(f"/api/v1/books/{book_id}", json={"page_count": 100})
+    assert response.status_code == 200
+    queries, rows = _server_timing(response)
+    assert queries >= 2
+    assert rows >= 1
+
+
+def test_selected_rows_are_counted_with_session_hook(timed_client):
+    instrument_sessions()
+    try:
+        response = timed_client.get("/api/v1/books/", params={"with_total": "false"})
+        assert response.status_code == 200
+        _, rows = _server_timing(response)
+        assert rows >= len(response.json()["items"]) == 3
+    finally:
+        event.remove(Session, "do_orm_execute", metrics._count_rows)
@@ -0,0 +1,90 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import pytest
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+
+from library_api.cache import SQLiteBackend
+from library_api.db import init_db
+from library_api.models.database import Author, Genre
+from library_api.reference import ReferenceCache, reference_cache
+
+# Справочник авторов и жанров: проверки без запросов и согласованность после записей
+
+
+@pytest.fixture
+def factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'reference.db'}")
+    init_db(engine)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, statement, *args: statements.append(statement))
+    factory = sessionmaker(bind=engine)
+    factory.statements = statements
+    with factory() as db:
+        db.add_all([Author(name="Author"), Genre(name="Genre")])
+        db.commit()
+        reference_cache.load(db)
+    yield factory
+    reference_cache.clear()
+    engine.dispose()
+
+
+def test_checks_use_memory_and_follow_writes(factory):
+    with factory() as db:
+        factory.statements.clear()
+        assert reference_cache.author_exists(db, 1)
+        assert reference_cache.genre_exists(db, 1)
+        assert reference_cache.genre_id(db, "Genre") == 1
+        assert reference_cache.genre_id(db, "Other") is None
+        assert factory.statements == []
+
+        db.add(Genre(name="Other"))
+        db.get(Genre, 1).name = "Renamed"
+        db.delete(db.get(Author, 1))
+        db.commit()
+
+    with factory() as db:
+        assert not reference_cache.author_exists(db, 1)
+        assert reference_cache.genre_id(db, "Genre") is None
+        assert reference_cache.genre_id(db, "Renamed") == 1
+        assert reference_cache.genre_id(db, "Other") == 2
+
+        # Жанр, вставленный без ORM-объекта (bulk, импорт), виден после commit
+        db.execute(insert(Genre), [{"name": "Bulk"}])
+        assert reference_cache.genre_id(db, "Bulk") == 3
+        db.commit()
+    with factory() as db:
+        assert reference_cache.genre_id(db, "Bulk") == 3
+
+
+def test_rolled_back_savepoint_is_not_cached(factory):
+    with factory() as db:
+        savepoint = db.begin_nested()
+        db.add(Genre(name="Rolled back"))
+        db.flush()
+        savepoint.rollback()
+        db.add(Genre(name="Kept"))
+        db.commit()
+
+    factory.statements.clear()
+    with factory() as db:
+        assert reference_cache.genre_id(db, "Kept") == 2
+        assert reference_cache.genre_id(db, "Rolled back") is None
+    assert factory.statements == []
+
+
+def test_other_processes_drop_their_copy(factory, tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"), max_entries=100)
+    first, second = ReferenceCache(100, shared=backend), ReferenceCache(100, shared=backend)
+    with factory() as db:
+        first.load(db)
+        second.load(db)
+        first._committed({"added": [], "evicted": [(Genre, None)]})
+
+        factory.statements.clear()
+        assert second.genre_id(db, "Genre") == 1
+        # Второй процесс перечитал жанры
+        assert len(factory.statements) == 1
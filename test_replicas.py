@@ -0,0 +1,94 @@
+import itertools
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from library_api import db as database, replicas
+from library_api.cache import MemoryBackend, ResponseCache, SQLiteBackend
+from library_api.config import settings
+from library_api.replicas import ReadYourWritesMiddleware
+from library_api.totals import TotalsCache
+
+# Чтение с реплик и read-your-writes: клиент, который только что писал, читает с основной базы
+
+replica = create_engine("sqlite://")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "read_replica_urls", ["sqlite://"])
+    monkeypatch.setattr(settings, "read_your_writes_seconds", 60.0)
+    monkeypatch.setattr(database, "_next_replica", itertools.cycle([replica]))
+    monkeypatch.setattr(replicas, "_last_write", 0.0)
+
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware)
+
+    @app.get("/read")
+    def read(db: Session = Depends(database.get_read_db)):
+        return {"replica": db.get_bind() is replica, "may_lag": replicas.replica_may_lag()}
+
+    @app.post("/write")
+    def write():
+        return {}
+
+    return TestClient(app)
+
+
+def test_reads_go_to_primary_after_own_write(client):
+    other = TestClient(client.app)
+    assert client.get("/read").json() == {"replica": True, "may_lag": False}
+
+    response = client.post("/write")
+    assert replicas.COOKIE_NAME in response.headers["set-cookie"]
+
+    assert client.get("/read").json() == {"replica": False, "may_lag": False}
+    # Другой клиент читает с реплики, которая могла ещё не получить запись
+    assert other.get("/read").json() == {"replica": True, "may_lag": True}
+
+
+def test_lagging_replica_reads_are_not_cached(monkeypatch):
+    cache = ResponseCache(MemoryBackend(100), ttl=30.0)
+    monkeypatch.setattr("library_api.cache.replica_may_lag", lambda backend=None: True)
+    cache.store("key", b"{}", tags=["books"])
+    assert cache.get("key") is None
+
+    monkeypatch.setattr("library_api.cache.replica_may_lag", lambda backend=None: False)
+    cache.store("key", b"{}", tags=["books"])
+    assert cache.get("key") is not None
+
+
+def test_write_in_one_worker_stops_replica_caching_in_another(client, tmp_path):
+    # client включает реплики; два рабочих процесса: свои объекты кэша над одним файлом SQLite
+    path = str(tmp_path / "cache.db")
+    writer = ResponseCache(SQLiteBackend(path, 100), ttl=30.0)
+    reader = ResponseCache(SQLiteBackend(path, 100), ttl=30.0)
+
+    app = FastAPI()
+    app.add_middleware(ReadYourWritesMiddleware, cache=writer)
+
+    @app.post("/write")
+    def write():
+        return {}
+
+    assert TestClient(app).post("/write").status_code == 200
+    # Второй процесс о записи в памяти не знает
+    replicas._last_write = 0.0
+
+    assert reader.get("books:list") is None
+    reader.store("books:list", b"[]", tags=["books"])
+    assert reader.get("books:list") is None
+    assert writer.get("books:list") is None
+    totals = TotalsCache(shared=reader.backend)
+    totals.set(("genre_id", 1), 10, totals.version())
+    assert totals.get(("genre_id", 1)) is None
+
+    # Без общего хранилища процесс запись бы не заметил
+    assert not replicas.replica_may_lag(MemoryBackend(100))
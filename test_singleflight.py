@@ -0,0 +1,110 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+from library_api.singleflight import SingleFlightMiddleware
+
+# Одинаковые одновременные GET-запросы: одно выполнение обработчика на всех
+
+calls = []
+
+
+def make_app(timeout: float = 5.0) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(SingleFlightMiddleware, timeout=timeout)
+
+    @app.get("/api/sync")
+    def sync_read(genre_id: int = 0, sort_by: str = "id", delay: float = 0.2):
+        calls.append(None)
+        call = len(calls)
+        time.sleep(delay)
+        return {"genre_id": genre_id, "sort_by": sort_by, "call": call}
+
+    @app.get("/api/async")
+    async def async_read():
+        calls.append(None)
+        await asyncio.sleep(0.2)
+        return {"call": len(calls)}
+
+    @app.get("/api/fail")
+    def fail():
+        calls.append(None)
+        time.sleep(0.2)
+        raise RuntimeError("boom")
+
+    @app.get("/api/stream")
+    def stream():
+        calls.append(None)
+        time.sleep(0.2)
+        return StreamingResponse(iter([b"a", b"b"]), media_type="text/plain")
+
+    @app.post("/api/write")
+    def write():
+        return {}
+
+    return app
+
+
+@pytest.fixture(autouse=True)
+def _reset_calls():
+    calls.clear()
+
+
+async def _gather(app: FastAPI, urls: list) -> list:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*[client.get(url) for url in urls], return_exceptions=True)
+
+
+@pytest.mark.parametrize("path", ["/api/sync", "/api/async"])
+def test_identical_requests_share_one_execution(path):
+    responses = asyncio.run(_gather(make_app(), [path] * 10))
+    assert len(calls) == 1
+    assert {response.content for response in responses} == {responses[0].content}
+
+
+def test_query_order_is_normalized():
+    urls = ["/api/sync?genre_id=1&sort_by=created_at", "/api/sync?sort_by=created_at&genre_id=1",
+            "/api/sync?genre_id=2&sort_by=created_at"]
+    responses = asyncio.run(_gather(make_app(), urls))
+    assert len(calls) == 2
+    assert responses[0].json() == responses[1].json() != responses[2].json()
+
+
+def test_error_reaches_every_waiter():
+    results = asyncio.run(_gather(make_app(), ["/api/fail"] * 3))
+    assert len(calls) == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_timeout_and_streaming_fall_back_to_own_execution():
+    asyncio.run(_gather(make_app(timeout=0.05), ["/api/sync"] * 3))
+    assert len(calls) == 3
+
+    calls.clear()
+    responses = asyncio.run(_gather(make_app(), ["/api/stream"] * 3))
+    assert len(calls) == 3
+    assert all(response.content == b"ab" for response in responses)
+
+
+def test_write_ends_sharing_of_earlier_reads():
+    async def scenario():
+        transport = httpx.ASGITransport(app=make_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.create_task(client.get("/api/sync"))
+            await asyncio.sleep(0.05)
+            await client.post("/api/write")
+            second = await client.get("/api/sync")
+            return (await first).json(), second.json()
+
+    first, second = asyncio.run(scenario())
+    # Чтение после записи не получает ответ, вычисленный до неё
+    assert (first["call"], second["call"]) == (1, 2)
@@ -0,0 +1,98 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import pytest
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+
+from library_api import totals
+from library_api.db import init_db
+from library_api.models.database import Author, Book, Genre
+from library_api.totals import TotalsCache, estimate_total
+
+# Кэш total: подсчёт, начатый до записи, не сохраняется; оценка больших выборок
+
+
+def test_count_started_before_invalidation_is_not_stored():
+    cache = TotalsCache()
+    version = cache.version()
+    cache.invalidate()
+    cache.set(("genre_id", 1), 10, version)
+    assert cache.get(("genre_id", 1)) is None
+
+    cache.set(("genre_id", 1), 11, cache.version())
+    assert cache.get(("genre_id", 1)) == 11
+
+
+def test_stale_value_is_served_only_up_to_max_age(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(totals.time, "monotonic", lambda: now[0])
+    cache = TotalsCache(ttl=60.0, stale_max_age=300.0)
+    cache.set(("genre_id", 1), 10, cache.version())
+    cache.invalidate()
+    now[0] += 299
+    assert cache.get_stale(("genre_id", 1)) == 10
+    # Значение, подсчитанное больше stale_max_age секунд назад, не отдаётся
+    now[0] += 2
+    assert cache.get_stale(("genre_id", 1)) is None
+
+    # Истечение ttl тоже переводит значение в устаревшие с тем же временем подсчёта
+    cache.set(("genre_id", 2), 20, cache.version())
+    now[0] += 61
+    assert cache.get(("genre_id", 2)) is None
+    assert cache.get_stale(("genre_id", 2)) == 20
+    now[0] += 240
+    assert cache.get_stale(("genre_id", 2)) is None
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'totals.db'}")
+    init_db(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Author), [{"name": f"Author {i}"} for i in range(2)])
+        conn.execute(insert(Genre), [{"name": f"Genre {i}"} for i in range(2)])
+        # Автор 1: 80 книг (60 жанра 1), автор 2: 20 книг жанра 2
+        conn.execute(insert(Book), [
+            {"title": f"Book {i}", "author_id": 1 if i < 80 else 2, "genre_id": 1 if i < 60 else 2}
+            for i in range(100)
+        ])
+        conn.execute(text("ANALYZE"))
+    monkeypatch.setattr(totals, "ESTIMATE_SCAN_LIMIT", 10)
+    monkeypatch.setattr(totals, "totals_cache", TotalsCache())
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _estimate(db, **filters):
+    query = db.query(Book.id).join(Book.author).join(Book.genre)
+    if "author_id" in filters:
+        query = query.filter(Book.author_id == filters["author_id"])
+    if "genre_id" in filters:
+        query = query.filter(Book.genre_id == filters["genre_id"])
+    if "title" in filters:
+        query = query.filter(Book.title.ilike(f"%{filters['title']}%"))
+    return estimate_total(db, query, totals.filters_key(**filters))
+
+
+def test_estimate_uses_book_counters_and_table_statistics(db):
+    # Один фильтр - точный счётчик книг автора (жанра)
+    assert _estimate(db, author_id=1) == (80, False, False)
+    assert _estimate(db, genre_id=1) == (60, False, False)
+    # Автор и жанр: 80 * 60 / 100 книг по sqlite_stat1
+    assert _estimate(db, author_id=1, genre_id=1) == (48, True, False)
+    # Для текстового фильтра известна только нижняя граница
+    assert _estimate(db, title="Book") == (11, True, True)
+
+
+def test_estimate_counts_exactly_without_counter_triggers(db, monkeypatch):
+    # Без триггеров book_count не ведётся и не может считаться точным
+    db.execute(text("UPDATE authors SET book_count = 0"))
+    db.commit()
+    monkeypatch.setattr(totals.counters, "is_supported", lambda engine: False)
+    assert _estimate(db, author_id=1) == (80, False, False)
+    assert totals.totals_cache.get(totals.filters_key(author_id=1)) == 80
@@ -0,0 +1,89 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath('.'))
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from library_api import schemas
+from library_api.db import init_db
+from library_api.models.database import Author, Book, Genre
+from library_api.reference import reference_cache
+from library_api.routers.books import _insert_book
+from library_api.writer import GroupCommitWriter, writer_sessionmaker
+
+# Групповая фиксация: параллельные записи одной транзакцией, ошибки - по отдельности
+
+
+@pytest.fixture
+def factory(tmp_path):
+    url = f"sqlite:///{tmp_path / 'writer.db'}"
+    engine = create_engine(url)
+    init_db(engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add_all([Author(name="Author"), Genre(name="Genre")])
+        db.commit()
+    engine.dispose()
+    reference_cache.clear()
+
+    session_factory = writer_sessionmaker(url)
+    yield session_factory
+    session_factory.kw["bind"].dispose()
+
+
+def _submit_concurrently(writer, books) -> list:
+    results = [None] * len(books)
+    barrier = threading.Barrier(len(books))
+
+    def call(index, book):
+        barrier.wait()
+        try:
+            results[index] = writer.submit(_insert_book, book)
+        except HTTPException as error:
+            results[index] = error
+
+    threads = [threading.Thread(target=call, args=item) for item in enumerate(books)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_writes_share_one_commit(factory):
+    commits = []
+    event.listen(factory.kw["bind"], "commit", lambda conn: commits.append(conn))
+    writer = GroupCommitWriter(factory, window_ms=200, max_batch=64)
+    books = [schemas.BookCreate(title=f"Book {i}", isbn=f"isbn-{i}", author_id=1, genre_id=1) for i in range(8)]
+
+    results = _submit_concurrently(writer, books)
+    writer.close()
+
+    assert sorted(results) == list(range(1, 9))
+    assert len(commits) < len(books)
+    with factory() as db:
+        assert db.query(Book).count() == 8
+        assert db.get(Author, 1).book_count == 8
+
+
+def test_failed_write_does_not_affect_its_batch(factory):
+    writer = GroupCommitWriter(factory, window_ms=200, max_batch=64)
+    books = [
+        schemas.BookCreate(title="First", isbn="same", author_id=1, genre_id=1),
+        schemas.BookCreate(title="Second", isbn="same", author_id=1, genre_id=1),
+        schemas.BookCreate(title="Other", isbn="other", author_id=1, genre_id=1),
+        schemas.BookCreate(title="No genre", author_id=1, genre_id=99),
+    ]
+
+    results = _submit_concurrently(writer, books)
+    writer.close()
+
+    errors = [result for result in results if isinstance(result, HTTPException)]
+    # Одна из двух книг с одинаковым ISBN и книга без жанра
+    assert sorted(error.status_code for error in errors) == [400, 404]
+    with factory() as db:
+        assert sorted(isbn for isbn, in db.query(Book.isbn)) == ["other", "same"]